@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Deployment profile (uvicorn workers under gunicorn): see
+authentic_place/gunicorn_asgi.py.
 """
 
 import os
@@ -13,4 +16,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'authentic_place.settings')
 
+# Lecture du catalogue par les vues async (market/async_views.py)
+os.environ.setdefault('ASYNC_CATALOG_VIEWS', 'True')
+
 application = get_asgi_application()
+
+# Compilation des templates avant la première requête
+from market.template_backend import preload_templates  # noqa: E402
+
+preload_templates()
+
+# Détection du backend de recherche (table FTS5) avant la première requête
+from market.search import preload_search_backend  # noqa: E402
+
+preload_search_backend()
@@ -0,0 +1,54 @@
+"""
+Profil de déploiement ASGI : gunicorn gère les processus, uvicorn sert
+HTTP dans chacun d'eux (boucle asyncio).
+
+    gunicorn authentic_place.asgi:application -c authentic_place/gunicorn_asgi.py
+
+Un client lent (réseau mobile) n'occupe qu'une coroutine : l'envoi de la
+réponse et la lecture de la requête se font sans bloquer le worker, et les
+vues du catalogue (market/async_views.py) attendent la base sans thread
+dédié. Le profil WSGI historique reste disponible :
+
+    gunicorn authentic_place.wsgi:application
+
+Sans gunicorn (développement, conteneur à un seul processus) :
+
+    uvicorn authentic_place.asgi:application --host 0.0.0.0 --port 8000
+
+Comparaison des deux profils sous charge de clients lents :
+
+    python manage.py benchmark_servers
+
+Variables d'environnement :
+    PORT              port d'écoute (défaut : 8000)
+    WEB_CONCURRENCY   nombre de processus (défaut : 2 × CPU + 1, max 8)
+    GUNICORN_TIMEOUT  délai avant redémarrage d'un worker bloqué (s)
+
+Dépendances : uvicorn, uvicorn-worker (requirements.txt).
+"""
+
+import multiprocessing
+import os
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+worker_class = 'uvicorn_worker.UvicornWorker'
+
+workers = int(os.getenv(
+    'WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)
+))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+
+graceful_timeout = 30
+
+# Connexions HTTP keep-alive (clients mobiles qui enchaînent les requêtes)
+keepalive = 5
+
+# Redémarrage périodique : borne la croissance mémoire (cache locmem,
+# métriques en mémoire).
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
@@ -5,8 +5,10 @@ AUTHENTIC PLACE PRO VERSION – IMAGEKIT READY – RENDER READY
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 
 # ======================================================
@@ -34,6 +36,9 @@ SECRET_KEY = os.getenv(
 
 DEBUG = os.getenv("DEBUG", "False") == "True"
 
+# `manage.py test` ou pytest (pytest-django)
+TESTING = (len(sys.argv) > 1 and sys.argv[1] == "test") or "pytest" in sys.modules
+
 ALLOWED_HOSTS = [
     ".onrender.com",
     "localhost",
@@ -70,7 +75,15 @@ MIDDLEWARE = [
 
     'django.middleware.security.SecurityMiddleware',
 
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'market.middleware.StaticFilesMiddleware',
+
+    'market.metrics.MetricsMiddleware',
+
+    'market.sqlprofile.SQLProfilerMiddleware',
+
+    'market.template_backend.TemplateProfilerMiddleware',
+
+    'market.querybudget.QueryBudgetMiddleware',
 
     'django.contrib.sessions.middleware.SessionMiddleware',
 
@@ -82,11 +95,64 @@ MIDDLEWARE = [
 
     'django.contrib.messages.middleware.MessageMiddleware',
 
+    'market.dbrouter.ReplicaPinMiddleware',
+
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
 ]
 
 
+# ======================================================
+# QUERY BUDGET (DEBUG + tests uniquement)
+# ======================================================
+
+QUERY_BUDGET_ENABLED = DEBUG or TESTING
+
+# En test, un dépassement de budget fait échouer la requête.
+QUERY_BUDGET_STRICT = TESTING
+
+
+# ======================================================
+# PROFILEUR SQL (N+1, requêtes lentes) – dev / staging
+# ======================================================
+# Résumé : python manage.py sql_report
+
+SQL_PROFILER_ENABLED = os.getenv(
+    "SQL_PROFILER_ENABLED", str(DEBUG and not TESTING)
+) == "True"
+
+SQL_PROFILER_SLOW_MS = float(os.getenv("SQL_PROFILER_SLOW_MS", "100"))
+
+# Nombre de répétitions d'une même forme de requête signalé comme N+1
+SQL_PROFILER_N_PLUS_ONE = int(os.getenv("SQL_PROFILER_N_PLUS_ONE", "5"))
+
+SQL_PROFILER_LOG = os.getenv(
+    "SQL_PROFILER_LOG", str(BASE_DIR / ".cache" / "sql_profile.jsonl")
+)
+
+
+# ======================================================
+# PROFILEUR DE RENDU (coût par template et par balise) – dev / staging
+# ======================================================
+# Résumé : python manage.py template_report
+
+TEMPLATE_PROFILER_ENABLED = os.getenv(
+    "TEMPLATE_PROFILER_ENABLED", str(DEBUG and not TESTING)
+) == "True"
+
+TEMPLATE_PROFILER_LOG = os.getenv(
+    "TEMPLATE_PROFILER_LOG", str(BASE_DIR / ".cache" / "template_profile.jsonl")
+)
+
+
+# ======================================================
+# MÉTRIQUES (/metrics, format Prometheus)
+# ======================================================
+# Sans jeton, l'endpoint n'est disponible qu'en DEBUG.
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
 # ======================================================
 # URLS
 # ======================================================
@@ -102,16 +168,27 @@ TEMPLATES = [
 
     {
 
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates + mesure du temps de rendu (market.metrics)
+        'BACKEND': 'market.template_backend.InstrumentedDjangoTemplates',
 
         'DIRS': [
             BASE_DIR / "templates",
         ],
 
-        'APP_DIRS': True,
+        # Chargeurs explicites : templates compilés une fois par processus,
+        # aussi en développement (rechargés par runserver à chaque
+        # modification).
+        'APP_DIRS': False,
 
         'OPTIONS': {
 
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
+
             'context_processors': [
 
                 'django.template.context_processors.debug',
@@ -122,6 +199,9 @@ TEMPLATES = [
 
                 'django.contrib.messages.context_processors.messages',
 
+                # Version des fragments d'en-tête / pied de page
+                'market.context_processors.layout',
+
             ],
 
         },
@@ -144,15 +224,50 @@ WSGI_APPLICATION = 'authentic_place.wsgi.application'
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Réplica en lecture seule pour le catalogue public (market/dbrouter.py).
+# Essai local : DATABASE_REPLICA_URL=sqlite:///replica.sqlite3
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
+# Pool de connexions PostgreSQL (psycopg 3, psycopg_pool).
+DATABASE_POOL = os.getenv("DATABASE_POOL", "False") == "True"
+
+DATABASE_POOL_OPTIONS = {
+    'min_size': int(os.getenv("DATABASE_POOL_MIN_SIZE", "2")),
+    'max_size': int(os.getenv("DATABASE_POOL_MAX_SIZE", "10")),
+    'timeout': int(os.getenv("DATABASE_POOL_TIMEOUT", "10")),
+}
+
+# Sous ASGI (authentic_place/asgi.py), chaque requête exécute l'ORM dans
+# son propre thread : une connexion persistante ne serait jamais réutilisée
+# (le pool, lui, l'est). Le pool exclut aussi les connexions persistantes.
+if DATABASE_POOL or os.getenv("ASYNC_CATALOG_VIEWS") == "True":
+    DATABASE_CONN_MAX_AGE = 0
+else:
+    DATABASE_CONN_MAX_AGE = 600
+
+
+def database_config(url):
+    postgres = url.startswith(("postgres://", "postgresql://"))
+
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=DATABASE_CONN_MAX_AGE,
+        # Connexion persistante vérifiée avant réutilisation
+        conn_health_checks=True,
+        ssl_require=postgres,
+    )
+
+    if postgres and DATABASE_POOL:
+        config['OPTIONS']['pool'] = DATABASE_POOL_OPTIONS
+
+    return config
+
+
 if DATABASE_URL:
 
     DATABASES = {
 
-        'default': dj_database_url.parse(
-            DATABASE_URL,
-            conn_max_age=600,
-            ssl_require=True
-        )
+        'default': database_config(DATABASE_URL)
 
     }
 
@@ -170,6 +285,177 @@ else:
 
     }
 
+if DATABASE_REPLICA_URL:
+
+    DATABASES['replica'] = database_config(DATABASE_REPLICA_URL)
+
+    # Tests : le réplica pointe sur la base de test principale.
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['market.dbrouter.PrimaryReplicaRouter']
+
+# Durée pendant laquelle un navigateur qui vient d'écrire lit sur la base
+# principale (retard maximal toléré du réplica), en secondes.
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "10"))
+
+# Réplica injoignable : nouvel essai après ce délai, en secondes.
+REPLICA_RETRY_SECONDS = int(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+
+# ======================================================
+# CACHE
+# ======================================================
+# CACHE_BACKEND : file (défaut), redis ou locmem.
+#
+# Le cache doit être partagé par tous les processus : cache.bump()
+# (market/cache.py) n'invalide que le cache qu'il atteint. Avec locmem
+# (un cache par processus), les autres workers gunicorn serviraient des
+# pages, fragments et contacts périmés jusqu'à MARKET_CACHE_TIMEOUT.
+#
+# - file  : partagé par les processus d'une même machine (CACHE_DIR) ;
+# - redis : partagé entre machines, recommandé en production (REDIS_URL,
+#           sinon retombe sur file) ;
+# - locmem : un seul processus (tests, runserver), refusé si
+#            WEB_CONCURRENCY > 1.
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem" if TESTING else "file")
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+if CACHE_BACKEND == "locmem" and int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+    raise ImproperlyConfigured(
+        "CACHE_BACKEND=locmem n'est pas partagé entre les workers "
+        "(WEB_CONCURRENCY > 1) : utiliser file ou redis."
+    )
+
+if CACHE_BACKEND == "redis" and REDIS_URL:
+
+    CACHES = {
+
+        'default': {
+
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+
+            'LOCATION': REDIS_URL,
+
+        }
+
+    }
+
+elif CACHE_BACKEND in ("file", "redis"):
+
+    CACHES = {
+
+        'default': {
+
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+
+            'LOCATION': os.getenv("CACHE_DIR", BASE_DIR / ".cache"),
+
+        }
+
+    }
+
+else:
+
+    CACHES = {
+
+        'default': {
+
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+
+            'LOCATION': 'authentic-place',
+
+        }
+
+    }
+
+# Durée de vie des pages et fragments du catalogue (secondes)
+MARKET_CACHE_TIMEOUT = int(os.getenv("MARKET_CACHE_TIMEOUT", "600"))
+
+# Version déployée, incluse dans les ETag des pages (templates et
+# fichiers statiques changent à chaque déploiement). Render fournit
+# RENDER_GIT_COMMIT.
+RELEASE = os.getenv("RELEASE") or os.getenv("RENDER_GIT_COMMIT", "")
+
+
+# ======================================================
+# SESSIONS – voir market/sessions.py
+# ======================================================
+# SESSION_BACKEND : db (défaut), cache ou signed_cookies.
+# "cache" : Redis si CACHE_BACKEND=redis, sinon cached_db (cache
+# CACHE_BACKEND, base en secours).
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "db")
+
+if SESSION_BACKEND == "signed_cookies":
+    SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+elif SESSION_BACKEND == "cache" and CACHE_BACKEND == "redis" and REDIS_URL:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+elif SESSION_BACKEND == "cache":
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+SESSION_COOKIE_AGE = int(os.getenv("SESSION_COOKIE_AGE", str(14 * 24 * 3600)))
+
+# Messages flash dans un cookie : pas d'écriture de session pour eux
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Utilisateur chargé avec son Vendor (une seule jointure). ModelBackend
+# reste déclaré pour les sessions ouvertes avant son introduction (le
+# chemin du backend est enregistré dans la session).
+AUTHENTICATION_BACKENDS = [
+    'market.sessions.VendorModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+
+# ======================================================
+# ASGI (uvicorn) – voir authentic_place/gunicorn_asgi.py
+# ======================================================
+# True : accueil, pages détail et listes JSON servis par les vues async
+# (market/async_views.py). Activé par défaut par authentic_place/asgi.py.
+
+ASYNC_CATALOG_VIEWS = os.getenv("ASYNC_CATALOG_VIEWS", "False") == "True"
+
+
+# ======================================================
+# TÂCHES EN ARRIÈRE-PLAN (python manage.py run_worker)
+# ======================================================
+# True : exécution immédiate dans la requête (dev sans worker).
+
+TASK_QUEUE_EAGER = os.getenv("TASK_QUEUE_EAGER", "False") == "True"
+
+# Tâches terminées / échouées conservées N jours, puis supprimées par
+# python manage.py purge_jobs (cron, chaque nuit).
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "14"))
+
+
+# ======================================================
+# STATISTIQUES VENDEURS – voir market/analytics.py
+# ======================================================
+# Agrégats : python manage.py rollup_analytics (cron, toutes les 5 min)
+
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", str(not TESTING)) == "True"
+
+# Écriture du tampon en mémoire vers le journal : au plus tard toutes les
+# N secondes, ou dès N compteurs distincts.
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "5"))
+
+ANALYTICS_BUFFER_SIZE = int(os.getenv("ANALYTICS_BUFFER_SIZE", "500"))
+
+# Popularité des produits (market/popularity.py) : une vue compte 1, un
+# clic WhatsApp POPULARITY_CLICK_WEIGHT ; le poids d'un jour est divisé
+# par deux tous les POPULARITY_HALF_LIFE_DAYS jours. Après modification :
+# python manage.py rebuild_popularity
+
+POPULARITY_HALF_LIFE_DAYS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", "7"))
+
+POPULARITY_CLICK_WEIGHT = float(os.getenv("POPULARITY_CLICK_WEIGHT", "5"))
+
+POPULARITY_EPOCH = os.getenv("POPULARITY_EPOCH", "2026-01-01")
+
 
 # ======================================================
 # PASSWORD VALIDATION
@@ -223,7 +509,39 @@ STATICFILES_DIRS = [
 
 ]
 
-STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# WhiteNoise (hachage + gzip/brotli) + optimisation des images,
+# dérivés WebP, dédoublonnage et budget de poids (market/staticfiles.py).
+# Django >= 5.1 ignore STATICFILES_STORAGE : passer par STORAGES.
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "market.staticfiles.OptimizedStaticFilesStorage",
+    },
+}
+
+# Fichier absent du manifeste (collectstatic pas encore lancé, tests) :
+# URL non hachée plutôt qu'une erreur 500 (voir aussi
+# OptimizedStaticFilesStorage.stored_name).
+WHITENOISE_MANIFEST_STRICT = False
+
+# Dimension maximale (px) des images collectées, par motif de nom
+STATIC_IMAGE_MAX_DIMENSION = 1024
+
+STATIC_IMAGE_SIZES = {
+    'logo-auth.png': 256,
+    'default-avatar.png': 256,
+    'default-product.png': 480,
+}
+
+# Poids maximal (octets) d'un fichier collecté ; None : pas de limite
+STATIC_ASSET_BUDGET = 200 * 1024
+
+# Fichiers de l'admin Django (sources non minifiées, hors de notre contrôle)
+STATIC_ASSET_BUDGETS = {
+    'admin/*': None,
+}
 
 
 # ======================================================
@@ -7,6 +7,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from market.metrics import metrics_view
+
 urlpatterns = [
     # 🔐 Admin Django
     path('admin/', admin.site.urls),
@@ -20,6 +22,9 @@ urlpatterns = [
 
     # 🔑 Auth Django (mot de passe oublié, reset, etc.)
     path('accounts/', include('django.contrib.auth.urls')),
+
+    # 📊 Métriques Prometheus
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # 🖼️ Media en développement uniquement
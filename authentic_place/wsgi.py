@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'authentic_place.settings')
 
 application = get_wsgi_application()
+
+# Compilation des templates avant la première requête
+from market.template_backend import preload_templates  # noqa: E402
+
+preload_templates()
+
+# Détection du backend de recherche (table FTS5) avant la première requête
+from market.search import preload_search_backend  # noqa: E402
+
+preload_search_backend()
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from market.models import Category, Vendor, Product
+from market import bulk, cache
+from market.forms import ProductAdminForm
+from market.models import ArchivedProduct, Category, Vendor, Product, Job
 
 
 @admin.register(Vendor)
@@ -8,11 +10,20 @@ class VendorAdmin(admin.ModelAdmin):
         'name',
         'user',
         'subscription_plan',
+        'is_premium',
+        'active_products_count',
         'is_verified',
         'created_at'
     )
-    list_filter = ('subscription_plan', 'is_verified')
+    list_filter = ('subscription_plan', 'is_premium', 'is_verified')
     search_fields = ('name', 'whatsapp_number')
+    actions = ('recount_active_products',)
+
+    @admin.action(description="Recalculer le compteur de produits actifs")
+    def recount_active_products(self, request, queryset):
+        updated = queryset.recount_active_products()
+        cache.bump(cache.VENDORS)
+        self.message_user(request, f"{updated} compteur(s) recalculé(s).")
 
 
 @admin.register(Category)
@@ -23,6 +34,35 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
+    form = ProductAdminForm
     list_display = ('name', 'vendor', 'price', 'is_active')
-    list_filter = ('vendor', 'category')
+    list_filter = ('is_active', 'vendor', 'category')
     search_fields = ('name',)
+    actions = ('export_csv', 'export_jsonl')
+
+    @admin.action(description="Exporter en CSV")
+    def export_csv(self, request, queryset):
+        return bulk.export_response(queryset, 'csv', 'produits')
+
+    @admin.action(description="Exporter en JSON Lines")
+    def export_jsonl(self, request, queryset):
+        return bulk.export_response(queryset, 'jsonl', 'produits')
+
+
+@admin.register(ArchivedProduct)
+class ArchivedProductAdmin(admin.ModelAdmin):
+    list_display = ('name', 'vendor_name', 'price', 'deactivated_at', 'archived_at')
+    search_fields = ('name', 'vendor_name')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('task', 'status', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'task')
+    readonly_fields = ('last_error', 'result', 'locked_by', 'locked_at')
@@ -0,0 +1,448 @@
+"""
+Statistiques vendeurs : vues des pages produit et vendeur, clics WhatsApp.
+
+Chemin d'écriture, hors de la requête :
+
+1. `record()` incrémente un compteur en mémoire (par processus), par
+   (type, cible, jour) ;
+2. un thread du processus écrit ces compteurs par lots dans le journal
+   `AnalyticsEvent` (un seul INSERT groupé), toutes les
+   `ANALYTICS_FLUSH_SECONDS` secondes ou dès `ANALYTICS_BUFFER_SIZE`
+   compteurs distincts ;
+3. `python manage.py rollup_analytics` (cron, toutes les quelques
+   minutes) reporte le journal dans les agrégats journaliers
+   `ProductDailyStats` / `VendorDailyStats` et le vide ; la popularité
+   des produits concernés est mise à jour au passage (market.popularity).
+
+Le dashboard ne lit que les agrégats : aucune écriture sur les tables du
+catalogue, aucun GROUP BY sur le journal. Les compteurs d'un processus
+arrêté brutalement (kill -9) sont perdus ; un arrêt normal les écrit.
+
+    @query_budget(3)
+    @track_view(AnalyticsEvent.PRODUCT_VIEW)
+    @read_replica
+    def product_detail(request, pk): ...
+"""
+
+import atexit
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import F, Sum
+from django.utils.timezone import localdate
+
+from . import popularity
+from .metrics import registry
+from .models import (
+    AnalyticsEvent,
+    Product,
+    ProductDailyStats,
+    Vendor,
+    VendorDailyStats,
+)
+
+
+logger = logging.getLogger('market.analytics')
+
+BATCH_SIZE = 1000
+
+# Au-delà (base indisponible), les compteurs non écrits sont abandonnés.
+MAX_PENDING_FACTOR = 10
+
+SUMMARY_DAYS = 30
+
+TOP_PRODUCTS = 10
+
+# Cible de chaque type d'événement
+TARGET_FIELDS = {
+    AnalyticsEvent.PRODUCT_VIEW: 'product_id',
+    AnalyticsEvent.VENDOR_VIEW: 'vendor_id',
+    AnalyticsEvent.WHATSAPP_CLICK: 'product_id',
+}
+
+# Robots d'indexation et aperçus de liens (WhatsApp, Facebook...)
+_BOT_RE = re.compile(
+    r'bot|crawl|spider|slurp|preview|facebookexternalhit|whatsapp|headless',
+    re.IGNORECASE,
+)
+
+
+def is_enabled():
+    return getattr(settings, 'ANALYTICS_ENABLED', True)
+
+
+# =====================================================
+# TAMPON EN MÉMOIRE
+# =====================================================
+
+class EventBuffer:
+    """
+    Compteurs en attente d'écriture, protégés par un verrou : `add()` ne
+    fait qu'un incrément en mémoire, utilisable depuis une vue async.
+    """
+
+    def __init__(self, size=None, interval=None):
+        self.size = size or getattr(settings, 'ANALYTICS_BUFFER_SIZE', 500)
+        self.interval = interval or getattr(settings, 'ANALYTICS_FLUSH_SECONDS', 5)
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def add(self, kind, product_id=None, vendor_id=None, count=1):
+        key = (kind, product_id, vendor_id, localdate())
+        with self._lock:
+            self._pending[key] += count
+            full = len(self._pending) >= self.size
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return sum(self._pending.values())
+
+    def flush(self):
+        """
+        Écrit les compteurs en attente (un INSERT groupé). Renvoie le
+        nombre de lignes ajoutées au journal.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+
+        try:
+            AnalyticsEvent.objects.bulk_create(
+                [
+                    AnalyticsEvent(
+                        kind=kind,
+                        product_id=product_id,
+                        vendor_id=vendor_id,
+                        day=day,
+                        count=count,
+                    )
+                    for (kind, product_id, vendor_id, day), count
+                    in pending.items()
+                ],
+                batch_size=BATCH_SIZE,
+            )
+        except Exception:
+            logger.exception("Écriture des statistiques impossible")
+            self._restore(pending)
+            return 0
+
+        registry.inc(
+            'market_analytics_events_total', {},
+            "Événements statistiques écrits dans le journal.",
+            sum(pending.values())
+        )
+        return len(pending)
+
+    def _restore(self, pending):
+        with self._lock:
+            if len(self._pending) + len(pending) > self.size * MAX_PENDING_FACTOR:
+                logger.warning(
+                    "%s compteur(s) de statistiques abandonné(s)", len(pending)
+                )
+                registry.inc(
+                    'market_analytics_dropped_total', {},
+                    "Événements statistiques abandonnés (base indisponible).",
+                    sum(pending.values())
+                )
+                return
+            self._pending.update(pending)
+
+    def _ensure_thread(self):
+        # Thread démarré à la première écriture, et de nouveau dans chaque
+        # processus enfant (gunicorn --preload : les threads ne survivent
+        # pas au fork).
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is None:
+                atexit.register(self.flush)
+            else:
+                # Compteurs hérités du parent : déjà comptés par lui.
+                self._pending = Counter()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name='analytics-flush', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            finally:
+                # Connexion propre à ce thread : rendue entre deux lots.
+                connections.close_all()
+
+
+buffer = EventBuffer()
+
+
+def record(kind, product_id=None, vendor_id=None, count=1):
+    if is_enabled():
+        buffer.add(kind, product_id=product_id, vendor_id=vendor_id, count=count)
+
+
+def is_trackable(request):
+    """
+    Visite d'un humain : GET, ni robot, ni préchargement du navigateur.
+    """
+    if request.method != 'GET':
+        return False
+    purpose = request.headers.get('Sec-Purpose') or request.headers.get('Purpose')
+    if purpose and purpose.startswith('prefetch'):
+        return False
+    return not _BOT_RE.search(request.headers.get('User-Agent', ''))
+
+
+def record_click(request, product_id=None, vendor_id=None):
+    """
+    Clic vers WhatsApp : compteur en mémoire seulement, aucune écriture
+    dans la requête.
+    """
+    if is_trackable(request):
+        record(
+            AnalyticsEvent.WHATSAPP_CLICK,
+            product_id=product_id,
+            vendor_id=vendor_id,
+        )
+
+
+def _track(request, response, kind, kwargs):
+    if response.status_code not in (200, 304) or not is_trackable(request):
+        return
+    record(kind, **{TARGET_FIELDS[kind]: kwargs['pk']})
+
+
+def track_view(kind):
+    """
+    Compte les vues d'une page détail (`pk` dans l'URL), y compris celles
+    servies par le cache ou en 304 : à placer au-dessus de `@conditional`
+    et `@cache_public_page`.
+    """
+    def decorator(view_func):
+
+        if iscoroutinefunction(view_func):
+
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                response = await view_func(request, *args, **kwargs)
+                _track(request, response, kind, kwargs)
+                return response
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = view_func(request, *args, **kwargs)
+            _track(request, response, kind, kwargs)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+# =====================================================
+# AGRÉGATS (python manage.py rollup_analytics)
+# =====================================================
+
+def _increment(model, key, delta):
+    return model.objects.filter(**dict(key)).update(
+        **{field: F(field) + value for field, value in delta.items()}
+    )
+
+
+def _apply(model, deltas):
+    """
+    `deltas` : {((champ, valeur), ...) : Counter(champ=incrément)}.
+    """
+    missing = {
+        key: delta for key, delta in deltas.items()
+        if not _increment(model, key, delta)
+    }
+    if not missing:
+        return
+
+    # Premier événement de la journée : insertion idempotente, puis
+    # incrément (un autre processus a pu créer la ligne entre-temps).
+    model.objects.bulk_create(
+        [model(**dict(key)) for key in missing],
+        ignore_conflicts=True,
+    )
+    for key, delta in missing.items():
+        _increment(model, key, delta)
+
+
+def _rollup_batch(batch_size):
+    with transaction.atomic():
+        events = AnalyticsEvent.objects.order_by('pk')
+        if connection.features.has_select_for_update_skip_locked:
+            # Deux exécutions simultanées ne comptent pas deux fois.
+            events = events.select_for_update(skip_locked=True)
+
+        rows = list(events.values_list(
+            'pk', 'kind', 'product_id', 'vendor_id', 'day', 'count'
+        )[:batch_size])
+        if not rows:
+            return 0
+
+        product_vendors = dict(
+            Product.objects
+            .filter(pk__in={row[2] for row in rows if row[2]})
+            .values_list('pk', 'vendor_id')
+        )
+        known_vendors = set(
+            Vendor.objects
+            .filter(pk__in={row[3] for row in rows if row[3]})
+            .values_list('pk', flat=True)
+        )
+
+        product_deltas = defaultdict(Counter)
+        vendor_deltas = defaultdict(Counter)
+
+        # Événements d'un produit ou vendeur supprimé depuis : ignorés.
+        for _, kind, product_id, vendor_id, day, count in rows:
+            if product_id is None:
+                # Vue de la page vendeur, ou contact depuis cette page
+                if vendor_id in known_vendors:
+                    field = (
+                        'views' if kind == AnalyticsEvent.VENDOR_VIEW
+                        else 'whatsapp_clicks'
+                    )
+                    vendor_deltas[(('vendor_id', vendor_id), ('day', day))][field] += count
+                continue
+
+            vendor_id = product_vendors.get(product_id)
+            if vendor_id is None:
+                continue
+
+            if kind == AnalyticsEvent.PRODUCT_VIEW:
+                product_field, vendor_field = 'views', 'product_views'
+            else:
+                product_field = vendor_field = 'whatsapp_clicks'
+
+            product_key = (
+                ('product_id', product_id), ('vendor_id', vendor_id), ('day', day)
+            )
+            product_deltas[product_key][product_field] += count
+            vendor_deltas[(('vendor_id', vendor_id), ('day', day))][vendor_field] += count
+
+        _apply(ProductDailyStats, product_deltas)
+        _apply(VendorDailyStats, vendor_deltas)
+
+        scores = defaultdict(float)
+        for key, delta in product_deltas.items():
+            fields = dict(key)
+            scores[fields['product_id']] += popularity.day_score(
+                fields['day'], delta['views'], delta['whatsapp_clicks']
+            )
+        popularity.add_scores(scores)
+
+        AnalyticsEvent.objects.filter(pk__in=[row[0] for row in rows]).delete()
+
+    return len(rows)
+
+
+def rollup_events(batch_size=BATCH_SIZE, pause=0, progress=None):
+    """
+    Reporte le journal dans les agrégats journaliers, par lots : chaque
+    lot est agrégé puis supprimé dans la même transaction.
+    """
+    total = 0
+
+    while True:
+        done = _rollup_batch(batch_size)
+        if not done:
+            return total
+
+        total += done
+        if progress:
+            progress(total)
+        if pause:
+            time.sleep(pause)
+
+
+# =====================================================
+# LECTURE (dashboard vendeur)
+# =====================================================
+
+def vendor_summary(vendor, days=SUMMARY_DAYS):
+    """
+    Totaux et série journalière des `days` derniers jours (jours sans
+    événement compris), depuis `VendorDailyStats` uniquement.
+    """
+    today = localdate()
+    since = today - timedelta(days=days - 1)
+
+    rows = {
+        row['day']: row for row in (
+            VendorDailyStats.objects
+            .filter(vendor=vendor, day__gte=since)
+            .values('day', 'views', 'product_views', 'whatsapp_clicks')
+        )
+    }
+
+    daily = []
+    for offset in range(days):
+        day = since + timedelta(days=offset)
+        daily.append(rows.get(day) or {
+            'day': day, 'views': 0, 'product_views': 0, 'whatsapp_clicks': 0,
+        })
+
+    peak = max((row['product_views'] + row['views'] for row in daily), default=0)
+    for row in daily:
+        visits = row['product_views'] + row['views']
+        row['height'] = round(100 * visits / peak) if peak else 0
+
+    return {
+        'days': days,
+        'daily': daily,
+        'views': sum(row['views'] for row in daily),
+        'product_views': sum(row['product_views'] for row in daily),
+        'whatsapp_clicks': sum(row['whatsapp_clicks'] for row in daily),
+    }
+
+
+def top_products(vendor, days=SUMMARY_DAYS, limit=TOP_PRODUCTS):
+    """
+    Produits les plus consultés du vendeur, avec leur taux de clic
+    WhatsApp (produits archivés exclus).
+    """
+    since = localdate() - timedelta(days=days - 1)
+
+    products = list(
+        ProductDailyStats.objects
+        .filter(vendor=vendor, day__gte=since)
+        .values('product_id', 'product__name')
+        .annotate(views=Sum('views'), whatsapp_clicks=Sum('whatsapp_clicks'))
+        .order_by('-views', '-whatsapp_clicks')[:limit]
+    )
+
+    for product in products:
+        product['name'] = product.pop('product__name')
+        product['conversion'] = (
+            round(100 * product['whatsapp_clicks'] / product['views'], 1)
+            if product['views'] else None
+        )
+    return products
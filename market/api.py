@@ -0,0 +1,340 @@
+"""
+Sérialisation de l'API JSON (listes produits / vendeurs).
+
+Les lignes sont lues avec `.values()` : pas d'instances de modèles, et
+les URL absolues sont construites à partir d'un préfixe calculé une
+seule fois par requête.
+
+Paramètres communs :
+    ?fields=id,name     sélection de champs
+    ?limit=50           taille de page (max 100)
+    ?cursor=...         page suivante / précédente
+    ?sort=popular       tri (produits : recent par défaut, popular)
+    ?stream=ndjson      flux NDJSON de tout le catalogue (trié selon ?sort=)
+    ?stream=json        flux d'un tableau JSON de tout le catalogue
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+from django.http import JsonResponse, StreamingHttpResponse
+from django.templatetags.static import static
+
+from .pagination import CursorPaginator, DEFAULT_ORDERING
+from .popularity import POPULAR, POPULAR_ORDERING, RECENT
+from .querybudget import check_budget, count_queries
+
+
+DEFAULT_LIMIT = 50
+
+MAX_LIMIT = 100
+
+STREAM_CHUNK_SIZE = 2000
+
+# Un flux lit tout le catalogue en une requête (curseur), quelle que soit
+# sa taille ; vérifié à la fin du flux, après le middleware de budget.
+STREAM_QUERY_BUDGET = 1
+
+# Colonnes toujours lues : clés du curseur.
+CURSOR_COLUMNS = ('id', 'created_at')
+
+
+class Resource:
+    """
+    Décrit une liste exposée par l'API.
+
+    `fields` : nom public -> colonne `.values()`.
+    `image_field` / `default_image` : champ image converti en `image_url`.
+    `orderings` : valeur de `?sort=` -> tri ; la première est le défaut.
+    """
+
+    def __init__(self, fields, image_field, default_image, orderings=None):
+        self.fields = fields
+        self.image_field = image_field
+        self.default_image = default_image
+        self.orderings = orderings or {RECENT: DEFAULT_ORDERING}
+
+    def columns(self, selected, ordering=DEFAULT_ORDERING):
+        columns = set(CURSOR_COLUMNS)
+        columns.update(field.lstrip('-') for field in ordering)
+        for name in selected:
+            columns.add(self.fields[name])
+        return sorted(columns)
+
+
+PRODUCT_RESOURCE = Resource(
+    fields={
+        'id': 'id',
+        'name': 'name',
+        'price': 'price',
+        'description': 'description',
+        'image_url': 'image',
+        'vendor': 'vendor__name',
+        'vendor_whatsapp': 'vendor__whatsapp_number',
+    },
+    image_field='image',
+    default_image='default-product.png',
+    orderings={
+        RECENT: DEFAULT_ORDERING,
+        POPULAR: POPULAR_ORDERING,
+    },
+)
+
+VENDOR_RESOURCE = Resource(
+    fields={
+        'id': 'id',
+        'name': 'name',
+        'description': 'description',
+        'subscription_plan': 'subscription_plan',
+        'is_premium': 'is_premium',
+        'whatsapp_number': 'whatsapp_number',
+        'image_url': 'image',
+    },
+    image_field='image',
+    default_image='default-avatar.png',
+)
+
+
+class APIError(Exception):
+    pass
+
+
+def error_response(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+# =====================================================
+# PARAMÈTRES
+# =====================================================
+
+def parse_fields(request, resource):
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(resource.fields)
+
+    selected = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in selected if name not in resource.fields]
+    if unknown:
+        raise APIError(f"Champs inconnus : {', '.join(unknown)}")
+    return selected
+
+
+def parse_ordering(request, resource):
+    sort = request.GET.get('sort')
+    if not sort:
+        return next(iter(resource.orderings.values()))
+    if sort not in resource.orderings:
+        raise APIError(
+            f"Paramètre 'sort' invalide ({', '.join(resource.orderings)})"
+        )
+    return resource.orderings[sort]
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise APIError("Paramètre 'limit' invalide")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+# =====================================================
+# SÉRIALISATION
+# =====================================================
+
+class RowSerializer:
+    """
+    Transforme une ligne `.values()` en dict public.
+    """
+
+    def __init__(self, request, model, resource, selected):
+        self.resource = resource
+        self.selected = selected
+        self.storage = model._meta.get_field(resource.image_field).storage
+
+        # Préfixe absolu calculé une fois, pas par ligne.
+        self.origin = f'{request.scheme}://{request.get_host()}'
+        self.default_image_url = self.absolute(static(resource.default_image))
+
+    def absolute(self, url):
+        if url.startswith('/'):
+            return self.origin + url
+        return url
+
+    def __call__(self, row):
+        data = {}
+        for name in self.selected:
+            value = row[self.resource.fields[name]]
+            if name == 'image_url':
+                value = (
+                    self.absolute(self.storage.url(value))
+                    if value else self.default_image_url
+                )
+            data[name] = value
+        return data
+
+
+def _parse_page_params(request, resource):
+    selected = parse_fields(request, resource)
+    limit = parse_limit(request)
+    ordering = parse_ordering(request, resource)
+    return selected, limit, ordering
+
+
+def _page_response(page, serialize):
+    return JsonResponse({
+        'results': [serialize(row) for row in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def paginated_response(request, queryset, resource):
+    try:
+        selected, limit, ordering = _parse_page_params(request, resource)
+    except APIError as exc:
+        return error_response(str(exc))
+
+    serialize = RowSerializer(request, queryset.model, resource, selected)
+    rows = queryset.values(*resource.columns(selected, ordering))
+
+    paginator = CursorPaginator(rows, limit, ordering=ordering)
+    page = paginator.get_page(request.GET.get('cursor'))
+
+    return _page_response(page, serialize)
+
+
+async def apaginated_response(request, queryset, resource):
+    try:
+        selected, limit, ordering = _parse_page_params(request, resource)
+    except APIError as exc:
+        return error_response(str(exc))
+
+    serialize = RowSerializer(request, queryset.model, resource, selected)
+    rows = queryset.values(*resource.columns(selected, ordering))
+
+    paginator = CursorPaginator(rows, limit, ordering=ordering)
+    page = await paginator.aget_page(request.GET.get('cursor'))
+
+    return _page_response(page, serialize)
+
+
+def _stream_params(request, resource):
+    selected = parse_fields(request, resource)
+    ordering = parse_ordering(request, resource)
+    return selected, ordering
+
+
+def _stream_rows(queryset, resource, selected, ordering, alias):
+    # Le flux est lu après la sortie de `@read_replica` : base de lecture
+    # choisie avant (réplica, épinglage), pas pendant l'itération.
+    return (
+        queryset
+        .using(alias)
+        .values(*resource.columns(selected, ordering))
+        .order_by(*ordering)
+    )
+
+
+def _stream_name(request):
+    match = request.resolver_match
+    return f"{match.view_name if match else request.path} (flux)"
+
+
+STREAM_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+def streaming_response(request, queryset, resource, mode):
+    try:
+        selected, ordering = _stream_params(request, resource)
+    except APIError as exc:
+        return error_response(str(exc))
+
+    serialize = RowSerializer(request, queryset.model, resource, selected)
+    alias = router.db_for_read(queryset.model)
+    rows = _stream_rows(queryset, resource, selected, ordering, alias)
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    name = _stream_name(request)
+
+    def records():
+        with count_queries() as counter:
+            for row in rows.iterator(chunk_size=STREAM_CHUNK_SIZE):
+                yield encoder.encode(serialize(row))
+        check_budget(name, STREAM_QUERY_BUDGET, counter)
+
+    if mode == 'ndjson':
+        def body():
+            for record in records():
+                yield record + '\n'
+
+    else:
+        def body():
+            yield '['
+            separator = ''
+            for record in records():
+                yield separator + record
+                separator = ','
+            yield ']'
+
+    return StreamingHttpResponse(body(), content_type=STREAM_CONTENT_TYPES[mode])
+
+
+async def astreaming_response(request, queryset, resource, mode):
+    """
+    Flux asynchrone (`aiterator()`) : en ASGI, un client lent n'occupe
+    aucun thread pendant la lecture du catalogue.
+    """
+    try:
+        selected, ordering = _stream_params(request, resource)
+    except APIError as exc:
+        return error_response(str(exc))
+
+    serialize = RowSerializer(request, queryset.model, resource, selected)
+    # Le routeur peut ouvrir la connexion au réplica : hors boucle.
+    alias = await sync_to_async(router.db_for_read)(queryset.model)
+    rows = _stream_rows(queryset, resource, selected, ordering, alias)
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    name = _stream_name(request)
+
+    async def records():
+        with count_queries() as counter:
+            async for row in rows.aiterator(chunk_size=STREAM_CHUNK_SIZE):
+                yield encoder.encode(serialize(row))
+        check_budget(name, STREAM_QUERY_BUDGET, counter)
+
+    if mode == 'ndjson':
+        async def body():
+            async for record in records():
+                yield record + '\n'
+
+    else:
+        async def body():
+            yield '['
+            separator = ''
+            async for record in records():
+                yield separator + record
+                separator = ','
+            yield ']'
+
+    return StreamingHttpResponse(body(), content_type=STREAM_CONTENT_TYPES[mode])
+
+
+def list_response(request, queryset, resource):
+    mode = request.GET.get('stream')
+    if mode in STREAM_CONTENT_TYPES:
+        return streaming_response(request, queryset, resource, mode)
+    if mode:
+        return error_response("Paramètre 'stream' invalide (ndjson, json)")
+    return paginated_response(request, queryset, resource)
+
+
+async def alist_response(request, queryset, resource):
+    mode = request.GET.get('stream')
+    if mode in STREAM_CONTENT_TYPES:
+        return await astreaming_response(request, queryset, resource, mode)
+    if mode:
+        return error_response("Paramètre 'stream' invalide (ndjson, json)")
+    return await apaginated_response(request, queryset, resource)
@@ -8,4 +8,5 @@ from django.db.utils import OperationalError
 class MarketConfig(AppConfig):
     name = 'market'
 
-    
\ No newline at end of file
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,120 @@
+"""
+Archivage des produits supprimés.
+
+Un produit supprimé par son vendeur est seulement désactivé
+(`Product.soft_delete()`). Après `ARCHIVE_AFTER_DAYS` jours, il est copié
+dans `ArchivedProduct` puis retiré de `market_product`, par lots courts :
+chaque lot est une petite transaction, la table chaude reste petite et
+n'est jamais verrouillée longtemps.
+
+    python manage.py archive_products --days 30 --purge-days 365
+"""
+
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils.timezone import now
+
+from .models import ArchivedProduct, Product
+
+
+ARCHIVE_AFTER_DAYS = 30
+
+BATCH_SIZE = 500
+
+ARCHIVE_FIELDS = (
+    'pk',
+    'vendor_id',
+    'vendor__name',
+    'category__slug',
+    'name',
+    'description',
+    'price',
+    'image',
+    'created_at',
+    'deactivated_at',
+)
+
+
+def _archive_batch(cutoff, batch_size):
+    with transaction.atomic():
+        rows = list(
+            Product.objects
+            .archivable(cutoff)
+            .order_by('deactivated_at', 'pk')
+            .values(*ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        ArchivedProduct.objects.bulk_create(
+            [
+                ArchivedProduct(
+                    product_id=row['pk'],
+                    vendor_id=row['vendor_id'],
+                    vendor_name=row['vendor__name'],
+                    category_slug=row['category__slug'] or '',
+                    name=row['name'],
+                    description=row['description'],
+                    price=row['price'],
+                    image=row['image'] or '',
+                    created_at=row['created_at'],
+                    deactivated_at=row['deactivated_at'],
+                )
+                for row in rows
+            ],
+            # Relance après interruption : lignes déjà archivées ignorées
+            ignore_conflicts=True,
+        )
+
+        # delete() du queryset : signaux post_delete (dérivés d'image,
+        # cache) ; le quota n'est pas concerné, les produits sont inactifs.
+        Product.objects.filter(
+            pk__in=[row['pk'] for row in rows]
+        ).delete()
+
+    return len(rows)
+
+
+def archive_inactive_products(days=ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE,
+                              pause=0, progress=None):
+    """
+    Déplace les produits désactivés depuis plus de `days` jours.
+    Renvoie le nombre de produits archivés.
+    """
+    cutoff = now() - timedelta(days=days)
+    total = 0
+
+    while True:
+        archived = _archive_batch(cutoff, batch_size)
+        if not archived:
+            return total
+
+        total += archived
+        if progress:
+            progress(total)
+        if pause:
+            time.sleep(pause)
+
+
+def purge_archive(days, batch_size=BATCH_SIZE, pause=0):
+    """
+    Supprime définitivement les archives de plus de `days` jours.
+    """
+    cutoff = now() - timedelta(days=days)
+    total = 0
+
+    while True:
+        ids = list(
+            ArchivedProduct.objects
+            .filter(archived_at__lt=cutoff)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+
+        total += ArchivedProduct.objects.filter(pk__in=ids).delete()[0]
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,226 @@
+"""
+Vues publiques du catalogue en version async (ASGI).
+
+Mêmes URL, mêmes templates et mêmes budgets de requêtes que market.views ;
+l'ORM est appelé en async (`aget`, `async for`, `aiterator`) et tout est
+chargé avant le rendu : un template ne déclenche aucune requête. Le
+rendu lui-même passe par `sync_to_async` (`arender`). Les lectures vont
+sur le réplica comme en synchrone (market.dbrouter).
+
+Sélectionnées par `ASYNC_CATALOG_VIEWS` (activé par
+authentic_place/asgi.py) ; voir authentic_place/gunicorn_asgi.py pour le
+déploiement uvicorn.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect
+from django.template.loader import render_to_string
+from django.views.decorators.cache import never_cache
+
+from . import analytics, facets, whatsapp
+from .analytics import track_view
+from .api import alist_response, PRODUCT_RESOURCE, VENDOR_RESOURCE
+from .cache import (
+    afragment_version,
+    aget_categories,
+    aget_home_vendors,
+    aget_product_contact,
+    aget_vendor_contact,
+    cache_public_page,
+)
+from .conditional import (
+    acatalog_freshness,
+    aproduct_freshness,
+    avendor_freshness,
+    conditional,
+    list_namespaces,
+)
+from .dbrouter import read_replica
+from .models import AnalyticsEvent, Product, Vendor, detail_url
+from .pagination import CursorPaginator, DEFAULT_ORDERING
+from .popularity import POPULAR, POPULAR_ORDERING
+from .querybudget import query_budget
+from .search import asearch_products
+from .views import HOME_PRODUCT_FIELDS, HOME_VENDOR_FIELDS
+
+
+# =====================================================
+# RENDU
+# =====================================================
+
+async def arender(request, template_name, context):
+    """
+    `render()` hors de la boucle d'événements : les fragments
+    `{% cache %}` et les context processors font des E/S synchrones
+    (cache, session).
+    """
+    content = await sync_to_async(render_to_string)(
+        template_name, context, request
+    )
+    return HttpResponse(content)
+
+
+# =====================================================
+# API – LISTES (JSON)
+# =====================================================
+
+@query_budget(1)
+@read_replica
+@conditional(acatalog_freshness)
+async def vendor_list(request):
+    vendors = Vendor.objects.filter(is_verified=True)
+
+    return await alist_response(request, vendors, VENDOR_RESOURCE)
+
+
+@query_budget(1)
+@read_replica
+@conditional(acatalog_freshness)
+async def product_list(request):
+    products = Product.live.all()
+
+    return await alist_response(request, products, PRODUCT_RESOURCE)
+
+
+# =====================================================
+# PAGE D’ACCUEIL
+# =====================================================
+
+@query_budget(4)
+@read_replica
+@cache_public_page(namespaces=list_namespaces)
+async def accueil(request):
+    query = request.GET.get('q', '').strip()
+    current_category = request.GET.get('category')
+
+    products_qs = (
+        Product.live
+        .select_related('vendor')
+        .only(*HOME_PRODUCT_FIELDS)
+        .order_by('-created_at')
+    )
+
+    if current_category:
+        products_qs = products_qs.filter(category__slug=current_category)
+
+    current_price = request.GET.get('price')
+    price_range = facets.price_range(current_price) if current_price else None
+    if price_range:
+        low, high = price_range
+        products_qs = products_qs.filter(price__gte=low)
+        if high is not None:
+            products_qs = products_qs.filter(price__lt=high)
+
+    ordering = DEFAULT_ORDERING
+    if query:
+        products_qs = await asearch_products(products_qs, query)
+        ordering = ('-search_rank',) + DEFAULT_ORDERING
+
+    # Tri « Populaires » : score précalculé (market.popularity)
+    current_sort = request.GET.get('sort')
+    if current_sort == POPULAR:
+        ordering = POPULAR_ORDERING
+    else:
+        current_sort = None
+
+    paginator = CursorPaginator(products_qs, 12, ordering=ordering)
+    products = await paginator.aget_page(request.GET.get('cursor'))
+
+    return await arender(request, 'market/index.html', {
+        'products': products,
+        'vendors': await aget_home_vendors(HOME_VENDOR_FIELDS),
+        'categories': await aget_categories(),
+        'facets': await facets.aget_facets(),
+        'query': query,
+        'current_category': current_category,
+        'current_price': current_price if price_range else None,
+        'current_sort': current_sort,
+        'cache_version': await afragment_version(),
+    })
+
+
+# =====================================================
+# PAGES DÉTAILS
+# =====================================================
+
+@query_budget(3)
+@track_view(AnalyticsEvent.PRODUCT_VIEW)
+@read_replica
+@conditional(aproduct_freshness)
+@cache_public_page()
+async def product_detail(request, pk):
+    try:
+        product = await (
+            Product.live
+            .select_related('vendor', 'category')
+            .aget(pk=pk)
+        )
+    except Product.DoesNotExist:
+        raise Http404
+
+    return await arender(request, 'market/product_detail.html', {
+        'product': product,
+    })
+
+
+@query_budget(4)
+@track_view(AnalyticsEvent.VENDOR_VIEW)
+@read_replica
+@conditional(avendor_freshness)
+@cache_public_page()
+async def vendor_detail(request, pk):
+    try:
+        vendor = await Vendor.objects.aget(pk=pk, is_verified=True)
+    except Vendor.DoesNotExist:
+        raise Http404
+
+    products = [
+        product async for product in (
+            vendor.products
+            .live()
+            .select_related('category')
+        )
+    ]
+
+    return await arender(request, 'market/vendor_detail.html', {
+        'vendor': vendor,
+        'products': products,
+    })
+
+
+# =====================================================
+# REDIRECTIONS WHATSAPP (clics comptés, voir market.whatsapp)
+# =====================================================
+
+@query_budget(1)
+@never_cache
+@read_replica
+async def whatsapp_product(request, product_id):
+    contact = await aget_product_contact(product_id)
+    if contact is None:
+        raise Http404
+
+    number, name = contact
+    analytics.record_click(request, product_id=product_id)
+
+    product_url = request.build_absolute_uri(
+        detail_url('product_detail', product_id)
+    )
+    return redirect(
+        whatsapp.wa_me_url(number, whatsapp.product_message(name, product_url))
+    )
+
+
+@query_budget(1)
+@never_cache
+@read_replica
+async def whatsapp_vendor(request, vendor_id):
+    contact = await aget_vendor_contact(vendor_id)
+    if contact is None:
+        raise Http404
+
+    number, name = contact
+    analytics.record_click(request, vendor_id=vendor_id)
+
+    return redirect(whatsapp.wa_me_url(number, whatsapp.vendor_message(name)))
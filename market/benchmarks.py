@@ -0,0 +1,380 @@
+"""
+Benchmarks des vues du marché, exécutés dans le processus via le client
+de test Django (pas de réseau) contre la base configurée.
+
+Chaque scénario enregistre la latence (p50 / p95 / p99), le temps de
+rendu des templates, le nombre de requêtes SQL et la taille des réponses.
+Les résultats sont écrits en JSON et peuvent être comparés à une
+référence d'un commit précédent.
+
+`run_servers()` compare en plus les profils de déploiement WSGI et ASGI
+sous charge de clients lents (`manage.py benchmark_servers`).
+"""
+
+import asyncio
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+
+from .models import Vendor, Product, Category
+from .querybudget import count_queries
+from .search import preload_search_backend
+
+
+# Régression signalée au-delà de +20 % (latence) ou +0 requête SQL
+DEFAULT_THRESHOLD = 0.20
+
+HTTP_HOST = 'localhost'
+
+
+class Scenario:
+
+    def __init__(self, name, url, user=None, stream=False):
+        self.name = name
+        self.url = url
+        self.user = user
+        self.stream = stream
+
+
+def build_scenarios():
+    """
+    Scénarios calculés à partir des données présentes en base.
+    """
+    product = (
+        Product.objects
+        .filter(is_active=True, vendor__is_verified=True)
+        .order_by('-pk')
+        .first()
+    )
+    vendor = product.vendor if product else None
+    category = Category.objects.filter(products__is_active=True).first()
+
+    word = product.name.split()[0] if product else 'produit'
+
+    scenarios = [
+        Scenario('accueil', reverse('home')),
+        Scenario('accueil_recherche', f"{reverse('home')}?q={word}"),
+    ]
+
+    if category:
+        scenarios.append(Scenario(
+            'accueil_categorie',
+            f"{reverse('home')}?category={category.slug}"
+        ))
+
+    if product:
+        scenarios.append(Scenario(
+            'product_detail', reverse('product_detail', args=[product.pk])
+        ))
+
+    if vendor:
+        scenarios += [
+            Scenario('vendor_detail', reverse('vendor_detail', args=[vendor.pk])),
+            Scenario('vendor_dashboard', reverse('vendor_dashboard'), user=vendor.user),
+        ]
+
+    scenarios += [
+        Scenario('product_list', reverse('product_list')),
+        Scenario('vendor_list', reverse('vendor_list')),
+        Scenario(
+            'product_list_stream',
+            f"{reverse('product_list')}?stream=ndjson",
+            stream=True
+        ),
+    ]
+
+    return scenarios
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+_RENDER_TIMING_RE = re.compile(r'\btpl;dur=([\d.]+)')
+
+
+def render_time(response):
+    """
+    Temps de rendu des templates (ms) annoncé par `Server-Timing`
+    (market.metrics), ou None.
+    """
+    match = _RENDER_TIMING_RE.search(response.get('Server-Timing', ''))
+    return float(match.group(1)) if match else None
+
+
+def measure(scenario, iterations, cold=False):
+    client = Client(HTTP_HOST=HTTP_HOST)
+    if scenario.user is not None:
+        client.force_login(scenario.user)
+
+    timings, queries, sizes, renders = [], [], [], []
+    status = None
+
+    for _ in range(iterations):
+        if cold:
+            cache.clear()
+
+        started = time.perf_counter()
+        with count_queries() as counter:
+            response = client.get(scenario.url)
+            if scenario.stream:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+        timings.append((time.perf_counter() - started) * 1000)
+
+        queries.append(counter.count)
+        sizes.append(size)
+        render = render_time(response)
+        if render is not None:
+            renders.append(render)
+        status = response.status_code
+
+    return {
+        'url': scenario.url,
+        'status': status,
+        'iterations': iterations,
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'render_p50_ms': round(percentile(renders, 0.50), 3) if renders else None,
+        'queries': max(queries),
+        'bytes': max(sizes),
+    }
+
+
+def run(iterations=50, cold=False, only=None):
+    # Comme wsgi.py / asgi.py : hors du compte de la première requête
+    preload_search_backend()
+
+    results = {}
+    for scenario in build_scenarios():
+        if only and scenario.name not in only:
+            continue
+        results[scenario.name] = measure(scenario, iterations, cold=cold)
+
+    return {
+        'catalog': {
+            'vendors': Vendor.objects.count(),
+            'products': Product.objects.count(),
+            'categories': Category.objects.count(),
+        },
+        'cold_cache': cold,
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Liste des régressions de `current` par rapport à `baseline`.
+    """
+    regressions = []
+
+    for name, now_ in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+
+        if now_['queries'] > before['queries']:
+            regressions.append(
+                f"{name} : {before['queries']} -> {now_['queries']} requêtes SQL"
+            )
+
+        for metric in ('p50_ms', 'p95_ms'):
+            if before[metric] and now_[metric] > before[metric] * (1 + threshold):
+                regressions.append(
+                    f"{name} : {metric} {before[metric]} -> {now_[metric]}"
+                )
+
+        if before['bytes'] and now_['bytes'] > before['bytes'] * (1 + threshold):
+            regressions.append(
+                f"{name} : {before['bytes']} -> {now_['bytes']} octets"
+            )
+
+    return regressions
+
+
+# =====================================================
+# SERVEURS WSGI / ASGI SOUS CLIENTS LENTS
+# =====================================================
+# Contrairement aux scénarios ci-dessus, ces mesures passent par le réseau :
+# chaque profil est lancé dans un vrai serveur (gunicorn sync, gunicorn +
+# uvicorn), puis des clients lents (envoi et lecture au compte-gouttes,
+# comme sur un réseau mobile) occupent les connexions pendant que des
+# sondes mesurent la latence des autres visiteurs.
+
+SERVER_PROFILES = {
+    'wsgi': [
+        '-m', 'gunicorn', 'authentic_place.wsgi:application',
+        '--worker-class', 'sync',
+    ],
+    'asgi': [
+        '-m', 'gunicorn', 'authentic_place.asgi:application',
+        '--config', 'authentic_place/gunicorn_asgi.py',
+    ],
+}
+
+SLOW_CHUNK = 16
+
+PROBE_TIMEOUT = 10.0
+
+
+def start_server(profile, port, workers):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port))
+    if profile == 'asgi':
+        env['ASYNC_CATALOG_VIEWS'] = 'True'
+
+    command = [sys.executable] + SERVER_PROFILES[profile] + [
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--access-logfile', os.devnull,
+        '--error-logfile', os.devnull,
+    ]
+    return subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+
+
+def wait_for_port(port, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def _request_bytes(path):
+    return (
+        f'GET {path} HTTP/1.1\r\n'
+        f'Host: {HTTP_HOST}\r\n'
+        'User-Agent: market-benchmark\r\n'
+        'Connection: close\r\n\r\n'
+    ).encode()
+
+
+async def _slow_client(port, path, delay, stop):
+    """
+    Envoie la requête et lit la réponse par petits morceaux espacés
+    de `delay` secondes, en boucle.
+    """
+    request = _request_bytes(path)
+
+    while not stop.is_set():
+        writer = None
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            for start in range(0, len(request), SLOW_CHUNK):
+                writer.write(request[start:start + SLOW_CHUNK])
+                await writer.drain()
+                await asyncio.sleep(delay)
+            while not stop.is_set() and await reader.read(SLOW_CHUNK * 64):
+                await asyncio.sleep(delay)
+        except OSError:
+            await asyncio.sleep(delay)
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+async def _probe(port, path, stop, timings, errors):
+    request = _request_bytes(path)
+
+    while not stop.is_set():
+        started = time.perf_counter()
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection('127.0.0.1', port), PROBE_TIMEOUT
+            )
+            writer.write(request)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), PROBE_TIMEOUT)
+            if not response.startswith((b'HTTP/1.1 200', b'HTTP/1.0 200')):
+                raise OSError(response[:40])
+            timings.append((time.perf_counter() - started) * 1000)
+        except (OSError, asyncio.TimeoutError):
+            errors.append(time.perf_counter() - started)
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+async def _load(port, path, slow_clients, probes, duration, delay):
+    stop = asyncio.Event()
+    timings, errors = [], []
+
+    tasks = [
+        asyncio.create_task(_slow_client(port, path, delay, stop))
+        for _ in range(slow_clients)
+    ]
+    # Les clients lents prennent d'abord les connexions disponibles.
+    await asyncio.sleep(delay * 2)
+
+    tasks += [
+        asyncio.create_task(_probe(port, path, stop, timings, errors))
+        for _ in range(probes)
+    ]
+
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.wait(tasks, timeout=PROBE_TIMEOUT + delay * 4)
+    for task in tasks:
+        task.cancel()
+
+    return timings, errors
+
+
+def run_servers(profiles=('wsgi', 'asgi'), path='/', workers=2,
+                slow_clients=20, probes=4, duration=10.0, delay=0.2,
+                port=8765):
+    """
+    Lance chaque profil de serveur et mesure la latence des sondes
+    pendant que `slow_clients` connexions lentes sont ouvertes.
+    """
+    results = {}
+
+    for offset, profile in enumerate(profiles):
+        server_port = port + offset
+        server = start_server(profile, server_port, workers)
+        try:
+            if not wait_for_port(server_port):
+                raise RuntimeError(f"Le serveur {profile} n'a pas démarré.")
+
+            timings, errors = asyncio.run(_load(
+                server_port, path, slow_clients, probes, duration, delay
+            ))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+        results[profile] = {
+            'requests': len(timings),
+            'errors': len(errors),
+            'throughput_rps': round(len(timings) / duration, 2),
+            'p50_ms': round(percentile(timings, 0.50), 3) if timings else None,
+            'p95_ms': round(percentile(timings, 0.95), 3) if timings else None,
+            'max_ms': round(max(timings), 3) if timings else None,
+        }
+
+    return {
+        'path': path,
+        'workers': workers,
+        'slow_clients': slow_clients,
+        'probes': probes,
+        'duration_s': duration,
+        'slow_delay_s': delay,
+        'results': results,
+    }
@@ -0,0 +1,262 @@
+"""
+Import / export en masse du catalogue d'un vendeur (CSV, JSON Lines).
+
+Import : chaque ligne est validée comme un `ProductForm` (voir
+`ProductImportForm`), la limite `Vendor.product_limit()` est respectée et
+les produits sont insérés par `bulk_create`, par lots, dans une seule
+transaction. Une seule ligne invalide et rien n'est importé : le vendeur
+corrige son fichier à partir du rapport d'erreurs et recommence.
+
+Export : flux ligne à ligne (`iterator()`), sans charger le catalogue
+en mémoire. En CSV, les textes commençant par `= + - @` sont préfixés
+d'une apostrophe (pas de formule exécutée par le tableur) ; l'import
+retire ce préfixe.
+"""
+
+import csv
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import StreamingHttpResponse
+
+from . import cache, facets
+from .forms import ProductImportForm
+from .models import Category, Product, Vendor
+from .search import get_search_backend
+
+
+IMPORT_COLUMNS = ('name', 'description', 'price', 'category')
+
+# Colonnes exportées. L'import ne lit que IMPORT_COLUMNS : `id`,
+# `is_active` et `created_at` sont informatifs, et réimporter un export
+# crée de nouveaux produits.
+EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('name', 'name'),
+    ('description', 'description'),
+    ('price', 'price'),
+    ('category', 'category__slug'),
+    ('is_active', 'is_active'),
+    ('created_at', 'created_at'),
+)
+
+BATCH_SIZE = 500
+
+# Garde-fou : au-delà, le fichier est refusé sans être lu en entier.
+MAX_ROWS = 5000
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Débuts de cellule interprétés comme une formule par les tableurs.
+FORMULA_PREFIXES = ('=', '+', '-', '@')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+class ImportResult:
+
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+
+# =====================================================
+# CELLULES CSV
+# =====================================================
+
+def escape_formula(value):
+    # Une apostrophe déjà présente devant une formule est doublée, pour
+    # que unescape_formula() rende la valeur d'origine.
+    if isinstance(value, str) and value.lstrip("'").startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def unescape_formula(value):
+    if value.startswith("'") and value.lstrip("'").startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+
+# =====================================================
+# IMPORT
+# =====================================================
+
+def read_rows(fileobj, fmt):
+    """
+    Lignes du fichier sous forme de dicts, avec leur numéro de ligne.
+    """
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, {
+                column: unescape_formula(value)
+                if isinstance(value, str) else value
+                for column, value in row.items()
+            }
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def _form_errors(form):
+    return '; '.join(
+        f"{field} : {' '.join(messages)}" if field != '__all__'
+        else ' '.join(messages)
+        for field, messages in form.errors.items()
+    )
+
+
+def import_products(vendor, fileobj, fmt, batch_size=BATCH_SIZE):
+    """
+    Importe les produits de `fileobj` pour `vendor`.
+    Renvoie un `ImportResult` (nombre créé, erreurs par ligne).
+    """
+    result = ImportResult()
+
+    categories = dict(Category.objects.values_list('slug', 'pk'))
+    remaining = vendor.product_limit() - vendor.active_products_count
+
+    products = []
+
+    try:
+        for line, row in read_rows(fileobj, fmt):
+            if len(products) + len(result.errors) >= MAX_ROWS:
+                result.add_error(line, f"Plus de {MAX_ROWS} lignes.")
+                break
+
+            if row is None:
+                result.add_error(line, "Ligne JSON invalide.")
+                continue
+
+            data = {
+                column: '' if row.get(column) is None
+                else str(row.get(column)).strip()
+                for column in IMPORT_COLUMNS
+            }
+
+            form = ProductImportForm(data)
+            if not form.is_valid():
+                result.add_error(line, _form_errors(form))
+                continue
+
+            category_id = None
+            if data['category']:
+                category_id = categories.get(data['category'])
+                if category_id is None:
+                    result.add_error(
+                        line, f"category : catégorie inconnue « {data['category']} »."
+                    )
+                    continue
+
+            if len(products) >= remaining:
+                result.add_error(
+                    line,
+                    f"Limite de {vendor.product_limit()} produits atteinte."
+                )
+                continue
+
+            product = form.save(commit=False)
+            product.vendor = vendor
+            product.category_id = category_id
+            products.append(product)
+
+    except (UnicodeDecodeError, csv.Error) as exc:
+        result.add_error(0, f"Fichier illisible : {exc}")
+
+    if result.errors or not products:
+        return result
+
+    with transaction.atomic():
+        # bulk_create ne passe pas par Product.save() : réservation du
+        # quota pour tout le lot, dans la même transaction.
+        vendors = Vendor.objects.filter(pk=vendor.pk)
+        if not vendors.acquire_product_slots(len(products)):
+            result.add_error(
+                0, f"Limite de {vendor.product_limit()} produits atteinte."
+            )
+            return result
+
+        created = Product.objects.bulk_create(products, batch_size=batch_size)
+
+        # bulk_create n'envoie pas post_save : index, facettes et cache
+        # à la main.
+        ids = [product.pk for product in created if product.pk]
+        backend = get_search_backend()
+        if len(ids) == len(created):
+            backend.index_products(ids)
+        else:
+            backend.index_vendor(vendor.pk)
+
+        facets.products_added(created)
+
+    cache.bump(cache.PRODUCTS)
+    result.created = len(created)
+    return result
+
+
+# =====================================================
+# EXPORT
+# =====================================================
+
+class _Echo:
+    """
+    Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de l'écrire.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, fmt):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    rows = (
+        queryset
+        .order_by('pk')
+        .values_list(*(path for _, path in EXPORT_COLUMNS))
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(names)
+        for row in rows:
+            yield writer.writerow([escape_formula(value) for value in row])
+        return
+
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(names, row))) + '\n'
+
+
+def export_response(queryset, fmt, filename):
+    response = StreamingHttpResponse(
+        export_rows(queryset, fmt), content_type=CONTENT_TYPES[fmt]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{filename}.{fmt}"'
+    )
+    return response
@@ -0,0 +1,405 @@
+"""
+Cache du catalogue public.
+
+Les clés sont versionnées par espace de noms (`products`, `vendors`,
+`categories`) : un `post_save` / `post_delete` incrémente la version et
+toutes les entrées qui en dépendent deviennent inaccessibles, sans
+parcourir le cache (compatible locmem, fichiers et Redis).
+"""
+
+import hashlib
+import secrets
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+from .dbrouter import PIN_COOKIE, reading_replica, replica_configured
+from .metrics import record_cache
+from .models import Category, Product, Vendor
+
+
+PRODUCTS = 'products'
+VENDORS = 'vendors'
+CATEGORIES = 'categories'
+
+CATALOG = (PRODUCTS, VENDORS, CATEGORIES)
+
+# Scores de popularité (market.popularity) : listes triées uniquement
+POPULARITY = 'popularity'
+
+KEY_PREFIX = 'market'
+
+
+def get_timeout():
+    return getattr(settings, 'MARKET_CACHE_TIMEOUT', 600)
+
+
+# =====================================================
+# VERSIONS
+# =====================================================
+
+def _version_key(namespace):
+    return f'{KEY_PREFIX}:version:{namespace}'
+
+
+def _initial_version():
+    # Départ aléatoire plutôt que 1 : après une perte du cache (redémarrage,
+    # éviction), une ancienne version (clé de page, ETag) ne revient pas.
+    return secrets.randbelow(2 ** 31)
+
+
+def get_versions(namespaces):
+    keys = {_version_key(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(keys)
+
+    missing = {key: _initial_version() for key in keys if key not in found}
+    if missing:
+        # Jamais d'expiration : une version perdue ferait relire du périmé.
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+
+    return {keys[key]: version for key, version in found.items()}
+
+
+def bump(*namespaces):
+    for namespace in namespaces:
+        key = _version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), timeout=None)
+
+    _mark_bumped(namespaces)
+
+
+async def aget_versions(namespaces):
+    keys = {_version_key(namespace): namespace for namespace in namespaces}
+    found = await cache.aget_many(keys)
+
+    missing = {key: _initial_version() for key in keys if key not in found}
+    if missing:
+        await cache.aset_many(missing, timeout=None)
+        found.update(missing)
+
+    return {keys[key]: version for key, version in found.items()}
+
+
+# =====================================================
+# RÉPLICA EN RETARD
+# =====================================================
+# Pendant `REPLICA_PIN_SECONDS` après un bump, le réplica peut encore
+# renvoyer les anciennes lignes : ce qui en est lu n'est pas stocké sous
+# la nouvelle version (sinon le périmé resterait jusqu'au TTL).
+
+def _bumped_key(namespace):
+    return f'{KEY_PREFIX}:bumped:{namespace}'
+
+
+def _mark_bumped(namespaces):
+    if replica_configured():
+        cache.set_many(
+            {_bumped_key(namespace): 1 for namespace in namespaces},
+            settings.REPLICA_PIN_SECONDS,
+        )
+
+
+def may_be_stale(namespaces):
+    if not reading_replica():
+        return False
+    return bool(cache.get_many([_bumped_key(ns) for ns in namespaces]))
+
+
+async def amay_be_stale(namespaces):
+    if not reading_replica():
+        return False
+    return bool(await cache.aget_many([_bumped_key(ns) for ns in namespaces]))
+
+
+def _format_key(name, namespaces, versions, parts):
+    version = '.'.join(str(versions[namespace]) for namespace in namespaces)
+    suffix = ':'.join(str(part) for part in parts)
+    return f'{KEY_PREFIX}:{name}:{version}:{suffix}'
+
+
+def make_key(name, namespaces, *parts):
+    return _format_key(name, namespaces, get_versions(namespaces), parts)
+
+
+async def amake_key(name, namespaces, *parts):
+    versions = await aget_versions(namespaces)
+    return _format_key(name, namespaces, versions, parts)
+
+
+def cached(name, namespaces, builder, *parts):
+    key = make_key(name, namespaces, *parts)
+    value = cache.get(key)
+    record_cache(value is not None)
+    if value is None:
+        value = builder()
+        if not may_be_stale(namespaces):
+            cache.set(key, value, get_timeout())
+    return value
+
+
+async def acached(name, namespaces, builder, *parts):
+    """
+    `cached()` pour les vues async ; `builder` est une coroutine.
+    """
+    key = await amake_key(name, namespaces, *parts)
+    value = await cache.aget(key)
+    record_cache(value is not None)
+    if value is None:
+        value = await builder()
+        if not await amay_be_stale(namespaces):
+            await cache.aset(key, value, get_timeout())
+    return value
+
+
+# =====================================================
+# REQUÊTES MISES EN CACHE
+# =====================================================
+
+def get_categories():
+    return cached(
+        'categories',
+        (CATEGORIES,),
+        lambda: list(_categories_queryset()),
+    )
+
+
+def _categories_queryset():
+    return Category.objects.only('name', 'slug').order_by('name')
+
+
+def _home_vendors_queryset(fields, limit):
+    return (
+        Vendor.objects
+        .filter(is_verified=True)
+        .only(*fields)
+        .order_by('rank', '-created_at', '-id')[:limit]
+    )
+
+
+def get_home_vendors(fields, limit=12):
+    def build():
+        return list(_home_vendors_queryset(fields, limit))
+
+    return cached('home_vendors', (VENDORS,), build, limit)
+
+
+async def aget_categories():
+    async def build():
+        return [category async for category in _categories_queryset()]
+
+    return await acached('categories', (CATEGORIES,), build)
+
+
+async def aget_home_vendors(fields, limit=12):
+    async def build():
+        return [
+            vendor async for vendor in _home_vendors_queryset(fields, limit)
+        ]
+
+    return await acached('home_vendors', (VENDORS,), build, limit)
+
+
+def _product_contact_queryset(product_id):
+    return (
+        Product.live
+        .filter(pk=product_id)
+        .exclude(vendor__whatsapp_number='')
+        .values_list('vendor__whatsapp_number', 'name')
+    )
+
+
+def _vendor_contact_queryset(vendor_id):
+    return (
+        Vendor.objects
+        .filter(pk=vendor_id, is_verified=True)
+        .exclude(whatsapp_number='')
+        .values_list('whatsapp_number', 'name')
+    )
+
+
+def get_product_contact(product_id):
+    """
+    (numéro WhatsApp du vendeur, nom du produit), ou None.
+    """
+    return cached(
+        'product_contact',
+        (PRODUCTS, VENDORS),
+        lambda: _product_contact_queryset(product_id).first(),
+        product_id,
+    )
+
+
+def get_vendor_contact(vendor_id):
+    """
+    (numéro WhatsApp, nom du vendeur), ou None.
+    """
+    return cached(
+        'vendor_contact',
+        (VENDORS,),
+        lambda: _vendor_contact_queryset(vendor_id).first(),
+        vendor_id,
+    )
+
+
+async def aget_product_contact(product_id):
+    async def build():
+        return await _product_contact_queryset(product_id).afirst()
+
+    return await acached('product_contact', (PRODUCTS, VENDORS), build, product_id)
+
+
+async def aget_vendor_contact(vendor_id):
+    async def build():
+        return await _vendor_contact_queryset(vendor_id).afirst()
+
+    return await acached('vendor_contact', (VENDORS,), build, vendor_id)
+
+
+def _format_fragment_version(versions, stale):
+    version = '.'.join(str(versions[namespace]) for namespace in CATALOG)
+    # Réplica peut-être en retard : fragments à part, abandonnés à la
+    # fin de la fenêtre (la version normale ne les relit pas).
+    return f'{version}.replica' if stale else version
+
+
+def fragment_version():
+    """
+    Version à passer au tag `{% cache %}` des cartes produits.
+    """
+    return _format_fragment_version(
+        get_versions(CATALOG), may_be_stale(CATALOG)
+    )
+
+
+async def afragment_version():
+    return _format_fragment_version(
+        await aget_versions(CATALOG), await amay_be_stale(CATALOG)
+    )
+
+
+# =====================================================
+# CACHE DE PAGES (visiteurs anonymes)
+# =====================================================
+
+def is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+
+    # Session ou messages en attente : page personnalisée.
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return False
+    if 'messages' in request.COOKIES:
+        return False
+
+    # Navigateur qui vient d'écrire : lit la base principale (dbrouter).
+    if PIN_COOKIE in request.COOKIES:
+        return False
+
+    return True
+
+
+# Paramètres lus par les vues du catalogue : les autres (utm_source,
+# fbclid...) ne créent pas de nouvelle entrée de cache ni d'ETag.
+PAGE_PARAMETERS = (
+    'category', 'cursor', 'fields', 'limit', 'price', 'q', 'sort', 'stream',
+)
+
+
+def page_url(request):
+    """
+    URL absolue de la page, réduite aux `PAGE_PARAMETERS` (triés).
+    """
+    query = urlencode([
+        (name, value)
+        for name in PAGE_PARAMETERS
+        for value in request.GET.getlist(name)
+    ])
+    url = request.build_absolute_uri(request.path)
+    return f'{url}?{query}' if query else url
+
+
+def _page_digest(request):
+    return hashlib.md5(page_url(request).encode()).hexdigest()
+
+
+def _is_cacheable_response(response):
+    return (
+        response.status_code == 200
+        and not response.cookies
+        and not getattr(response, 'streaming', False)
+    )
+
+
+def cache_public_page(namespaces=CATALOG):
+    """
+    Met en cache la réponse complète des visiteurs anonymes ; la clé
+    dépend du chemin, des paramètres connus (`PAGE_PARAMETERS`) et des
+    versions du catalogue.
+
+    `namespaces` : tuple, ou fonction `namespaces(request)` quand les
+    versions dépendent de la requête (tri par popularité).
+    """
+    def get_namespaces(request):
+        return namespaces(request) if callable(namespaces) else namespaces
+
+    def decorator(view_func):
+
+        if iscoroutinefunction(view_func):
+
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if not is_cacheable_request(request):
+                    return await view_func(request, *args, **kwargs)
+
+                page_namespaces = get_namespaces(request)
+                key = await amake_key(
+                    'page', page_namespaces, _page_digest(request)
+                )
+                response = await cache.aget(key)
+                record_cache(response is not None)
+                if response is not None:
+                    return response
+
+                response = await view_func(request, *args, **kwargs)
+
+                if (_is_cacheable_response(response)
+                        and not await amay_be_stale(page_namespaces)):
+                    patch_vary_headers(response, ('Cookie',))
+                    await cache.aset(key, response, get_timeout())
+
+                return response
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not is_cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+
+            page_namespaces = get_namespaces(request)
+            key = make_key('page', page_namespaces, _page_digest(request))
+            response = cache.get(key)
+            record_cache(response is not None)
+            if response is not None:
+                return response
+
+            response = view_func(request, *args, **kwargs)
+
+            if (_is_cacheable_response(response)
+                    and not may_be_stale(page_namespaces)):
+                patch_vary_headers(response, ('Cookie',))
+                cache.set(key, response, get_timeout())
+
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,230 @@
+"""
+Requêtes conditionnelles (ETag / Last-Modified) du catalogue public.
+
+Chaque vue déclare une fonction de fraîcheur, bien moins chère que la
+vue elle-même :
+
+- pages détail : `updated_at` du produit / vendeur, une requête sur clé
+  primaire ;
+- listes JSON : versions du catalogue (market.cache), aucune requête SQL.
+
+Si le client (ou le CDN) possède déjà cette version, la réponse est un
+`304 Not Modified` : ni rendu de template, ni sérialisation.
+
+    @conditional(product_freshness)
+    def product_detail(request, pk): ...
+
+Chaque fonction a sa variante async (`aproduct_freshness`, ...) pour les
+vues de market.async_views.
+"""
+
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db.models import Max
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+from . import cache, popularity
+from .models import Product, Vendor
+
+
+def make_etag(request, *parts):
+    """
+    ETag fort : URL (hôte, paramètres connus, voir `cache.page_url`),
+    version déployée et état de la ressource.
+    """
+    key = repr((settings.RELEASE, cache.page_url(request)) + parts)
+    return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+
+def catalog_versions(namespaces):
+    versions = cache.get_versions(namespaces)
+    return tuple(versions[namespace] for namespace in namespaces)
+
+
+async def acatalog_versions(namespaces):
+    versions = await cache.aget_versions(namespaces)
+    return tuple(versions[namespace] for namespace in namespaces)
+
+
+def _validate(request, etag, last_modified):
+    """
+    `(réponse 304/412 ou None, timestamp)`.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    return response, timestamp
+
+
+def _finish(response, etag, timestamp):
+    if response.status_code not in (200, 304):
+        return response
+
+    response.headers.setdefault('ETag', etag)
+    if timestamp and not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(timestamp)
+
+    # Copie conservée, mais revalidée à chaque utilisation.
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+# Réplica peut-être en retard après une écriture (market.cache) : pas
+# d'ETag, le client garderait la page périmée sous la nouvelle version.
+STALE_NAMESPACES = cache.CATALOG + (cache.POPULARITY,)
+
+
+def conditional(freshness):
+    """
+    `freshness(request, *args, **kwargs)` renvoie `(etag, last_modified)`
+    (`last_modified` : datetime ou None), ou None si la ressource n'existe
+    pas : la vue répond alors normalement (404).
+
+    Vue async : `freshness` doit être une coroutine (ORM async).
+
+    Visiteurs anonymes uniquement, comme `cache_public_page` : les pages
+    des utilisateurs connectés sont personnalisées.
+    """
+    def decorator(view_func):
+
+        if iscoroutinefunction(view_func):
+
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if (not cache.is_cacheable_request(request)
+                        or await cache.amay_be_stale(STALE_NAMESPACES)):
+                    return await view_func(request, *args, **kwargs)
+
+                state = await freshness(request, *args, **kwargs)
+                if state is None:
+                    return await view_func(request, *args, **kwargs)
+
+                etag, last_modified = state
+                response, timestamp = _validate(request, etag, last_modified)
+                if response is None:
+                    response = await view_func(request, *args, **kwargs)
+                return _finish(response, etag, timestamp)
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if (not cache.is_cacheable_request(request)
+                    or cache.may_be_stale(STALE_NAMESPACES)):
+                return view_func(request, *args, **kwargs)
+
+            state = freshness(request, *args, **kwargs)
+            if state is None:
+                return view_func(request, *args, **kwargs)
+
+            etag, last_modified = state
+            response, timestamp = _validate(request, etag, last_modified)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+            return _finish(response, etag, timestamp)
+
+        return wrapper
+
+    return decorator
+
+
+# =====================================================
+# FONCTIONS DE FRAÎCHEUR
+# =====================================================
+
+def _product_row(pk):
+    return Product.live.filter(pk=pk).values_list(
+        'updated_at', 'vendor__updated_at'
+    )
+
+
+def _product_state(request, row, versions):
+    if row is None:
+        return None
+    return make_etag(request, *row, versions), max(row)
+
+
+def product_freshness(request, pk):
+    # Le nom de la catégorie est affiché : sa version entre dans l'ETag.
+    return _product_state(
+        request,
+        _product_row(pk).first(),
+        catalog_versions((cache.CATEGORIES,)),
+    )
+
+
+async def aproduct_freshness(request, pk):
+    return _product_state(
+        request,
+        await _product_row(pk).afirst(),
+        await acatalog_versions((cache.CATEGORIES,)),
+    )
+
+
+def _vendor_row(pk):
+    return (
+        Vendor.objects
+        .filter(pk=pk, is_verified=True)
+        .annotate(products_updated_at=Max('products__updated_at'))
+        .values_list(
+            'updated_at', 'products_updated_at', 'active_products_count'
+        )
+    )
+
+
+def _vendor_state(request, row, versions):
+    if row is None:
+        return None
+
+    updated_at, products_updated_at, _ = row
+
+    # Un produit supprimé ne laisse pas de `updated_at` : le compteur de
+    # produits actifs change, lui.
+    etag = make_etag(request, *row, versions)
+    return etag, max(filter(None, (updated_at, products_updated_at)))
+
+
+def vendor_freshness(request, pk):
+    return _vendor_state(
+        request,
+        _vendor_row(pk).first(),
+        catalog_versions((cache.CATEGORIES,)),
+    )
+
+
+async def avendor_freshness(request, pk):
+    return _vendor_state(
+        request,
+        await _vendor_row(pk).afirst(),
+        await acatalog_versions((cache.CATEGORIES,)),
+    )
+
+
+def list_namespaces(request):
+    # Tri par popularité : les scores changent sans écriture du catalogue.
+    # Aussi utilisé pour le cache de page de l'accueil (`?sort=popular`).
+    if request.GET.get('sort') == popularity.POPULAR:
+        return cache.CATALOG + (cache.POPULARITY,)
+    return cache.CATALOG
+
+
+def catalog_freshness(request):
+    """
+    Listes : toute écriture du catalogue incrémente une version.
+    """
+    return make_etag(request, catalog_versions(list_namespaces(request))), None
+
+
+async def acatalog_freshness(request):
+    versions = await acatalog_versions(list_namespaces(request))
+    return make_etag(request, versions), None
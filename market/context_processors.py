@@ -0,0 +1,17 @@
+"""
+Variables communes aux templates du marché.
+"""
+
+import secrets
+
+from django.conf import settings
+
+
+# Version des fragments de mise en page ({% cache %} de market/base.html) :
+# les URL statiques hachées changent à chaque déploiement. Sans RELEASE,
+# chaque processus a sa propre version.
+LAYOUT_VERSION = settings.RELEASE or secrets.token_hex(4)
+
+
+def layout(request):
+    return {'layout_version': LAYOUT_VERSION}
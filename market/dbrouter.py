@@ -0,0 +1,280 @@
+"""
+Routage des lectures vers un réplica de la base.
+
+Sans alias `replica` dans `DATABASES` (DATABASE_REPLICA_URL absent), tout
+passe par `default` : le routeur n'a aucun effet.
+
+- Écritures : toujours sur la base principale.
+- Lectures : sur la base principale, sauf dans les vues publiques du
+  catalogue décorées par `@read_replica`.
+- Lecture de ses propres écritures : après une requête d'écriture (POST,
+  ...), `ReplicaPinMiddleware` pose un cookie ; tant qu'il est présent, le
+  navigateur lit sur la base principale, y compris dans le catalogue (le
+  vendeur retrouve aussitôt le produit qu'il vient de modifier).
+- Sessions et comptes (`SESSION_APPS`) : toujours sur la base principale,
+  une connexion vient d'être écrite.
+- Réplica injoignable : lectures sur la base principale, nouvel essai
+  après `REPLICA_RETRY_SECONDS`.
+- Caches et ETags des autres visiteurs : pendant `REPLICA_PIN_SECONDS`
+  après une invalidation, ce qui est lu sur le réplica n'est ni mis en
+  cache ni validé par ETag (voir `market.cache.may_be_stale`).
+
+    @query_budget(3)
+    @read_replica
+    def product_detail(request, pk): ...
+
+Essai local avec deux fichiers SQLite :
+
+    cp db.sqlite3 replica.sqlite3
+    DATABASE_REPLICA_URL=sqlite:///replica.sqlite3 python manage.py runserver
+
+État des connexions : python manage.py check_databases
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+logger = logging.getLogger('market.dbrouter')
+
+
+REPLICA = 'replica'
+
+PIN_COOKIE = 'db_primary'
+
+# Applications dont les lectures restent sur la base principale.
+SESSION_APPS = {'sessions', 'auth'}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Alias de lecture de la requête en cours (None : base principale)
+_read_alias = ContextVar('market_read_alias', default=None)
+
+# Réplica marqué indisponible jusqu'à ce timestamp (par processus)
+_replica_down_until = 0.0
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def replica_available():
+    """
+    Ouvre la connexion au réplica si nécessaire. En cas d'échec, le
+    réplica est ignoré pendant `REPLICA_RETRY_SECONDS`.
+
+    Une connexion déjà ouverte est revalidée par Django au début de
+    chaque requête (`CONN_HEALTH_CHECKS`).
+    """
+    global _replica_down_until
+
+    if time.monotonic() < _replica_down_until:
+        return False
+
+    connection = connections[REPLICA]
+    if connection.connection is not None:
+        return True
+
+    try:
+        connection.ensure_connection()
+    except DatabaseError as exc:
+        _replica_down_until = (
+            time.monotonic() + settings.REPLICA_RETRY_SECONDS
+        )
+        logger.warning("Réplica indisponible, lectures sur la base "
+                       "principale : %s", exc)
+        return False
+
+    return True
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES[PIN_COOKIE]) > time.time()
+    except (KeyError, ValueError):
+        return False
+
+
+def use_replica_for(request):
+    return (
+        replica_configured()
+        and request.method in SAFE_METHODS
+        and not is_pinned(request)
+    )
+
+
+@contextmanager
+def reading_from(alias):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def reading_replica():
+    """
+    Vrai dans une vue `@read_replica` servie par le réplica.
+    """
+    return _read_alias.get() == REPLICA
+
+
+def read_replica(view_func):
+    """
+    Les lectures de la vue (et des décorateurs placés en dessous) vont
+    sur le réplica, sauf requête d'écriture ou navigateur épinglé.
+    """
+    if iscoroutinefunction(view_func):
+
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            if not use_replica_for(request):
+                return await view_func(request, *args, **kwargs)
+            # Le contexte est copié dans les threads de sync_to_async.
+            with reading_from(REPLICA):
+                return await view_func(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not use_replica_for(request):
+            return view_func(request, *args, **kwargs)
+        with reading_from(REPLICA):
+            return view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+# =====================================================
+# ROUTEUR
+# =====================================================
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if _read_alias.get() != REPLICA:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in SESSION_APPS:
+            return DEFAULT_DB_ALIAS
+        if not replica_available():
+            return DEFAULT_DB_ALIAS
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mêmes données des deux côtés
+        aliases = {DEFAULT_DB_ALIAS, REPLICA}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+# =====================================================
+# MIDDLEWARE
+# =====================================================
+
+class ReplicaPinMiddleware:
+    """
+    Après une requête d'écriture réussie, épingle le navigateur sur la
+    base principale pendant `REPLICA_PIN_SECONDS` (retard maximal toléré
+    du réplica).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.pin(request, await self.get_response(request))
+
+    def pin(self, request, response):
+        if not replica_configured():
+            return response
+        if request.method in SAFE_METHODS or response.status_code >= 500:
+            return response
+
+        seconds = settings.REPLICA_PIN_SECONDS
+        response.set_cookie(
+            PIN_COOKIE,
+            str(time.time() + seconds),
+            max_age=seconds,
+            httponly=True,
+            samesite='Lax',
+            secure=request.is_secure(),
+        )
+        return response
+
+
+# =====================================================
+# SANTÉ (python manage.py check_databases)
+# =====================================================
+
+def check_database(alias):
+    """
+    `{'alias', 'ok', 'latency_ms', 'pool', 'error'}` : une requête
+    `SELECT 1` sur une connexion neuve ou vérifiée.
+    """
+    connection = connections[alias]
+    result = {
+        'alias': alias,
+        'ok': False,
+        'latency_ms': None,
+        'pool': bool(connection.settings_dict.get('OPTIONS', {}).get('pool')),
+        'error': None,
+    }
+
+    started = time.perf_counter()
+    try:
+        connection.close_if_unusable_or_obsolete()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except DatabaseError as exc:
+        result['error'] = str(exc)
+        return result
+
+    result['ok'] = True
+    result['latency_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+def replica_lag():
+    """
+    Retard apparent du réplica : écart entre les dernières modifications
+    de produits vues par chaque base (timedelta, ou None si inconnu).
+    """
+    from .models import Product
+
+    latest = {
+        alias: (
+            Product.objects.using(alias)
+            .order_by('-updated_at')
+            .values_list('updated_at', flat=True)
+            .first()
+        )
+        for alias in (DEFAULT_DB_ALIAS, REPLICA)
+    }
+    if None in latest.values():
+        return None
+    return max(latest[DEFAULT_DB_ALIAS] - latest[REPLICA], timedelta(0))
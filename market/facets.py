@@ -0,0 +1,247 @@
+"""
+Facettes du catalogue : nombre de produits actifs par catégorie et par
+tranche de prix, stockés dans `ProductFacet`.
+
+Les compteurs sont mis à jour par incréments (F-expressions) depuis les
+signaux de `Product`, dans la transaction de l'écriture, et reconstruits
+par `python manage.py rebuild_facets`. Afficher les facettes coûte
+O(catégories), jamais un GROUP BY sur toute la table des produits.
+"""
+
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Value, When
+
+from . import cache
+from .models import Category, Product, ProductFacet
+
+
+# (clé, minimum inclus, maximum exclu) en HTG
+PRICE_BUCKETS = (
+    ('0-500', 0, 500),
+    ('500-1000', 500, 1000),
+    ('1000-2500', 1000, 2500),
+    ('2500-5000', 2500, 5000),
+    ('5000-10000', 5000, 10000),
+    ('10000-25000', 10000, 25000),
+    ('25000+', 25000, None),
+)
+
+NO_CATEGORY = 'none'
+
+
+def price_bucket(price):
+    for key, low, high in PRICE_BUCKETS:
+        if high is None or price < high:
+            return key
+    return PRICE_BUCKETS[-1][0]
+
+
+def price_range(key):
+    """
+    (minimum, maximum) d'une tranche, ou None si la clé est inconnue.
+    """
+    for bucket, low, high in PRICE_BUCKETS:
+        if bucket == key:
+            return Decimal(low), (Decimal(high) if high is not None else None)
+    return None
+
+
+def facet_keys(state):
+    is_active, category_id, price, _vendor_id = state
+    if not is_active:
+        return []
+    return [
+        (ProductFacet.CATEGORY, str(category_id) if category_id else NO_CATEGORY),
+        (ProductFacet.PRICE, price_bucket(price)),
+    ]
+
+
+# =====================================================
+# MISE À JOUR INCRÉMENTALE
+# =====================================================
+
+def _increment(key, delta, using):
+    dimension, value = key
+    facets = ProductFacet.objects.using(using).filter(
+        dimension=dimension, value=value
+    )
+    if delta < 0:
+        facets = facets.filter(count__gte=-delta)
+    return facets.update(count=F('count') + delta)
+
+
+def apply_deltas(deltas, using=None):
+    missing = {
+        key: delta for key, delta in deltas.items()
+        if delta and not _increment(key, delta, using) and delta > 0
+    }
+    if not missing:
+        return
+
+    # Première occurrence de ces valeurs (rebuild() crée d'avance les
+    # lignes connues) : insertion idempotente, puis incrément.
+    ProductFacet.objects.using(using).bulk_create(
+        [
+            ProductFacet(dimension=dimension, value=value, count=0)
+            for dimension, value in missing
+        ],
+        ignore_conflicts=True,
+    )
+    for key, delta in missing.items():
+        _increment(key, delta, using)
+
+
+def product_changed(previous, current, using=None):
+    """
+    `previous` / `current` : `Product.state` (is_active, category_id,
+    price, vendor_id) ;
+    `previous` est None pour un produit créé, `current` pour un supprimé.
+    """
+    deltas = Counter()
+    for key in facet_keys(previous) if previous else ():
+        deltas[key] -= 1
+    for key in facet_keys(current) if current else ():
+        deltas[key] += 1
+    apply_deltas(deltas, using=using)
+
+
+def products_added(products, using=None):
+    """
+    Après un bulk_create (aucun signal).
+    """
+    deltas = Counter()
+    for product in products:
+        for key in facet_keys(product.state):
+            deltas[key] += 1
+    apply_deltas(deltas, using=using)
+
+
+def category_deleted(category_id, using=None):
+    """
+    Catégorie supprimée : ses produits passent dans `NO_CATEGORY`
+    (`on_delete=SET_NULL` est un UPDATE en masse, sans signal par produit).
+    """
+    facets = ProductFacet.objects.using(using).filter(
+        dimension=ProductFacet.CATEGORY, value=str(category_id)
+    )
+    with transaction.atomic(using=using):
+        count = facets.select_for_update().values_list('count', flat=True).first()
+        facets.delete()
+        if count:
+            apply_deltas(
+                {(ProductFacet.CATEGORY, NO_CATEGORY): count}, using=using
+            )
+
+
+# =====================================================
+# RECONSTRUCTION
+# =====================================================
+
+def bucket_expression():
+    return Case(
+        *(
+            When(price__lt=high, then=Value(key))
+            for key, low, high in PRICE_BUCKETS
+            if high is not None
+        ),
+        default=Value(PRICE_BUCKETS[-1][0]),
+        output_field=CharField(),
+    )
+
+
+def rebuild():
+    active = Product.objects.filter(is_active=True).order_by()
+
+    # Toutes les valeurs connues, même vides : les incréments suivants
+    # tombent sur une ligne existante.
+    counts = {(ProductFacet.CATEGORY, NO_CATEGORY): 0}
+    counts.update(
+        ((ProductFacet.CATEGORY, str(pk)), 0)
+        for pk in Category.objects.values_list('pk', flat=True)
+    )
+    counts.update(
+        ((ProductFacet.PRICE, key), 0) for key, low, high in PRICE_BUCKETS
+    )
+
+    for row in active.values('category_id').annotate(total=Count('pk')):
+        category = str(row['category_id']) if row['category_id'] else NO_CATEGORY
+        counts[ProductFacet.CATEGORY, category] = row['total']
+
+    buckets = (
+        active
+        .annotate(bucket=bucket_expression())
+        .values('bucket')
+        .annotate(total=Count('pk'))
+    )
+    for row in buckets:
+        counts[ProductFacet.PRICE, row['bucket']] = row['total']
+
+    with transaction.atomic():
+        ProductFacet.objects.all().delete()
+        ProductFacet.objects.bulk_create(
+            ProductFacet(dimension=dimension, value=value, count=count)
+            for (dimension, value), count in counts.items()
+        )
+
+    cache.bump(cache.PRODUCTS)
+    return len(counts)
+
+
+# =====================================================
+# LECTURE
+# =====================================================
+
+def _facet_rows():
+    return ProductFacet.objects.filter(count__gt=0)
+
+
+def _format_facets(rows, categories):
+    counts = {(facet.dimension, facet.value): facet.count for facet in rows}
+
+    categories = [
+        {
+            'slug': category.slug,
+            'name': category.name,
+            'count': counts.get((ProductFacet.CATEGORY, str(category.pk)), 0),
+        }
+        for category in categories
+    ]
+
+    prices = [
+        {
+            'key': key,
+            'min': low,
+            'max': high,
+            'count': counts.get((ProductFacet.PRICE, key), 0),
+        }
+        for key, low, high in PRICE_BUCKETS
+    ]
+
+    return {'categories': categories, 'prices': prices}
+
+
+def _build_facets():
+    return _format_facets(_facet_rows(), cache.get_categories())
+
+
+async def _abuild_facets():
+    rows = [facet async for facet in _facet_rows()]
+    return _format_facets(rows, await cache.aget_categories())
+
+
+def get_facets():
+    """
+    `{'categories': [{slug, name, count}], 'prices': [{key, min, max, count}]}`
+    """
+    return cache.cached(
+        'facets', (cache.PRODUCTS, cache.CATEGORIES), _build_facets
+    )
+
+
+async def aget_facets():
+    return await cache.acached(
+        'facets', (cache.PRODUCTS, cache.CATEGORIES), _abuild_facets
+    )
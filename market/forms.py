@@ -19,6 +19,20 @@ text_input_class = (
 password_input_class = text_input_class
 
 
+# =========================
+# RÈGLES PARTAGÉES
+# =========================
+
+def validate_price(price):
+    if price is None or price <= 0:
+        raise ValidationError("Le prix doit être supérieur à 0.")
+
+    if price > 1_000_000:
+        raise ValidationError("Prix trop élevé.")
+
+    return price
+
+
 # =========================
 # FORM UTILISATEUR VENDEUR
 # =========================
@@ -148,12 +162,82 @@ class ProductForm(forms.ModelForm):
         }
 
     def clean_price(self):
-        price = self.cleaned_data.get('price')
+        return validate_price(self.cleaned_data.get('price'))
+
+
+# =========================
+# ADMIN PRODUIT (quota du vendeur)
+# =========================
+
+class ProductAdminForm(forms.ModelForm):
+    """
+    Refuse d'activer (ou de déplacer) un produit chez un vendeur à sa
+    limite : erreur de formulaire plutôt que `ProductLimitReached` (500).
+    """
+
+    class Meta:
+        model = Product
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        vendor = cleaned_data.get('vendor')
+        if vendor is None or not cleaned_data.get('is_active'):
+            return cleaned_data
+
+        # `self.instance` porte encore l'état enregistré.
+        takes_slot = (
+            self.instance._state.adding
+            or not self.instance.is_active
+            or self.instance.vendor_id != vendor.pk
+        )
+        if takes_slot and not vendor.has_product_slot():
+            raise ValidationError(
+                "Limite de produits atteinte pour ce vendeur "
+                f"({vendor.product_limit()} produits actifs)."
+            )
+
+        return cleaned_data
 
-        if price is None or price <= 0:
-            raise ValidationError("Le prix doit être supérieur à 0.")
 
-        if price > 1_000_000:
-            raise ValidationError("Prix trop élevé.")
+# =========================
+# IMPORT EN MASSE (CSV / JSON Lines)
+# =========================
+
+class ProductImportForm(forms.ModelForm):
+    """
+    Validation d'une ligne importée : mêmes règles que `ProductForm`,
+    sans image. La catégorie (slug) est résolue par `market.bulk`.
+    """
+
+    class Meta:
+        model = Product
+        fields = ['name', 'description', 'price']
+
+    def clean_price(self):
+        return validate_price(self.cleaned_data.get('price'))
+
+
+class ProductUploadForm(forms.Form):
+    file = forms.FileField(
+        label="Fichier CSV ou JSON Lines",
+        widget=forms.FileInput(attrs={
+            'class': text_input_class,
+            'accept': '.csv,.jsonl,.ndjson'
+        })
+    )
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        name = upload.name.lower()
+
+        if name.endswith('.csv'):
+            upload.import_format = 'csv'
+        elif name.endswith(('.jsonl', '.ndjson')):
+            upload.import_format = 'jsonl'
+        else:
+            raise ValidationError(
+                "Format non pris en charge : .csv ou .jsonl uniquement."
+            )
 
-        return price
+        return upload
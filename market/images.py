@@ -0,0 +1,200 @@
+"""
+Dérivés d'images (miniatures responsives, WebP / AVIF).
+
+Pour chaque image de `Product` / `Vendor`, on génère avec Pillow une
+série de largeurs dans plusieurs formats, stockées à côté de l'original :
+
+    products/mangue.jpg  ->  products/mangue__w320.webp, ...__w640.avif, ...
+
+La liste des dérivés est enregistrée dans `image_renditions` (JSON) :
+les templates construisent `srcset` sans aucun accès au stockage.
+"""
+
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.utils.timezone import now
+from PIL import Image, ImageOps, features
+
+
+WIDTHS = (320, 640, 1024)
+
+QUALITY = {
+    'avif': 50,
+    'webp': 75,
+    'jpeg': 80,
+}
+
+EXTENSIONS = {
+    'avif': 'avif',
+    'webp': 'webp',
+    'jpeg': 'jpg',
+}
+
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+
+
+def available_formats():
+    """
+    Formats modernes d'abord ; JPEG sert de repli universel.
+    """
+    formats = [fmt for fmt in ('avif', 'webp') if features.check(fmt)]
+    return formats + ['jpeg']
+
+
+def rendition_name(name, width, fmt):
+    base, _ = os.path.splitext(name)
+    return f'{base}__w{width}.{EXTENSIONS[fmt]}'
+
+
+# =====================================================
+# GÉNÉRATION
+# =====================================================
+
+def _open(fieldfile):
+    fieldfile.open('rb')
+    try:
+        image = Image.open(fieldfile)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    finally:
+        fieldfile.close()
+    return image
+
+
+def _encode(image, fmt):
+    if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGBA')
+
+    buffer = BytesIO()
+    image.save(buffer, format=fmt.upper(), quality=QUALITY[fmt], optimize=True)
+    return buffer.getvalue()
+
+
+def generate_renditions(fieldfile):
+    """
+    Génère tous les dérivés de `fieldfile` et renvoie le manifeste
+    `{'source': nom, 'width': largeur, 'formats': {fmt: {largeur: nom}}}`.
+    """
+    storage = fieldfile.storage
+    image = _open(fieldfile)
+
+    # Pas d'agrandissement : seules les largeurs <= original sont produites.
+    widths = [width for width in WIDTHS if width < image.width]
+    widths.append(min(image.width, WIDTHS[-1]))
+    widths = sorted(set(widths))
+
+    manifest = {
+        'source': fieldfile.name,
+        'width': image.width,
+        'formats': {},
+    }
+
+    for width in widths:
+        resized = image.copy()
+        resized.thumbnail((width, width * 4), Image.LANCZOS)
+
+        for fmt in available_formats():
+            name = rendition_name(fieldfile.name, width, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            saved = storage.save(name, ContentFile(_encode(resized, fmt)))
+            manifest['formats'].setdefault(fmt, {})[str(width)] = saved
+
+    return manifest
+
+
+def delete_renditions(storage, manifest):
+    for names in (manifest or {}).get('formats', {}).values():
+        for name in names.values():
+            if storage.exists(name):
+                storage.delete(name)
+
+
+def process_image(instance, field_name='image'):
+    """
+    Met à jour les dérivés de `instance` si son image a changé.
+    Renvoie True si le manifeste a été modifié.
+    """
+    fieldfile = getattr(instance, field_name)
+    manifest = instance.image_renditions or {}
+
+    source = fieldfile.name if fieldfile else None
+    if manifest.get('source') == source:
+        return False
+
+    delete_renditions(fieldfile.storage, manifest)
+    manifest = generate_renditions(fieldfile) if source else {}
+
+    # update() : pas de second post_save ; `updated_at` à la main
+    # (srcset modifié, voir market.conditional).
+    type(instance).objects.filter(pk=instance.pk).update(
+        image_renditions=manifest,
+        updated_at=now(),
+    )
+    instance.image_renditions = manifest
+    return True
+
+
+# =====================================================
+# LECTURE (srcset)
+# =====================================================
+
+class Renditions:
+    """
+    Vue en lecture sur le manifeste d'une instance.
+    """
+
+    def __init__(self, fieldfile, manifest):
+        self.fieldfile = fieldfile
+        self.manifest = manifest or {}
+        self._candidates = {}
+
+    def __bool__(self):
+        return bool(self.fieldfile) and (
+            self.manifest.get('source') == self.fieldfile.name
+        )
+
+    def formats(self):
+        if not self:
+            return []
+        formats = self.manifest.get('formats', {})
+        return [fmt for fmt in ('avif', 'webp', 'jpeg') if fmt in formats]
+
+    def candidates(self, fmt):
+        if fmt not in self._candidates:
+            storage = self.fieldfile.storage
+            names = self.manifest.get('formats', {}).get(fmt, {})
+            self._candidates[fmt] = [
+                (int(width), storage.url(name))
+                for width, name in sorted(names.items(), key=lambda i: int(i[0]))
+            ]
+        return self._candidates[fmt]
+
+    def srcset(self, fmt):
+        return ', '.join(
+            f'{url} {width}w' for width, url in self.candidates(fmt)
+        )
+
+    def url(self, width=None, fmt='jpeg'):
+        """
+        URL du plus petit dérivé d'au moins `width` pixels
+        (le plus grand si `width` est None ou jamais atteint).
+        """
+        candidates = self.candidates(fmt)
+        if not candidates:
+            return self.fieldfile.url
+
+        if width is not None:
+            for candidate_width, url in candidates:
+                if candidate_width >= width:
+                    return url
+
+        return candidates[-1][1]
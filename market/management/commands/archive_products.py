@@ -0,0 +1,73 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from market import archive
+from market.models import ArchivedProduct, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Déplace par lots les produits supprimés (désactivés) depuis "
+        "longtemps vers la table d'archive ; purge éventuellement les "
+        "archives anciennes (à lancer chaque nuit via cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=archive.ARCHIVE_AFTER_DAYS,
+            help="Archiver les produits désactivés depuis plus de N jours."
+        )
+        parser.add_argument(
+            '--purge-days',
+            type=int,
+            help="Supprimer les archives de plus de N jours."
+        )
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE)
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help="Pause entre deux lots (secondes)."
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Affiche les compteurs sans rien modifier."
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            cutoff = now() - timedelta(days=options['days'])
+            self.stdout.write(
+                f"{Product.objects.archivable(cutoff).count()} produit(s) à archiver."
+            )
+            if options['purge_days'] is not None:
+                purge_cutoff = now() - timedelta(days=options['purge_days'])
+                self.stdout.write(
+                    f"{ArchivedProduct.objects.filter(archived_at__lt=purge_cutoff).count()} "
+                    f"archive(s) à purger."
+                )
+            return
+
+        archived = archive.archive_inactive_products(
+            days=options['days'],
+            batch_size=options['batch_size'],
+            pause=options['sleep'],
+            progress=lambda total: self.stdout.write(f"{total} archivé(s)…"),
+        )
+
+        purged = 0
+        if options['purge_days'] is not None:
+            purged = archive.purge_archive(
+                options['purge_days'],
+                batch_size=options['batch_size'],
+                pause=options['sleep'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{archived} produit(s) archivé(s), {purged} archive(s) purgée(s)."
+        ))
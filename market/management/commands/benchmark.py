@@ -0,0 +1,76 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from market import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure latence, requêtes SQL et taille des réponses des vues du "
+        "marché ; compare éventuellement à une référence JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help="Vide le cache avant chaque requête."
+        )
+        parser.add_argument(
+            '--only',
+            nargs='+',
+            help="Scénarios à exécuter (ex. accueil product_list)."
+        )
+        parser.add_argument(
+            '--output',
+            help="Fichier JSON où écrire les résultats."
+        )
+        parser.add_argument(
+            '--compare',
+            help="Référence JSON : échec si régression."
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=benchmarks.DEFAULT_THRESHOLD,
+            help="Tolérance relative sur latence et taille (défaut : 0.2)."
+        )
+
+    def handle(self, *args, **options):
+        report = benchmarks.run(
+            iterations=options['iterations'],
+            cold=options['cold'],
+            only=options['only'],
+        )
+
+        self.stdout.write(
+            f"{'scénario':<22}{'p50':>9}{'p95':>9}{'p99':>9}"
+            f"{'rendu':>9}{'SQL':>6}{'octets':>10}"
+        )
+        for name, result in report['results'].items():
+            render = result.get('render_p50_ms')
+            render = f"{render:>9.2f}" if render is not None else f"{'-':>9}"
+            self.stdout.write(
+                f"{name:<22}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                f"{result['p99_ms']:>9.2f}{render}{result['queries']:>6}"
+                f"{result['bytes']:>10}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2, ensure_ascii=False)
+
+        if options['compare']:
+            with open(options['compare']) as handle:
+                baseline = json.load(handle)
+
+            regressions = benchmarks.compare(
+                baseline, report, options['threshold']
+            )
+            if regressions:
+                raise CommandError(
+                    "Régressions de performance :\n" + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("Aucune régression."))
@@ -0,0 +1,84 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from market import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les profils de déploiement WSGI (gunicorn sync) et ASGI "
+        "(gunicorn + uvicorn) sous charge de clients lents."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles',
+            nargs='+',
+            choices=sorted(benchmarks.SERVER_PROFILES),
+            default=['wsgi', 'asgi'],
+        )
+        parser.add_argument('--path', default='/')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument(
+            '--slow-clients',
+            type=int,
+            default=20,
+            help="Connexions lentes ouvertes en permanence (défaut : 20)."
+        )
+        parser.add_argument(
+            '--probes',
+            type=int,
+            default=4,
+            help="Clients rapides qui mesurent la latence (défaut : 4)."
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10.0,
+            help="Durée de la mesure par profil, en secondes."
+        )
+        parser.add_argument(
+            '--delay',
+            type=float,
+            default=0.2,
+            help="Pause entre deux morceaux d'un client lent (s)."
+        )
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument(
+            '--output',
+            help="Fichier JSON où écrire les résultats."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = benchmarks.run_servers(
+                profiles=options['profiles'],
+                path=options['path'],
+                workers=options['workers'],
+                slow_clients=options['slow_clients'],
+                probes=options['probes'],
+                duration=options['duration'],
+                delay=options['delay'],
+                port=options['port'],
+            )
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            f"{'profil':<8}{'req/s':>9}{'p50':>10}{'p95':>10}"
+            f"{'max':>10}{'erreurs':>9}"
+        )
+        for profile, result in report['results'].items():
+            self.stdout.write(
+                f"{profile:<8}{result['throughput_rps']:>9.2f}"
+                f"{self._ms(result['p50_ms'])}{self._ms(result['p95_ms'])}"
+                f"{self._ms(result['max_ms'])}{result['errors']:>9}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2, ensure_ascii=False)
+
+    def _ms(self, value):
+        return f"{value:>10.1f}" if value is not None else f"{'-':>10}"
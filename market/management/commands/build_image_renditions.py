@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from market import cache, images
+from market.models import Vendor, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère les dérivés (miniatures, WebP, AVIF) des images existantes "
+        "qui n'en ont pas encore."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Régénère aussi les dérivés déjà présents."
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+
+        for model in (Vendor, Product):
+            queryset = model.objects.exclude(image='').exclude(image=None)
+
+            for instance in queryset.only('pk', 'image', 'image_renditions').iterator():
+                if options['force']:
+                    instance.image_renditions = {}
+                try:
+                    if images.process_image(instance):
+                        processed += 1
+                except (OSError, ValueError) as exc:
+                    self.stderr.write(f"{model.__name__} #{instance.pk} : {exc}")
+
+        if processed:
+            cache.bump(*cache.CATALOG)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{processed} image(s) traitée(s)."
+        ))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+
+from market.dbrouter import check_database, replica_configured, replica_lag
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie chaque connexion de DATABASES (SELECT 1, latence, pool) "
+        "et le retard du réplica ; échoue si une base est injoignable."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-lag',
+            type=float,
+            help="Retard maximal toléré du réplica, en secondes."
+        )
+
+    def handle(self, *args, **options):
+        failures = []
+
+        for alias in connections:
+            result = check_database(alias)
+            if result['ok']:
+                pool = ' (pool)' if result['pool'] else ''
+                self.stdout.write(
+                    f"{alias:<10} OK  {result['latency_ms']:>8.2f} ms{pool}"
+                )
+            else:
+                failures.append(f"{alias} : {result['error']}")
+                self.stdout.write(f"{alias:<10} ERREUR  {result['error']}")
+
+        if replica_configured() and not failures:
+            try:
+                lag = replica_lag()
+            except DatabaseError as exc:
+                failures.append(f"retard du réplica : {exc}")
+                lag = None
+
+            if lag is None:
+                self.stdout.write("retard du réplica : inconnu")
+            else:
+                seconds = lag.total_seconds()
+                self.stdout.write(f"retard du réplica : {seconds:.1f} s")
+                if options['max_lag'] is not None and seconds > options['max_lag']:
+                    failures.append(
+                        f"réplica en retard de {seconds:.1f} s "
+                        f"(maximum {options['max_lag']} s)"
+                    )
+
+        if failures:
+            raise CommandError("\n".join(failures))
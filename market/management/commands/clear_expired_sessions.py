@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from market import sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime par lots les sessions expirées de la table "
+        "django_session (à lancer chaque nuit via cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=sessions.BATCH_SIZE)
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help="Pause entre deux lots (secondes)."
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Affiche le nombre de sessions expirées sans rien supprimer."
+        )
+
+    def handle(self, *args, **options):
+        if not sessions.stores_sessions_in_db():
+            # Cache : expiration par le cache ; cookies signés : rien
+            # côté serveur.
+            self.stdout.write(
+                f"Sessions hors base ({settings.SESSION_ENGINE}) : "
+                f"rien à supprimer."
+            )
+            return
+
+        if options['dry_run']:
+            self.stdout.write(
+                f"{Session.objects.filter(expire_date__lt=now()).count()} "
+                f"session(s) expirée(s)."
+            )
+            return
+
+        deleted = sessions.clear_expired_sessions(
+            batch_size=options['batch_size'],
+            pause=options['sleep'],
+            progress=lambda total: self.stdout.write(f"{total} supprimée(s)…"),
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{deleted} session(s) expirée(s) supprimée(s)."
+        ))
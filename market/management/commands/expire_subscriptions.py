@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+
+from market import cache
+from market.models import Vendor
+
+
+class Command(BaseCommand):
+    help = (
+        "Expire les abonnements Premium échus et resynchronise le statut "
+        "premium stocké (à lancer chaque jour via cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Affiche les compteurs sans rien modifier."
+        )
+
+    def handle(self, *args, **options):
+        today = now().date()
+
+        lapsed = Vendor.objects.filter(
+            subscription_plan='premium',
+            subscription_end__lt=today,
+        ) | Vendor.objects.filter(
+            subscription_plan='premium',
+            subscription_end__isnull=True,
+        )
+
+        # Statut stocké désynchronisé (ex. modification par queryset.update)
+        stale = Vendor.objects.filter(
+            subscription_plan='premium',
+            subscription_end__gte=today,
+            is_premium=False,
+        )
+
+        if options['dry_run']:
+            self.stdout.write(
+                f"{lapsed.count()} abonnement(s) à expirer, "
+                f"{stale.count()} statut(s) à réactiver."
+            )
+            return
+
+        with transaction.atomic():
+            expired = lapsed.update(
+                subscription_plan='free',
+                is_premium=False,
+                rank=Vendor.RANK_FREE,
+                updated_at=now(),
+            )
+            restored = stale.update(
+                is_premium=True,
+                rank=Vendor.RANK_PREMIUM,
+                updated_at=now(),
+            )
+
+        # update() ne déclenche pas les signaux : invalidation manuelle.
+        if expired or restored:
+            cache.bump(cache.VENDORS, cache.PRODUCTS)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{expired} abonnement(s) expiré(s), "
+            f"{restored} statut(s) réactivé(s)."
+        ))
@@ -0,0 +1,111 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from market.models import Vendor, Product, Category
+from market.pagination import CursorPaginator, DEFAULT_ORDERING
+from market.search import search_products
+from market.views import HOME_PRODUCT_FIELDS, HOME_VENDOR_FIELDS
+
+
+PAGE_SIZE = 12
+
+
+class Command(BaseCommand):
+    help = (
+        "Affiche le plan d'exécution des requêtes des vues publiques "
+        "(vérification de l'utilisation des index)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help="PostgreSQL : exécute les requêtes (EXPLAIN ANALYZE)."
+        )
+        parser.add_argument(
+            '--database',
+            default='default',
+        )
+
+    def hot_queries(self):
+        vendor = Vendor.objects.order_by('pk').first()
+        category = Category.objects.order_by('pk').first()
+        product = Product.objects.filter(is_active=True).order_by('pk').first()
+
+        active = Product.objects.filter(is_active=True)
+
+        home = (
+            active
+            .select_related('vendor')
+            .only(*HOME_PRODUCT_FIELDS)
+        )
+
+        def first_page(queryset, ordering=DEFAULT_ORDERING):
+            return queryset.order_by(*ordering)[:PAGE_SIZE + 1]
+
+        def next_page(queryset):
+            if product is None:
+                return first_page(queryset)
+            paginator = CursorPaginator(queryset, PAGE_SIZE)
+            after = paginator.keyset_filter([product.created_at, product.pk])
+            return first_page(queryset.filter(after))
+
+        yield 'accueil – produits', first_page(home)
+        yield 'accueil – page suivante', next_page(home)
+
+        if category:
+            yield 'accueil – catégorie', first_page(
+                home.filter(category__slug=category.slug)
+            )
+
+        yield 'accueil – recherche', first_page(
+            search_products(home, 'produit'),
+            ('-search_rank',) + DEFAULT_ORDERING
+        )
+
+        yield 'accueil – vendeurs', (
+            Vendor.objects
+            .filter(is_verified=True)
+            .only(*HOME_VENDOR_FIELDS)
+            .order_by('rank', '-created_at', '-id')[:12]
+        )
+
+        if product:
+            yield 'product_detail', (
+                Product.objects
+                .select_related('vendor', 'category')
+                .filter(pk=product.pk, is_active=True)
+            )
+
+        if vendor:
+            vendor_products = active.filter(vendor=vendor)
+            yield 'vendor_detail – produits', (
+                vendor_products.select_related('category')
+            )
+            yield 'vendor_dashboard – produits', first_page(
+                vendor_products.select_related('category')
+            )
+
+        yield 'api – produits', first_page(active.values('id', 'name'))
+        yield 'api – vendeurs', first_page(
+            Vendor.objects.filter(is_verified=True).values('id', 'name')
+        )
+
+    def handle(self, *args, **options):
+        database = options['database']
+        connection = connections[database]
+
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options['analyze'] = True
+
+        self.stdout.write(
+            f"Base : {connection.vendor} ({database})\n"
+        )
+
+        for label, queryset in self.hot_queries():
+            queryset = queryset.using(database)
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from market import queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime par lots les tâches terminées ou échouées plus anciennes "
+        "que JOB_RETENTION_DAYS (à lancer chaque nuit via cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.JOB_RETENTION_DAYS,
+            help="Âge minimal des tâches supprimées, en jours."
+        )
+        parser.add_argument('--batch-size', type=int, default=queue.PURGE_BATCH_SIZE)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Affiche le nombre de tâches concernées sans rien supprimer."
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(
+                f"{queue.finished_jobs(options['days']).count()} "
+                f"tâche(s) à supprimer."
+            )
+            return
+
+        deleted = queue.purge_jobs(
+            options['days'], batch_size=options['batch_size']
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{deleted} tâche(s) supprimée(s)."
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from market import facets
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les facettes (produits actifs par catégorie et par "
+        "tranche de prix) à partir de la table des produits."
+    )
+
+    def handle(self, *args, **options):
+        count = facets.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f"{count} facettes recalculées."))
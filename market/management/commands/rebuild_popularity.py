@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from market import popularity
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule le score de popularité de tous les produits depuis les "
+        "agrégats journaliers (après un changement de demi-vie, de poids ou "
+        "de POPULARITY_EPOCH). La mise à jour courante est incrémentale, "
+        "par rollup_analytics."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=popularity.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        changed = popularity.rebuild(
+            batch_size=options['batch_size'],
+            progress=lambda total: self.stdout.write(f"{total} produit(s)…"),
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{changed} score(s) de popularité mis à jour."
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from market.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte des produits."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        count = backend.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} produits indexés ({backend.__class__.__name__})."
+        ))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from market import cache
+from market.models import Vendor
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule le compteur de produits actifs de chaque vendeur "
+        "(répare une dérive du quota, ex. après des update() en masse)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Liste les vendeurs désynchronisés sans rien modifier."
+        )
+
+    def handle(self, *args, **options):
+        drifted = (
+            Vendor.objects
+            .annotate(actual=Count('products', filter=Q(products__is_active=True)))
+            .exclude(active_products_count=F('actual'))
+            .values_list('pk', 'name', 'active_products_count', 'actual')
+        )
+
+        if options['dry_run']:
+            rows = list(drifted)
+            for pk, name, stored, actual in rows:
+                self.stdout.write(f"#{pk} {name} : {stored} → {actual}")
+            self.stdout.write(f"{len(rows)} compteur(s) à corriger.")
+            return
+
+        # Le recomptage relit les produits dans l'UPDATE lui-même.
+        pks = [pk for pk, *_ in drifted]
+        with transaction.atomic():
+            updated = Vendor.objects.filter(pk__in=pks).recount_active_products()
+
+        # update() ne déclenche pas les signaux : invalidation manuelle.
+        if updated:
+            cache.bump(cache.VENDORS)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{updated} compteur(s) corrigé(s)."
+        ))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from market import analytics
+from market.models import AnalyticsEvent
+
+
+class Command(BaseCommand):
+    help = (
+        "Reporte le journal des statistiques (vues, clics WhatsApp) dans "
+        "les agrégats journaliers par produit et par vendeur, puis le vide "
+        "(à lancer toutes les quelques minutes via cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=analytics.BATCH_SIZE)
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help="Pause entre deux lots (secondes)."
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Affiche la taille du journal sans rien modifier."
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            events = AnalyticsEvent.objects.aggregate(
+                rows=Count('pk'), count=Sum('count')
+            )
+            self.stdout.write(
+                f"{events['rows'] or 0} ligne(s) en attente "
+                f"({events['count'] or 0} événement(s))."
+            )
+            return
+
+        rolled = analytics.rollup_events(
+            batch_size=options['batch_size'],
+            pause=options['sleep'],
+            progress=lambda total: self.stdout.write(f"{total} ligne(s)…"),
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{rolled} ligne(s) du journal agrégée(s)."
+        ))
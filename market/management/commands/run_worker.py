@@ -0,0 +1,77 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.utils.module_loading import autodiscover_modules
+
+from market.queue import registry, run_next_job, worker_id
+
+
+class Command(BaseCommand):
+    help = "Exécute les tâches en arrière-plan (file market.Job)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=2,
+            help="Nombre de threads d'exécution (défaut : 2)."
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help="Pause en secondes quand la file est vide."
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Vide la file puis s'arrête (cron, tests)."
+        )
+
+    def handle(self, *args, **options):
+        autodiscover_modules('tasks')
+
+        self.stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: self.stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: self.stopping.set())
+
+        self.stdout.write(
+            f"Worker démarré ({options['threads']} thread(s), "
+            f"{len(registry)} tâche(s) : {', '.join(sorted(registry))})"
+        )
+
+        threads = [
+            threading.Thread(
+                target=self.loop,
+                args=(options['sleep'], options['once']),
+                daemon=True,
+            )
+            for _ in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+
+        self.stdout.write("Worker arrêté.")
+
+    def loop(self, sleep, once):
+        worker = worker_id()
+
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                job = run_next_job(worker)
+
+                if job is not None:
+                    self.stdout.write(f"{job} ({job.attempts} essai(s))")
+                    continue
+
+                if once:
+                    break
+                self.stopping.wait(sleep)
+        finally:
+            connections.close_all()
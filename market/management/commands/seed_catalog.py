@@ -0,0 +1,149 @@
+import random
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+from datetime import timedelta
+from PIL import Image
+
+from market import cache, facets
+from market.models import Vendor, Product, Category
+from market.search import get_search_backend
+
+
+WORDS = (
+    "mangue ananas café cacao riz pois savon huile miel épices sac panier "
+    "chapeau sandale bijou tableau sculpture tissu robe chemise jus confiture "
+    "artisanal local bio frais traditionnel fait main haïtien premium"
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un catalogue synthétique (vendeurs, catégories, produits) "
+        "pour les benchmarks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendors', type=int, default=100)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=0,
+            help="Nombre d'images distinctes partagées entre les produits."
+        )
+        parser.add_argument('--premium-ratio', type=float, default=0.2)
+        parser.add_argument('--inactive-ratio', type=float, default=0.1)
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--prefix',
+            default='bench',
+            help="Préfixe des comptes utilisateurs créés."
+        )
+
+    def sentence(self, rng, count):
+        return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+    def make_images(self, rng, count):
+        names = []
+        for index in range(count):
+            color = tuple(rng.randrange(256) for _ in range(3))
+            buffer = BytesIO()
+            Image.new('RGB', (1200, 900), color).save(buffer, 'JPEG', quality=85)
+            names.append(default_storage.save(
+                f'products/bench-{index}.jpg', ContentFile(buffer.getvalue())
+            ))
+        return names
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        prefix = options['prefix']
+        today = now().date()
+        started = now()
+
+        images = self.make_images(rng, options['images'])
+
+        with transaction.atomic():
+            categories = Category.objects.bulk_create(
+                [
+                    Category(name=f'{prefix} catégorie {index}',
+                             slug=f'{prefix}-categorie-{index}')
+                    for index in range(options['categories'])
+                ],
+                batch_size=batch_size,
+            )
+
+            users = User.objects.bulk_create(
+                [
+                    User(username=f'{prefix}-{index}', password='!')
+                    for index in range(options['vendors'])
+                ],
+                batch_size=batch_size,
+            )
+
+            vendors = []
+            for index, user in enumerate(users):
+                premium = rng.random() < options['premium_ratio']
+                vendors.append(Vendor(
+                    user=user,
+                    name=f'Boutique {self.sentence(rng, 2)} {index}',
+                    description=self.sentence(rng, 20),
+                    whatsapp_number=f'+509{rng.randrange(10**7, 10**8)}',
+                    subscription_plan='premium' if premium else 'free',
+                    subscription_end=today + timedelta(days=30) if premium else None,
+                    # bulk_create ne passe pas par save()
+                    is_premium=premium,
+                    rank=Vendor.RANK_PREMIUM if premium else Vendor.RANK_FREE,
+                    is_verified=rng.random() < 0.9,
+                ))
+            vendors = Vendor.objects.bulk_create(vendors, batch_size=batch_size)
+
+            created = 0
+            while created < options['products']:
+                size = min(batch_size, options['products'] - created)
+                Product.objects.bulk_create(
+                    [
+                        Product(
+                            vendor=rng.choice(vendors),
+                            category=rng.choice(categories) if categories else None,
+                            name=self.sentence(rng, 3).capitalize(),
+                            description=self.sentence(rng, 40),
+                            price=Decimal(rng.randrange(100, 500000)) / 100,
+                            image=rng.choice(images) if images else None,
+                            is_active=rng.random() >= options['inactive_ratio'],
+                        )
+                        for _ in range(size)
+                    ],
+                    batch_size=batch_size,
+                )
+                created += size
+                self.stdout.write(f"{created} / {options['products']} produits")
+
+            # bulk_create ne passe pas par Product.save()
+            Product.objects.filter(
+                vendor__in=vendors, is_active=False, deactivated_at__isnull=True
+            ).update(deactivated_at=started)
+
+            Vendor.objects.filter(
+                pk__in=[vendor.pk for vendor in vendors]
+            ).recount_active_products()
+
+        # bulk_create n'envoie aucun signal
+        indexed = get_search_backend().rebuild()
+        facets.rebuild()
+        cache.bump(*cache.CATALOG)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(vendors)} vendeurs, {len(categories)} catégories, "
+            f"{created} produits ({indexed} indexés) en "
+            f"{(now() - started).total_seconds():.1f} s."
+        ))
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+
+from market.sqlprofile import get_log_path, read_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Résume le journal du profileur SQL : N+1 probables et requêtes "
+        "lentes, des plus coûteux aux moins coûteux."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument(
+            '--log',
+            help="Journal à lire (défaut : SQL_PROFILER_LOG)."
+        )
+        parser.add_argument(
+            '--kind',
+            choices=('n+1', 'slow'),
+            help="Limiter le rapport à un type d'alerte."
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help="Vide le journal après le rapport."
+        )
+
+    def handle(self, *args, **options):
+        offenders = {}
+
+        for event in read_events(options['log']) or ():
+            if options['kind'] and event['kind'] != options['kind']:
+                continue
+
+            key = (event['kind'], event['shape'])
+            offender = offenders.setdefault(key, {
+                'kind': event['kind'],
+                'shape': event['shape'],
+                'requests': 0,
+                'queries': 0,
+                'max_queries': 0,
+                'ms': 0.0,
+                'views': set(),
+                'sites': {},
+            })
+            offender['requests'] += 1
+            offender['queries'] += event['count']
+            offender['max_queries'] = max(offender['max_queries'], event['count'])
+            offender['ms'] += event['ms']
+            offender['views'].add(event['view'])
+
+            site = event.get('template') or event.get('code') or '?'
+            offender['sites'][site] = offender['sites'].get(site, 0) + 1
+
+        if not offenders:
+            self.stdout.write("Aucune alerte enregistrée.")
+            return
+
+        ranked = sorted(
+            offenders.values(), key=lambda item: item['ms'], reverse=True
+        )
+
+        for offender in ranked[:options['top']]:
+            site = max(offender['sites'], key=offender['sites'].get)
+            self.stdout.write(self.style.WARNING(
+                f"[{offender['kind']}] {offender['ms']:.1f} ms au total, "
+                f"{offender['requests']} requête(s) HTTP, "
+                f"{offender['queries']} requêtes SQL "
+                f"(max {offender['max_queries']} par page)"
+            ))
+            self.stdout.write(f"  vues    : {', '.join(sorted(offender['views']))}")
+            self.stdout.write(f"  origine : {site}")
+            self.stdout.write(f"  SQL     : {offender['shape'][:300]}")
+            self.stdout.write("")
+
+        if options['clear']:
+            target = options['log'] or get_log_path()
+            if target:
+                open(target, 'w').close()
+                self.stdout.write(self.style.SUCCESS("Journal vidé."))
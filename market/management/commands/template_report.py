@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+
+from market.sqlprofile import read_events
+from market.template_backend import get_log_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Résume le journal du profileur de rendu : coût moyen par page, "
+        "par template et par balise, des plus coûteux aux moins coûteux."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument(
+            '--log',
+            help="Journal à lire (défaut : TEMPLATE_PROFILER_LOG)."
+        )
+        parser.add_argument(
+            '--view',
+            help="Limiter le rapport à une vue (ex. product_detail)."
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help="Vide le journal après le rapport."
+        )
+
+    def handle(self, *args, **options):
+        views = {}
+        templates = {}
+        tags = {}
+        requests = 0
+
+        for event in read_events(options['log'] or get_log_path()) or ():
+            if options['view'] and event['view'] != options['view']:
+                continue
+            requests += 1
+
+            view = views.setdefault(event['view'], [0, 0.0])
+            view[0] += 1
+            view[1] += event['ms']
+
+            for totals, entries in ((templates, event['templates']),
+                                    (tags, event['tags'])):
+                for name, (count, ms) in entries.items():
+                    entry = totals.setdefault(name, [0, 0.0])
+                    entry[0] += count
+                    entry[1] += ms
+
+        if not requests:
+            self.stdout.write("Aucun rendu enregistré.")
+            return
+
+        self.stdout.write(self.style.WARNING(f"{requests} rendu(s) de page"))
+        self._table("vue", views, requests, "pages", options['top'])
+        self._table("template", templates, requests, "rendus", options['top'])
+        self._table("balise", tags, requests, "appels", options['top'])
+
+        if options['clear']:
+            target = options['log'] or get_log_path()
+            if target:
+                open(target, 'w').close()
+                self.stdout.write(self.style.SUCCESS("Journal vidé."))
+
+    def _table(self, title, totals, requests, unit, top):
+        ranked = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)
+
+        self.stdout.write("")
+        self.stdout.write(
+            f"{title:<48}{'ms total':>10}{'ms/page':>10}{unit:>9}"
+        )
+        for name, (count, ms) in ranked[:top]:
+            self.stdout.write(
+                f"{name[:47]:<48}{ms:>10.1f}{ms / requests:>10.2f}{count:>9}"
+            )
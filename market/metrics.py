@@ -0,0 +1,288 @@
+"""
+Instrumentation des requêtes : durée totale, temps SQL, nombre de
+requêtes, hits / misses du cache du catalogue et temps de rendu des
+templates, par nom d'URL.
+
+Les mesures sont agrégées en histogrammes dans le processus, exposées au
+format texte Prometheus sur `/metrics` et renvoyées au navigateur dans
+l'en-tête `Server-Timing`.
+
+Chaque worker gunicorn a ses propres compteurs : Prometheus doit
+interroger chaque processus, ou agréger par instance.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from .middleware import QueryObserverMiddleware
+
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+# =====================================================
+# MESURES DE LA REQUÊTE EN COURS
+# =====================================================
+
+class RequestStats:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+_current = ContextVar('market_request_stats', default=None)
+
+
+def current_stats():
+    return _current.get()
+
+
+def record_cache(hit):
+    stats = _current.get()
+    if stats is None:
+        return
+    if hit:
+        stats.cache_hits += 1
+    else:
+        stats.cache_misses += 1
+
+
+def record_template(duration):
+    stats = _current.get()
+    if stats is not None:
+        stats.template_time += duration
+
+
+# =====================================================
+# AGRÉGATION
+# =====================================================
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.help = {}
+
+    def observe(self, name, labels, value, buckets, help_text):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.help.setdefault(name, ('histogram', help_text))
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, labels, help_text, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.help.setdefault(name, ('counter', help_text))
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def render(self):
+        """
+        Format d'exposition texte Prometheus 0.0.4.
+        """
+        lines = []
+
+        with self.lock:
+            for name in sorted(self.help):
+                kind, help_text = self.help[name]
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+
+                if kind == 'counter':
+                    for (metric, labels), value in sorted(self.counters.items()):
+                        if metric == name:
+                            lines.append(f'{name}{_labels(labels)} {value}')
+                    continue
+
+                for (metric, labels), histogram in sorted(
+                    self.histograms.items(), key=lambda item: item[0]
+                ):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        bucket_labels = labels + (('le', _number(bound)),)
+                        lines.append(
+                            f'{name}_bucket{_labels(bucket_labels)} {cumulative}'
+                        )
+                    bucket_labels = labels + (('le', '+Inf'),)
+                    lines.append(
+                        f'{name}_bucket{_labels(bucket_labels)} {histogram.count}'
+                    )
+                    lines.append(
+                        f'{name}_sum{_labels(labels)} {_number(histogram.total)}'
+                    )
+                    lines.append(
+                        f'{name}_count{_labels(labels)} {histogram.count}'
+                    )
+
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', r'\\').replace('"', r'\"'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+registry = Registry()
+
+
+def observe_request(view, method, status, stats):
+    labels = {'view': view, 'method': method}
+
+    registry.inc(
+        'http_requests_total',
+        dict(labels, status=str(status)),
+        "Nombre de requêtes HTTP traitées."
+    )
+    registry.observe(
+        'http_request_duration_seconds', labels, stats.elapsed,
+        DURATION_BUCKETS, "Durée totale de la requête."
+    )
+    registry.observe(
+        'http_request_db_seconds', labels, stats.db_time,
+        DURATION_BUCKETS, "Temps passé dans la base de données."
+    )
+    registry.observe(
+        'http_request_queries', labels, stats.queries,
+        QUERY_BUCKETS, "Nombre de requêtes SQL par requête HTTP."
+    )
+    registry.observe(
+        'http_request_template_seconds', labels, stats.template_time,
+        DURATION_BUCKETS, "Temps de rendu des templates."
+    )
+    if stats.cache_hits:
+        registry.inc(
+            'market_cache_requests_total', dict(labels, result='hit'),
+            "Accès au cache du catalogue.", stats.cache_hits
+        )
+    if stats.cache_misses:
+        registry.inc(
+            'market_cache_requests_total', dict(labels, result='miss'),
+            "Accès au cache du catalogue.", stats.cache_misses
+        )
+
+
+# =====================================================
+# MIDDLEWARE
+# =====================================================
+
+def server_timing(stats):
+    return ', '.join((
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} SQL"',
+        f'tpl;dur={stats.template_time * 1000:.1f}',
+        f'cache;desc="hit={stats.cache_hits} miss={stats.cache_misses}"',
+        f'total;dur={stats.elapsed * 1000:.1f}',
+    ))
+
+
+class MetricsMiddleware(QueryObserverMiddleware):
+
+    @contextmanager
+    def observe(self, request):
+        stats = RequestStats()
+        _current.set(stats)
+
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                yield stats
+        finally:
+            # set() plutôt que reset(token) : en ASGI, l'entrée et la
+            # sortie ont lieu dans deux contextes distincts.
+            _current.set(None)
+
+    def finish(self, request, response, stats):
+        match = request.resolver_match
+        view = (match.view_name or '<anonymous>') if match else '<unresolved>'
+
+        observe_request(view, request.method, response.status_code, stats)
+        response['Server-Timing'] = server_timing(stats)
+        return response
+
+
+# =====================================================
+# ENDPOINT /metrics
+# =====================================================
+
+def metrics_view(request):
+    """
+    Protégé par `METRICS_TOKEN` (en-tête `Authorization: Bearer ...`) ;
+    sans jeton configuré, disponible uniquement en DEBUG.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+
+    if token:
+        header = request.headers.get('Authorization', '')
+        if not constant_time_compare(header, f'Bearer {token}'):
+            raise Http404
+    elif not settings.DEBUG:
+        raise Http404
+
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
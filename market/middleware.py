@@ -0,0 +1,99 @@
+"""
+Middlewares compatibles WSGI et ASGI.
+
+Sous ASGI, un middleware uniquement synchrone oblige Django à exécuter
+toute la suite de la requête dans un thread : les vues async de
+market.async_views perdraient leur intérêt. Les middlewares du projet
+déclarent donc les deux modes.
+"""
+
+from contextlib import ExitStack
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class QueryObserverMiddleware:
+    """
+    Base des middlewares qui observent une réponse : requêtes SQL
+    (métriques, profileur, budget) ou rendu des templates.
+
+    `observe(request)` : gestionnaire de contexte qui installe des
+    `execute_wrapper` sur les connexions. Les connexions sont propres à
+    chaque thread : en ASGI, il est ouvert et fermé dans le thread où
+    l'ORM async exécute les requêtes de la vue (`sync_to_async`,
+    thread_sensitive).
+
+    `finish(request, response, observer)` : après la vue.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def observe(self, request):
+        raise NotImplementedError
+
+    def finish(self, request, response, observer):
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        with self.observe(request) as observer:
+            response = self.get_response(request)
+        return self.finish(request, response, observer)
+
+    async def __acall__(self, request):
+        stack = ExitStack()
+        observer = await sync_to_async(stack.enter_context)(
+            self.observe(request)
+        )
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, observer)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, utilisable aussi en ASGI : les fichiers statiques sont
+    servis directement (index en mémoire), le reste de la requête passe
+    au middleware suivant sans thread intermédiaire.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+
+        if static_file is not None:
+            return self.serve(static_file, request)
+
+        return await self.get_response(request)
@@ -0,0 +1,70 @@
+from django.db import migrations, OperationalError
+
+
+FTS_TABLE = 'market_product_fts'
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+                f'name, description, vendor_name, '
+                f"tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            # SQLite compilé sans FTS5 : la recherche retombe sur icontains.
+            return
+
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, description, vendor_name) '
+            f'SELECT p.id, p.name, p.description, v.name '
+            f'FROM market_product p '
+            f'JOIN market_vendor v ON v.id = p.vendor_id '
+            f'WHERE p.is_active'
+        )
+
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE market_product '
+            'ADD COLUMN IF NOT EXISTS search_vector tsvector'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS market_product_search_gin '
+            'ON market_product USING GIN (search_vector)'
+        )
+        schema_editor.execute(
+            "UPDATE market_product p SET search_vector = "
+            "setweight(to_tsvector('french', coalesce(p.name, '')), 'A') || "
+            "setweight(to_tsvector('french', coalesce(v.name, '')), 'B') || "
+            "setweight(to_tsvector('french', coalesce(p.description, '')), 'C') "
+            "FROM market_vendor v WHERE v.id = p.vendor_id AND p.is_active"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS market_product_search_gin'
+        )
+        schema_editor.execute(
+            'ALTER TABLE market_product DROP COLUMN IF EXISTS search_vector'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0002_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at', '-id'], name='product_active_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', '-created_at', '-id'], name='product_category_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['vendor', 'is_active', '-created_at', '-id'], name='product_vendor_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(condition=models.Q(('is_verified', True)), fields=['-created_at', '-id'], name='vendor_verified_recent_idx'),
+        ),
+    ]
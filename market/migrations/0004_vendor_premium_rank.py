@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:46
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.timezone import now
+
+
+def populate_premium_status(apps, schema_editor):
+    Vendor = apps.get_model('market', 'Vendor')
+
+    Vendor.objects.filter(
+        subscription_plan='premium',
+        subscription_end__gte=now().date(),
+    ).update(is_premium=True, rank=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0003_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendor',
+            name='is_premium',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='rank',
+            field=models.PositiveSmallIntegerField(default=1, editable=False),
+        ),
+        migrations.RunPython(
+            populate_premium_status,
+            migrations.RunPython.noop,
+        ),
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(condition=models.Q(('is_verified', True)), fields=['rank', '-created_at', '-id'], name='vendor_verified_rank_idx'),
+        ),
+    ]
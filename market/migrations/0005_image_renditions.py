@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0004_vendor_premium_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
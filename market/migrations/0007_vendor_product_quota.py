@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_active_products_count(apps, schema_editor):
+    Vendor = apps.get_model('market', 'Vendor')
+    Product = apps.get_model('market', 'Product')
+
+    active = (
+        Product.objects
+        .filter(vendor=OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('vendor')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Vendor.objects.update(active_products_count=Coalesce(Subquery(active), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0006_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendor',
+            name='active_products_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            populate_active_products_count,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:02
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils.timezone import now
+
+
+def populate_deactivated_at(apps, schema_editor):
+    Product = apps.get_model('market', 'Product')
+
+    # Les produits déjà inactifs commencent leur délai d'archivage maintenant.
+    Product.objects.filter(is_active=False).update(deactivated_at=now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0007_vendor_product_quota'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.PositiveIntegerField(unique=True)),
+                ('vendor_id', models.PositiveIntegerField(db_index=True)),
+                ('vendor_name', models.CharField(max_length=100)),
+                ('category_slug', models.CharField(blank=True, max_length=120)),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('image', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField()),
+                ('deactivated_at', models.DateTimeField(null=True)),
+                ('archived_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='deactivated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(
+            populate_deactivated_at,
+            migrations.RunPython.noop,
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['deactivated_at'], name='product_inactive_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:03
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+# Copie figée de market.facets.PRICE_BUCKETS (bornes hautes exclues)
+PRICE_BUCKETS = (
+    ('0-500', 500),
+    ('500-1000', 1000),
+    ('1000-2500', 2500),
+    ('2500-5000', 5000),
+    ('5000-10000', 10000),
+    ('10000-25000', 25000),
+    ('25000+', None),
+)
+
+
+def populate_facets(apps, schema_editor):
+    Product = apps.get_model('market', 'Product')
+    ProductFacet = apps.get_model('market', 'ProductFacet')
+
+    counts = Counter()
+    rows = (
+        Product.objects
+        .filter(is_active=True)
+        .values_list('category_id', 'price')
+        .iterator(chunk_size=2000)
+    )
+    for category_id, price in rows:
+        counts['category', str(category_id) if category_id else 'none'] += 1
+        bucket = next(
+            key for key, high in PRICE_BUCKETS if high is None or price < high
+        )
+        counts['price', bucket] += 1
+
+    ProductFacet.objects.bulk_create(
+        ProductFacet(dimension=dimension, value=value, count=count)
+        for (dimension, value), count in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0008_product_soft_delete_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('category', 'Catégorie'), ('price', 'Tranche de prix')], max_length=20)),
+                ('value', models.CharField(max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'value'), name='product_facet_unique')],
+            },
+        ),
+        migrations.RunPython(
+            populate_facets,
+            migrations.RunPython.noop,
+        ),
+    ]
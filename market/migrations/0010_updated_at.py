@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def populate_updated_at(apps, schema_editor):
+    Vendor = apps.get_model('market', 'Vendor')
+    Product = apps.get_model('market', 'Product')
+
+    # Dernière modification connue : la création.
+    Vendor.objects.update(updated_at=F('created_at'))
+    Product.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0009_product_facet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendor',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(
+            populate_updated_at,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:30
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0010_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Vue produit'), (2, 'Vue vendeur'), (3, 'Clic WhatsApp')])),
+                ('product_id', models.PositiveIntegerField(null=True)),
+                ('vendor_id', models.PositiveIntegerField(null=True)),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('whatsapp_clicks', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='market.product')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='market.vendor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vendor', 'day'], name='product_stats_vendor_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='product_daily_stats_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VendorDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('product_views', models.PositiveIntegerField(default=0)),
+                ('whatsapp_clicks', models.PositiveIntegerField(default=0)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='market.vendor')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'day'), name='vendor_daily_stats_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0011_analytics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='popularity',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-popularity', '-id'], name='product_active_popular_idx'),
+        ),
+    ]
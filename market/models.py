@@ -1,15 +1,78 @@
-from django.db import models
+from functools import lru_cache
+
+from django.db import models, router, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils.text import slugify
 from django.core.validators import RegexValidator
 from django.utils.timezone import now
 from django.conf import settings
+from django.templatetags.static import static
+from django.urls import get_script_prefix, reverse
+
+from .images import Renditions
+
+
+@lru_cache(maxsize=20000)
+def _detail_url(prefix, viewname, pk):
+    return reverse(viewname, args=[pk])
+
+
+def detail_url(viewname, pk):
+    """
+    URL d'une page détail, mémorisée par processus : les cartes produit
+    et vendeur d'une page en contiennent des dizaines.
+    """
+    return _detail_url(get_script_prefix(), viewname, pk)
 
 
 # ======================================================
 # VENDOR
 # ======================================================
 
+class ProductLimitReached(Exception):
+    pass
+
+
+class VendorQuerySet(models.QuerySet):
+
+    # QUOTA DE PRODUITS ACTIFS
+    # Compteur `active_products_count` maintenu par UPDATE atomiques
+    # (F-expressions), dans la transaction qui crée / supprime / désactive
+    # le produit (suppression : receveur post_delete de market.signals,
+    # aussi appelé par QuerySet.delete()). La réservation est
+    # conditionnelle : deux requêtes simultanées ne peuvent pas dépasser
+    # la limite. Dérive éventuelle : `manage.py recount_active_products`.
+
+    def acquire_product_slots(self, count=1):
+        return self.filter(
+            active_products_count__lte=Vendor.product_limit_expression() - count
+        ).update(
+            active_products_count=F('active_products_count') + count
+        )
+
+    def release_product_slots(self, count=1):
+        return self.filter(
+            active_products_count__gte=count
+        ).update(
+            active_products_count=F('active_products_count') - count
+        )
+
+    def recount_active_products(self):
+        active = (
+            Product.objects
+            .filter(vendor=OuterRef('pk'), is_active=True)
+            .order_by()
+            .values('vendor')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return self.update(
+            active_products_count=Coalesce(Subquery(active), 0)
+        )
+
+
 class Vendor(models.Model):
 
     PLAN_CHOICES = (
@@ -40,6 +103,15 @@ class Vendor(models.Model):
         blank=True
     )
 
+    # DÉRIVÉS (miniatures / WebP / AVIF), voir market.images
+    image_renditions = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False
+    )
+
+    DEFAULT_IMAGE = 'default-avatar.png'
+
 
     # ABONNEMENT
 
@@ -54,20 +126,76 @@ class Vendor(models.Model):
         blank=True
     )
 
+    # STATUT PREMIUM STOCKÉ (tri / badge sans calcul par ligne)
+    # Recalculé à chaque save(), expiré par `manage.py expire_subscriptions`.
+
+    RANK_PREMIUM = 0
+    RANK_FREE = 1
+
+    is_premium = models.BooleanField(
+        default=False,
+        editable=False
+    )
+
+    rank = models.PositiveSmallIntegerField(
+        default=RANK_FREE,
+        editable=False
+    )
+
     is_verified = models.BooleanField(
         default=False
     )
 
+    # QUOTA : nombre de produits actifs (voir VendorQuerySet)
+
+    FREE_PRODUCT_LIMIT = 5
+    PREMIUM_PRODUCT_LIMIT = 100
+
+    active_products_count = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
+
     created_at = models.DateTimeField(
         auto_now_add=True
     )
 
+    # Fraîcheur (ETag / Last-Modified, voir market.conditional)
+    updated_at = models.DateTimeField(
+        auto_now=True
+    )
+
+    objects = VendorQuerySet.as_manager()
+
+
+    class Meta:
+
+        indexes = [
+
+            # Listes publiques : vendeurs vérifiés, plus récents d'abord
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_verified=True),
+                name='vendor_verified_recent_idx',
+            ),
+
+            # Accueil : premium d'abord, puis plus récents
+            models.Index(
+                fields=['rank', '-created_at', '-id'],
+                condition=models.Q(is_verified=True),
+                name='vendor_verified_rank_idx',
+            ),
+
+        ]
+
 
     # PREMIUM CHECK
 
-    def is_premium(self):
+    SUBSCRIPTION_FIELDS = ('subscription_plan', 'subscription_end')
 
-        return (
+    def has_active_subscription(self):
+
+        return bool(
 
             self.subscription_plan == 'premium'
             and self.subscription_end
@@ -76,13 +204,99 @@ class Vendor(models.Model):
         )
 
 
+    def refresh_premium_status(self):
+
+        self.is_premium = self.has_active_subscription()
+
+        self.rank = self.RANK_PREMIUM if self.is_premium else self.RANK_FREE
+
+
+    def save(self, *args, **kwargs):
+
+        self.refresh_premium_status()
+
+        update_fields = kwargs.get('update_fields')
+
+        if update_fields is None and not self._state.adding:
+
+            # Le compteur de quota n'est écrit que par UPDATE atomique :
+            # une instance chargée plus tôt ne doit pas l'écraser.
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'active_products_count'
+            ]
+
+            kwargs['update_fields'] = update_fields
+
+        if update_fields is not None and set(update_fields) & set(self.SUBSCRIPTION_FIELDS):
+
+            kwargs['update_fields'] = set(update_fields) | {'is_premium', 'rank'}
+
+        if update_fields:
+
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'updated_at'}
+
+        super().save(*args, **kwargs)
+
+
+    def get_absolute_url(self):
+
+        return detail_url('vendor_detail', self.pk)
+
+
+    # IMAGES
+
+    @property
+    def image_url(self):
+
+        if self.image:
+
+            return self.image.url
+
+        return static(self.DEFAULT_IMAGE)
+
+
+    @property
+    def renditions(self):
+
+        return Renditions(self.image, self.image_renditions)
+
+
+    @property
+    def thumbnail_url(self):
+
+        if self.renditions:
+
+            return self.renditions.url(320)
+
+        return self.image_url
+
+
     def product_limit(self):
 
         if self.subscription_plan == 'free':
 
-            return 5
+            return self.FREE_PRODUCT_LIMIT
+
+        return self.PREMIUM_PRODUCT_LIMIT
+
+
+    @classmethod
+    def product_limit_expression(cls):
+
+        # Même règle que product_limit(), évaluée par la base
+        return models.Case(
+            models.When(
+                subscription_plan='free',
+                then=models.Value(cls.FREE_PRODUCT_LIMIT)
+            ),
+            default=models.Value(cls.PREMIUM_PRODUCT_LIMIT),
+        )
+
 
-        return 100
+    def has_product_slot(self):
+
+        return self.active_products_count < self.product_limit()
 
 
     def __str__(self):
@@ -133,6 +347,29 @@ class Category(models.Model):
 # PRODUCT
 # ======================================================
 
+class ProductQuerySet(models.QuerySet):
+
+    def live(self):
+
+        return self.filter(is_active=True)
+
+
+    def archivable(self, before):
+
+        # Désactivés (supprimés par le vendeur) depuis avant `before`
+        return self.filter(is_active=False, deactivated_at__lt=before)
+
+
+class LiveProductManager(models.Manager.from_queryset(ProductQuerySet)):
+    """
+    `Product.live` : produits visibles uniquement.
+    """
+
+    def get_queryset(self):
+
+        return super().get_queryset().live()
+
+
 class Product(models.Model):
 
     vendor = models.ForeignKey(
@@ -176,6 +413,22 @@ class Product(models.Model):
     )
 
 
+    # DÉRIVÉS (miniatures / WebP / AVIF), voir market.images
+
+    image_renditions = models.JSONField(
+
+        default=dict,
+
+        blank=True,
+
+        editable=False
+
+    )
+
+
+    DEFAULT_IMAGE = 'default-product.png'
+
+
     category = models.ForeignKey(
 
         Category,
@@ -198,6 +451,20 @@ class Product(models.Model):
     )
 
 
+    # SUPPRESSION DOUCE : un produit supprimé est désactivé, puis déplacé
+    # vers ArchivedProduct par `manage.py archive_products`.
+
+    deactivated_at = models.DateTimeField(
+
+        null=True,
+
+        blank=True,
+
+        editable=False
+
+    )
+
+
     created_at = models.DateTimeField(
 
         auto_now_add=True
@@ -205,6 +472,183 @@ class Product(models.Model):
     )
 
 
+    # Fraîcheur (ETag / Last-Modified, voir market.conditional)
+
+    updated_at = models.DateTimeField(
+
+        auto_now=True
+
+    )
+
+
+    # POPULARITÉ : score décroissant avec le temps, écrit uniquement par
+    # `manage.py rollup_analytics` (incrémental) et
+    # `manage.py rebuild_popularity` (complet), voir market.popularity.
+
+    popularity = models.FloatField(
+
+        default=0,
+
+        editable=False
+
+    )
+
+
+    objects = ProductQuerySet.as_manager()
+
+    live = LiveProductManager()
+
+
+    class Meta:
+
+        indexes = [
+
+            # Archivage : produits désactivés les plus anciens
+            models.Index(
+                fields=['deactivated_at'],
+                condition=models.Q(is_active=False),
+                name='product_inactive_idx',
+            ),
+
+            # Accueil / API : produits actifs, plus récents d'abord
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_active=True),
+                name='product_active_recent_idx',
+            ),
+
+            # Accueil filtré par catégorie
+            models.Index(
+                fields=['category', '-created_at', '-id'],
+                condition=models.Q(is_active=True),
+                name='product_category_recent_idx',
+            ),
+
+            # Dashboard / page vendeur
+            models.Index(
+                fields=['vendor', 'is_active', '-created_at', '-id'],
+                name='product_vendor_active_idx',
+            ),
+
+            # Accueil / API triés par popularité
+            models.Index(
+                fields=['-popularity', '-id'],
+                condition=models.Q(is_active=True),
+                name='product_active_popular_idx',
+            ),
+
+        ]
+
+
+
+    # QUOTA : chaque passage à l'état actif réserve une place chez le
+    # vendeur, dans la même transaction que l'écriture du produit ; un
+    # produit actif déplacé vers un autre vendeur y transfère sa place.
+
+    STATE_FIELDS = ('is_active', 'category_id', 'price', 'vendor_id')
+
+    TRACKED_FIELDS = {
+        'is_active', 'category', 'category_id', 'price', 'vendor', 'vendor_id',
+    }
+
+    @property
+    def state(self):
+
+        return (self.is_active, self.category_id, self.price, self.vendor_id)
+
+
+    def save(self, *args, **kwargs):
+
+        update_fields = kwargs.get('update_fields')
+
+        if update_fields is None and not self._state.adding:
+
+            # Le score de popularité n'est écrit que par UPDATE atomique :
+            # une instance chargée plus tôt ne doit pas l'écraser.
+            update_fields = kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'popularity'
+            ]
+
+        if update_fields:
+
+            update_fields = kwargs['update_fields'] = set(update_fields) | {'updated_at'}
+
+        if update_fields is not None and not set(update_fields) & self.TRACKED_FIELDS:
+
+            return super().save(*args, **kwargs)
+
+        if update_fields is not None and 'is_active' in update_fields:
+
+            kwargs['update_fields'] = set(update_fields) | {'deactivated_at'}
+
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+
+        with transaction.atomic(using=using):
+
+            # État précédent, verrouillé : quota ici, facettes dans
+            # market.signals (post_save, même transaction).
+            self._previous_state = None
+
+            if not self._state.adding:
+
+                self._previous_state = (
+                    Product.objects.using(using)
+                    .select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list(*self.STATE_FIELDS)
+                    .first()
+                )
+
+            was_active = bool(self._previous_state and self._previous_state[0])
+
+            previous_vendor_id = (
+                self._previous_state[3] if self._previous_state else self.vendor_id
+            )
+
+            vendors = Vendor.objects.using(using).filter(pk=self.vendor_id)
+
+            previous_vendors = Vendor.objects.using(using).filter(
+                pk=previous_vendor_id
+            )
+
+            moved = previous_vendor_id != self.vendor_id
+
+            if self.is_active and (not was_active or moved):
+
+                if not vendors.acquire_product_slots():
+
+                    raise ProductLimitReached(
+                        "Limite de produits atteinte pour ce vendeur."
+                    )
+
+            if was_active and (not self.is_active or moved):
+
+                previous_vendors.release_product_slots()
+
+            if self.is_active:
+
+                self.deactivated_at = None
+
+            elif was_active or self.deactivated_at is None:
+
+                self.deactivated_at = now()
+
+            super().save(*args, **kwargs)
+
+
+    def soft_delete(self):
+
+        self.is_active = False
+
+        self.save(update_fields=['is_active'])
+
+
+    def get_absolute_url(self):
+
+        return detail_url('product_detail', self.pk)
+
+
 
     # URL IMAGE SAFE
 
@@ -216,10 +660,386 @@ class Product(models.Model):
 
             return self.image.url
 
-        return "/static/images/no-image.png"
+        return static(self.DEFAULT_IMAGE)
+
+
+    @property
+
+    def renditions(self):
+
+        return Renditions(self.image, self.image_renditions)
+
+
+    @property
+
+    def thumbnail_url(self):
+
+        if self.renditions:
+
+            return self.renditions.url(320)
 
+        return self.image_url
+
+
+
+    def __str__(self):
+
+        return self.name
+
+
+# ======================================================
+# FACETTES (compteurs de produits actifs, voir market.facets)
+# ======================================================
+
+class ProductFacet(models.Model):
+
+    CATEGORY = 'category'
+    PRICE = 'price'
+
+    DIMENSION_CHOICES = (
+        (CATEGORY, 'Catégorie'),
+        (PRICE, 'Tranche de prix'),
+    )
+
+    dimension = models.CharField(
+        max_length=20,
+        choices=DIMENSION_CHOICES
+    )
+
+    # id de catégorie ou clé de tranche de prix
+    value = models.CharField(
+        max_length=50
+    )
+
+    count = models.PositiveIntegerField(
+        default=0
+    )
+
+
+    class Meta:
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dimension', 'value'],
+                name='product_facet_unique',
+            ),
+        ]
+
+
+    def __str__(self):
+
+        return f'{self.dimension}={self.value} ({self.count})'
+
+
+
+# ======================================================
+# ARCHIVED PRODUCT (produits supprimés, hors table chaude)
+# ======================================================
+
+class ArchivedProduct(models.Model):
+    """
+    Copie d'un produit supprimé depuis longtemps, voir market.archive.
+    Aucune clé étrangère : l'archive survit au vendeur et à la catégorie.
+    """
+
+    product_id = models.PositiveIntegerField(
+        unique=True
+    )
+
+    vendor_id = models.PositiveIntegerField(
+        db_index=True
+    )
+
+    vendor_name = models.CharField(
+        max_length=100
+    )
+
+    category_slug = models.CharField(
+        max_length=120,
+        blank=True
+    )
+
+    name = models.CharField(
+        max_length=100
+    )
+
+    description = models.TextField()
+
+    price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2
+    )
+
+    image = models.CharField(
+        max_length=255,
+        blank=True
+    )
+
+    created_at = models.DateTimeField()
+
+    deactivated_at = models.DateTimeField(
+        null=True
+    )
+
+    archived_at = models.DateTimeField(
+        default=now,
+        db_index=True
+    )
+
+
+    def __str__(self):
+
+        return self.name
+
+
+
+# ======================================================
+# JOB (file de tâches en arrière-plan, voir market.queue)
+# ======================================================
+
+class Job(models.Model):
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (PENDING, 'En attente'),
+        (RUNNING, 'En cours'),
+        (DONE, 'Terminée'),
+        (FAILED, 'Échouée'),
+    )
+
+    task = models.CharField(
+        max_length=200
+    )
+
+    args = models.JSONField(
+        default=list,
+        blank=True
+    )
+
+    kwargs = models.JSONField(
+        default=dict,
+        blank=True
+    )
+
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING
+    )
+
+    # Propriétaire (consultation du statut via l'API)
+    user = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='jobs'
+    )
+
+    attempts = models.PositiveIntegerField(
+        default=0
+    )
+
+    max_attempts = models.PositiveIntegerField(
+        default=3
+    )
+
+    run_at = models.DateTimeField(
+        default=now
+    )
+
+    locked_by = models.CharField(
+        max_length=100,
+        blank=True
+    )
+
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True
+    )
+
+    last_error = models.TextField(
+        blank=True
+    )
+
+    result = models.JSONField(
+        null=True,
+        blank=True
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True
+    )
+
+
+    class Meta:
+
+        indexes = [
+
+            # Prise de tâche par les workers
+            models.Index(
+                fields=['run_at', 'id'],
+                condition=models.Q(status='pending'),
+                name='job_pending_idx',
+            ),
+
+        ]
+
+
+    def __str__(self):
+
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+
+# ======================================================
+# ANALYTIQUE (journal d'événements et agrégats, voir market.analytics)
+# ======================================================
+
+class AnalyticsEvent(models.Model):
+    """
+    Journal en ajout seul : une ligne par (type, cible, jour) et par lot
+    d'écriture, `count` occurrences. Aucune clé étrangère ni index
+    secondaire : l'insertion reste bon marché. Vidé par
+    `manage.py rollup_analytics`, qui reporte les compteurs dans les
+    agrégats journaliers.
+    """
+
+    PRODUCT_VIEW = 1
+    VENDOR_VIEW = 2
+    WHATSAPP_CLICK = 3
+
+    KIND_CHOICES = (
+        (PRODUCT_VIEW, 'Vue produit'),
+        (VENDOR_VIEW, 'Vue vendeur'),
+        (WHATSAPP_CLICK, 'Clic WhatsApp'),
+    )
+
+    kind = models.PositiveSmallIntegerField(
+        choices=KIND_CHOICES
+    )
+
+    product_id = models.PositiveIntegerField(
+        null=True
+    )
+
+    vendor_id = models.PositiveIntegerField(
+        null=True
+    )
+
+    # Jour local de l'événement
+    day = models.DateField()
+
+    count = models.PositiveIntegerField(
+        default=1
+    )
+
+    created_at = models.DateTimeField(
+        default=now
+    )
+
+
+    def __str__(self):
+
+        return f"{self.get_kind_display()} × {self.count} ({self.day})"
+
+
+class ProductDailyStats(models.Model):
+
+    # Pas de contrainte : l'historique survit à l'archivage du produit.
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+
+    vendor = models.ForeignKey(
+        Vendor,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    day = models.DateField()
+
+    views = models.PositiveIntegerField(
+        default=0
+    )
+
+    whatsapp_clicks = models.PositiveIntegerField(
+        default=0
+    )
+
+
+    class Meta:
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product', 'day'],
+                name='product_daily_stats_unique',
+            ),
+        ]
+
+        indexes = [
+
+            # Dashboard : produits d'un vendeur sur une période
+            models.Index(
+                fields=['vendor', 'day'],
+                name='product_stats_vendor_day_idx',
+            ),
+
+        ]
+
+
+    def __str__(self):
+
+        return f"produit {self.product_id} {self.day}"
+
+
+class VendorDailyStats(models.Model):
+
+    vendor = models.ForeignKey(
+        Vendor,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    day = models.DateField()
+
+    # Vues de la page vendeur
+    views = models.PositiveIntegerField(
+        default=0
+    )
+
+    # Vues des pages de ses produits
+    product_views = models.PositiveIntegerField(
+        default=0
+    )
+
+    whatsapp_clicks = models.PositiveIntegerField(
+        default=0
+    )
+
+
+    class Meta:
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=['vendor', 'day'],
+                name='vendor_daily_stats_unique',
+            ),
+        ]
 
 
     def __str__(self):
 
-        return self.name
\ No newline at end of file
+        return f"vendeur {self.vendor_id} {self.day}"
@@ -0,0 +1,307 @@
+"""
+Pagination par curseur (keyset).
+
+Au lieu de `COUNT(*)` + `OFFSET`, chaque page filtre sur la dernière clé
+vue, par défaut `(created_at, id)` décroissants : le coût d'une page ne
+dépend pas de sa profondeur. Les curseurs sont opaques (base64) et
+utilisables aussi bien dans les templates que dans l'API JSON.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+
+
+DEFAULT_ORDERING = ('-created_at', '-id')
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# =====================================================
+# CURSEURS
+# =====================================================
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'dec' in value:
+            return Decimal(value['dec'])
+        raise InvalidCursor(value)
+    return value
+
+
+def encode_cursor(values, direction=NEXT):
+    payload = json.dumps(
+        [direction, [_encode_value(value) for value in values]],
+        separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in (NEXT, PREVIOUS):
+            raise InvalidCursor(token)
+        return direction, [_decode_value(value) for value in values]
+    except (binascii.Error, InvalidOperation, ValueError, TypeError) as exc:
+        raise InvalidCursor(token) from exc
+
+
+# =====================================================
+# COMPTAGE
+# =====================================================
+
+def approximate_count(queryset, cap=1000):
+    """
+    Estimation bon marché du nombre de lignes.
+
+    PostgreSQL : estimation du planificateur (EXPLAIN), sans parcours.
+    Autres     : comptage plafonné à `cap`.
+
+    Renvoie `(count, is_exact)`.
+    """
+    connection = connections[queryset.db]
+
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), False
+
+    count = queryset.order_by()[:cap + 1].count()
+    if count > cap:
+        return cap, False
+    return count, True
+
+
+# =====================================================
+# PAGINATEUR
+# =====================================================
+
+class CursorPage:
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.cursor_for(self.object_list[-1], NEXT)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.cursor_for(self.object_list[0], PREVIOUS)
+
+    @property
+    def count(self):
+        return self.paginator.count
+
+    @property
+    def count_is_exact(self):
+        return self.paginator.count_is_exact
+
+
+class CursorPaginator:
+    """
+    `ordering` : champs de tri, le dernier doit être unique (ex. `-id`).
+    `count`    : None (pas de comptage), 'exact' ou 'approximate'.
+    """
+
+    def __init__(self, queryset, per_page, ordering=DEFAULT_ORDERING,
+                 count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.count_mode = count
+        self._count = None
+
+    # ----- clés -----
+
+    @property
+    def fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def _key(self, obj):
+        if isinstance(obj, dict):
+            return [obj[field] for field in self.fields]
+        return [getattr(obj, field) for field in self.fields]
+
+    def cursor_for(self, obj, direction):
+        return encode_cursor(self._key(obj), direction)
+
+    def _output_field(self, name):
+        try:
+            return self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotation (ex. `search_rank`)
+            return self.queryset.query.annotations[name].output_field
+
+    def clean_values(self, values):
+        """
+        Valeurs d'un curseur reçu du client, converties par le champ de
+        tri correspondant (`to_python`). Lève `InvalidCursor`.
+        """
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor(values)
+
+        cleaned = []
+        for name, value in zip(self.fields, values):
+            try:
+                value = self._output_field(name).to_python(value)
+            except (ValidationError, TypeError, ValueError, KeyError) as exc:
+                raise InvalidCursor(values) from exc
+            if value is None:
+                raise InvalidCursor(values)
+            cleaned.append(value)
+        return cleaned
+
+    def keyset_filter(self, values, reverse=False):
+        """
+        Q « strictement après `values` » dans l'ordre de tri
+        (ou avant si `reverse`).
+        """
+        condition = Q()
+        equal = Q()
+
+        for field, value in zip(self.ordering, values):
+            descending = field.startswith('-')
+            name = field.lstrip('-')
+            lookup = 'lt' if descending != reverse else 'gt'
+
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+
+        return condition
+
+    # ----- pages -----
+
+    def _page_query(self, cursor):
+        """
+        `(queryset, direction, values)` de la page demandée.
+        """
+        direction, values = NEXT, None
+
+        if cursor:
+            # Curseur altéré : première page
+            try:
+                direction, values = decode_cursor(cursor)
+                values = self.clean_values(values)
+            except InvalidCursor:
+                direction, values = NEXT, None
+
+        queryset = self.queryset
+
+        if direction == PREVIOUS:
+            reversed_ordering = [
+                field[1:] if field.startswith('-') else '-' + field
+                for field in self.ordering
+            ]
+            queryset = queryset.filter(self.keyset_filter(values, reverse=True))
+            return (
+                queryset.order_by(*reversed_ordering)[:self.per_page + 1],
+                direction,
+                values,
+            )
+
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(values))
+
+        return (
+            queryset.order_by(*self.ordering)[:self.per_page + 1],
+            direction,
+            values,
+        )
+
+    def _build_page(self, rows, direction, values):
+        if direction == PREVIOUS:
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(rows, self, True, has_previous)
+
+        has_next = len(rows) > self.per_page
+
+        return CursorPage(
+            rows[:self.per_page], self, has_next, values is not None
+        )
+
+    def get_page(self, cursor=None):
+        queryset, direction, values = self._page_query(cursor)
+        return self._build_page(list(queryset), direction, values)
+
+    async def aget_page(self, cursor=None):
+        """
+        `get_page()` pour les vues async (ORM async).
+        """
+        queryset, direction, values = self._page_query(cursor)
+        rows = [row async for row in queryset]
+        return self._build_page(rows, direction, values)
+
+    # ----- comptage -----
+
+    def _compute_count(self):
+        if self.count_mode == 'exact':
+            return self.queryset.count(), True
+        if self.count_mode == 'approximate':
+            return approximate_count(self.queryset)
+        return None, False
+
+    @property
+    def count(self):
+        if self._count is None:
+            self._count = self._compute_count()
+        return self._count[0]
+
+    @property
+    def count_is_exact(self):
+        if self._count is None:
+            self._count = self._compute_count()
+        return self._count[1]
@@ -0,0 +1,124 @@
+"""
+Popularité des produits : vues et clics WhatsApp, décroissant avec le temps.
+
+    score(t) = Σ (vues + CLICK_WEIGHT × clics) × 2 ^ -((t - jour) / demi-vie)
+
+`Product.popularity` contient ce score ramené à une date de référence
+fixe (`POPULARITY_EPOCH`) : les événements d'un jour y ajoutent
+`(vues + CLICK_WEIGHT × clics) × 2 ^ ((jour - référence) / demi-vie)`.
+Le passage du temps multiplie tous les scores par le même facteur :
+trier sur la colonne (indexée) donne l'ordre du score décroissant, sans
+jamais réécrire les produits qui ne sont plus consultés.
+
+- Incrémental : chaque lot de `manage.py rollup_analytics` ajoute les
+  compteurs qu'il agrège (UPDATE par produit, dans la même transaction).
+- Complet : `manage.py rebuild_popularity` recalcule tout depuis
+  `ProductDailyStats` (changement de demi-vie, de poids ou de date de
+  référence).
+
+La valeur stockée double à chaque demi-vie écoulée depuis la référence :
+avancer `POPULARITY_EPOCH` puis reconstruire tous les quelques ans.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils.timezone import localdate
+
+from . import cache
+from .models import Product, ProductDailyStats
+
+
+POPULAR = 'popular'
+RECENT = 'recent'
+
+# Tri par popularité ; l'id départage les produits sans visite.
+POPULAR_ORDERING = ('-popularity', '-id')
+
+BATCH_SIZE = 500
+
+# Au-delà de cette fenêtre (en demi-vies), la contribution est négligeable.
+REBUILD_HALF_LIVES = 8
+
+
+def get_half_life():
+    return getattr(settings, 'POPULARITY_HALF_LIFE_DAYS', 7)
+
+
+def get_click_weight():
+    return getattr(settings, 'POPULARITY_CLICK_WEIGHT', 5)
+
+
+def get_epoch():
+    return date.fromisoformat(getattr(settings, 'POPULARITY_EPOCH', '2026-01-01'))
+
+
+def day_score(day, views, clicks):
+    """
+    Contribution des compteurs d'un jour, ramenée à la date de référence.
+    """
+    age = (day - get_epoch()).days
+    return (views + get_click_weight() * clicks) * 2 ** (age / get_half_life())
+
+
+def add_scores(scores):
+    """
+    `scores` : {product_id: contribution}. À appeler dans la transaction
+    qui consomme les événements correspondants.
+    """
+    for product_id, score in scores.items():
+        if score:
+            Product.objects.filter(pk=product_id).update(
+                popularity=F('popularity') + score
+            )
+
+    if scores:
+        transaction.on_commit(lambda: cache.bump(cache.POPULARITY))
+
+
+def rebuild(batch_size=BATCH_SIZE, progress=None):
+    """
+    Recalcule tous les scores depuis les agrégats journaliers des
+    `REBUILD_HALF_LIVES` dernières demi-vies. Renvoie le nombre de
+    produits modifiés.
+
+    Ne pas lancer en même temps que `rollup_analytics`.
+    """
+    since = localdate() - timedelta(days=get_half_life() * REBUILD_HALF_LIVES)
+
+    scores = defaultdict(float)
+    rows = (
+        ProductDailyStats.objects
+        .filter(day__gte=since)
+        .values_list('product_id', 'day', 'views', 'whatsapp_clicks')
+        .iterator(chunk_size=batch_size)
+    )
+    for product_id, day, views, clicks in rows:
+        scores[product_id] += day_score(day, views, clicks)
+
+    current = dict(
+        Product.objects
+        .filter(popularity__gt=0)
+        .values_list('pk', 'popularity')
+    )
+    changed = [
+        Product(pk=pk, popularity=scores.get(pk, 0))
+        for pk in set(current) | set(scores)
+        if current.get(pk, 0) != scores.get(pk, 0)
+    ]
+
+    # bulk_update : pas de save(), donc ni signaux ni updated_at.
+    for start in range(0, len(changed), batch_size):
+        with transaction.atomic():
+            Product.objects.bulk_update(
+                changed[start:start + batch_size], ['popularity']
+            )
+        if progress:
+            progress(min(start + batch_size, len(changed)))
+
+    if changed:
+        cache.bump(cache.POPULARITY)
+    return len(changed)
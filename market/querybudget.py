@@ -0,0 +1,132 @@
+"""
+Budget de requêtes SQL par vue.
+
+Chaque vue déclare le nombre maximal de requêtes qu'elle peut exécuter
+avec `@query_budget(n)`. `QueryBudgetMiddleware` compte les requêtes de
+chaque réponse (DEBUG et tests) : dépassement journalisé, ou exception
+si `QUERY_BUDGET_STRICT` est actif. `QueryBudgetTestMixin` offre la même
+vérification dans les tests.
+"""
+
+import logging
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import resolve
+
+from .middleware import QueryObserverMiddleware
+
+
+logger = logging.getLogger('market.querybudget')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries):
+    """
+    Déclare le budget de requêtes d'une vue.
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+def get_query_budget(view_func):
+    return getattr(view_func, 'query_budget', None)
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries():
+    """
+    Compte les requêtes exécutées sur toutes les connexions.
+    """
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        yield counter
+
+
+def check_budget(name, budget, counter):
+    if budget is None or counter.count <= budget:
+        return
+
+    message = (
+        f"{name} : {counter.count} requêtes SQL "
+        f"pour un budget de {budget}"
+    )
+    if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+        raise QueryBudgetExceeded(
+            message + "\n" + "\n".join(counter.queries)
+        )
+    logger.warning(message)
+
+
+# =====================================================
+# MIDDLEWARE
+# =====================================================
+
+class QueryBudgetMiddleware(QueryObserverMiddleware):
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', settings.DEBUG):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def observe(self, request):
+        return count_queries()
+
+    def finish(self, request, response, counter):
+        match = request.resolver_match
+        if match is not None:
+            check_budget(
+                match.view_name,
+                get_query_budget(match.func),
+                counter
+            )
+
+        response['X-Query-Count'] = str(counter.count)
+        return response
+
+
+# =====================================================
+# TESTS
+# =====================================================
+
+class QueryBudgetTestMixin:
+    """
+    À combiner avec `django.test.TestCase`.
+    """
+
+    def assertWithinQueryBudget(self, url, budget=None, method='get', **kwargs):
+        if budget is None:
+            budget = get_query_budget(resolve(url.split('?')[0]).func)
+        if budget is None:
+            self.fail(f"Aucun budget de requêtes déclaré pour {url}")
+
+        with count_queries() as counter:
+            response = getattr(self.client, method)(url, **kwargs)
+
+        self.assertLessEqual(
+            counter.count,
+            budget,
+            "\n".join(counter.queries)
+        )
+        return response
@@ -0,0 +1,227 @@
+"""
+File de tâches en arrière-plan, stockée en base (`market.Job`).
+
+    from market.queue import task
+
+    @task(max_attempts=5)
+    def send_welcome_email(user_id):
+        ...
+
+    job = send_welcome_email.enqueue(user.pk)
+
+Les tâches sont exécutées par `python manage.py run_worker`. Une tâche
+qui lève une exception est relancée avec un délai exponentiel, jusqu'à
+`max_attempts` essais. Avec `TASK_QUEUE_EAGER = True` (tests, dev sans
+worker) elles s'exécutent immédiatement dans le processus appelant.
+
+Les tâches terminées sont conservées `JOB_RETENTION_DAYS` jours, puis
+supprimées par `python manage.py purge_jobs`.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+
+from .models import Job
+
+
+logger = logging.getLogger('market.queue')
+
+registry = {}
+
+# Délai avant relance : RETRY_BASE * 2 ** (essai - 1) secondes
+RETRY_BASE = 10
+
+# Au-delà, une tâche « en cours » est considérée comme abandonnée.
+LOCK_TIMEOUT = timedelta(minutes=15)
+
+# Recherche des tâches abandonnées : au plus une fois par intervalle et
+# par processus, pas à chaque interrogation de la file.
+LOCK_RESET_INTERVAL = 60
+
+_locks_checked_at = None
+
+PURGE_BATCH_SIZE = 1000
+
+
+class UnknownTask(LookupError):
+    pass
+
+
+# =====================================================
+# DÉCLARATION / MISE EN FILE
+# =====================================================
+
+class Task:
+
+    def __init__(self, func, name, max_attempts):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, user_id=None, delay=None, **kwargs):
+        job = Job.objects.create(
+            task=self.name,
+            args=list(args),
+            kwargs=kwargs,
+            user_id=user_id,
+            max_attempts=self.max_attempts,
+            run_at=now() + delay if delay else now(),
+        )
+
+        if getattr(settings, 'TASK_QUEUE_EAGER', False):
+            return run_job(job.pk, 'eager')
+
+        return job
+
+
+def task(name=None, max_attempts=3):
+
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registry[task_name] = Task(func, task_name, max_attempts)
+        return registry[task_name]
+
+    return decorator
+
+
+# =====================================================
+# EXÉCUTION
+# =====================================================
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def reset_stale_locks(current):
+    """
+    Remet en file les tâches abandonnées par un worker arrêté brutalement.
+    """
+    global _locks_checked_at
+
+    checked = time.monotonic()
+    if (_locks_checked_at is not None
+            and checked - _locks_checked_at < LOCK_RESET_INTERVAL):
+        return 0
+    _locks_checked_at = checked
+
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=current - LOCK_TIMEOUT,
+    ).update(status=Job.PENDING, locked_by='', locked_at=None)
+
+
+def claim_next_job(worker):
+    """
+    Réserve la prochaine tâche prête. La réservation est un UPDATE
+    conditionnel : un seul worker peut l'obtenir, sur SQLite comme
+    sur PostgreSQL.
+    """
+    current = now()
+    reset_stale_locks(current)
+
+    candidates = (
+        Job.objects
+        .filter(status=Job.PENDING, run_at__lte=current)
+        .order_by('run_at', 'id')
+        .values_list('pk', flat=True)[:5]
+    )
+
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+            status=Job.RUNNING,
+            locked_by=worker,
+            locked_at=current,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+
+    return None
+
+
+def run_job(job_id, worker):
+    """
+    Exécute une tâche déjà réservée (ou en attente, en mode eager).
+    """
+    job = Job.objects.get(pk=job_id)
+    job.attempts += 1
+
+    try:
+        registered = registry.get(job.task)
+        if registered is None:
+            raise UnknownTask(job.task)
+
+        with transaction.atomic():
+            job.result = registered.func(*job.args, **job.kwargs)
+        job.status = Job.DONE
+        job.last_error = ''
+        job.finished_at = now()
+
+    except Exception as exc:
+        job.last_error = ''.join(traceback.format_exception(exc))
+
+        if job.attempts >= job.max_attempts or isinstance(exc, UnknownTask):
+            job.status = Job.FAILED
+            job.finished_at = now()
+            logger.error("Tâche %s échouée : %s", job, exc)
+        else:
+            job.status = Job.PENDING
+            job.run_at = now() + timedelta(
+                seconds=RETRY_BASE * 2 ** (job.attempts - 1)
+            )
+            logger.warning(
+                "Tâche %s : essai %s/%s échoué, relance à %s",
+                job, job.attempts, job.max_attempts, job.run_at
+            )
+
+    job.locked_by = ''
+    job.locked_at = None
+    job.save()
+    return job
+
+
+def run_next_job(worker=None):
+    worker = worker or worker_id()
+    job = claim_next_job(worker)
+    if job is None:
+        return None
+    return run_job(job.pk, worker)
+
+
+# =====================================================
+# RÉTENTION (python manage.py purge_jobs)
+# =====================================================
+
+def finished_jobs(days):
+    return Job.objects.filter(
+        status__in=(Job.DONE, Job.FAILED),
+        finished_at__lt=now() - timedelta(days=days),
+    )
+
+
+def purge_jobs(days, batch_size=PURGE_BATCH_SIZE):
+    """
+    Supprime par lots les tâches terminées depuis plus de `days` jours.
+    Renvoie le nombre de tâches supprimées.
+    """
+    deleted = 0
+    while True:
+        pks = list(
+            finished_jobs(days)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return deleted
+        deleted += Job.objects.filter(pk__in=pks).delete()[0]
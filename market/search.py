@@ -0,0 +1,270 @@
+"""
+Recherche plein texte des produits.
+
+SQLite (dev)      : table virtuelle FTS5 `market_product_fts`, classement bm25.
+PostgreSQL (prod) : colonne `search_vector` (tsvector) + index GIN, ts_rank.
+
+L'index ne contient que les produits actifs. Il est tenu à jour par les
+signaux de `market.signals` et reconstruit par
+`python manage.py rebuild_search_index`.
+"""
+
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connection, OperationalError
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+
+
+FTS_TABLE = 'market_product_fts'
+
+SEARCH_CONFIG = 'french'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+# =====================================================
+# BACKENDS
+# =====================================================
+
+class BaseSearchBackend:
+    """
+    Interface commune : `search()` filtre et classe un queryset de produits,
+    les autres méthodes maintiennent l'index.
+    """
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def index_products(self, product_ids):
+        pass
+
+    def remove_products(self, product_ids):
+        pass
+
+    def index_vendor(self, vendor_id):
+        ids = list(
+            Product.objects
+            .filter(vendor_id=vendor_id)
+            .values_list('pk', flat=True)
+        )
+        self.index_products(ids)
+
+    def rebuild(self):
+        return 0
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """
+    Repli sans index (autres moteurs, SQLite sans FTS5).
+    """
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) |
+            Q(description__icontains=query) |
+            Q(vendor__name__icontains=query)
+        )
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+
+    def _match(self, query):
+        # Chaque mot devient un préfixe entre guillemets : pas d'injection
+        # de syntaxe FTS5 possible depuis la barre de recherche.
+        tokens = TOKEN_RE.findall(query)
+        return ' '.join('"%s"*' % token for token in tokens)
+
+    def search(self, queryset, query):
+        match = self._match(query)
+        if not match:
+            return queryset.none()
+
+        table = Product._meta.db_table
+
+        # Jointure directe sur la table FTS : SQLite part de l'index
+        # (MATCH) puis lit les produits par clé primaire.
+        return (
+            queryset
+            .extra(
+                tables=[FTS_TABLE],
+                where=[
+                    f'"{FTS_TABLE}".rowid = "{table}"."id"',
+                    f'"{FTS_TABLE}" MATCH %s',
+                ],
+                params=[match],
+            )
+            .annotate(search_rank=RawSQL(
+                f'-bm25("{FTS_TABLE}", 10.0, 2.0, 5.0)',
+                (),
+                output_field=FloatField()
+            ))
+            .order_by('-search_rank', '-created_at')
+        )
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+
+        rows = (
+            Product.objects
+            .filter(pk__in=product_ids, is_active=True)
+            .values_list('pk', 'name', 'description', 'vendor__name')
+        )
+
+        with connection.cursor() as cursor:
+            self._delete(cursor, product_ids)
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} '
+                f'(rowid, name, description, vendor_name) '
+                f'VALUES (%s, %s, %s, %s)',
+                list(rows)
+            )
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+
+        with connection.cursor() as cursor:
+            self._delete(cursor, product_ids)
+
+    def _delete(self, cursor, product_ids):
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(pk,) for pk in product_ids]
+        )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} '
+                f'(rowid, name, description, vendor_name) '
+                f'SELECT p.id, p.name, p.description, v.name '
+                f'FROM market_product p '
+                f'JOIN market_vendor v ON v.id = p.vendor_id '
+                f'WHERE p.is_active'
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"
+            )
+            cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+            return cursor.fetchone()[0]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+
+    VECTOR_SQL = (
+        "setweight(to_tsvector(%(config)s, coalesce(p.name, '')), 'A') || "
+        "setweight(to_tsvector(%(config)s, coalesce(v.name, '')), 'B') || "
+        "setweight(to_tsvector(%(config)s, coalesce(p.description, '')), 'C')"
+    ) % {'config': f"'{SEARCH_CONFIG}'"}
+
+    def search(self, queryset, query):
+        if not TOKEN_RE.search(query):
+            return queryset.none()
+
+        tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+
+        return (
+            queryset
+            .filter(RawSQL(
+                f'"market_product"."search_vector" @@ {tsquery}',
+                (query,),
+                output_field=BooleanField()
+            ))
+            .annotate(search_rank=RawSQL(
+                f'ts_rank("market_product"."search_vector", {tsquery})',
+                (query,),
+                output_field=FloatField()
+            ))
+            .order_by('-search_rank', '-created_at')
+        )
+
+    def _update(self, where='', params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE market_product p '
+                f'SET search_vector = CASE WHEN p.is_active '
+                f'THEN {self.VECTOR_SQL} ELSE NULL END '
+                f'FROM market_vendor v WHERE v.id = p.vendor_id {where}',
+                params
+            )
+            return cursor.rowcount
+
+    def index_products(self, product_ids):
+        product_ids = list(product_ids)
+        if product_ids:
+            self._update('AND p.id = ANY(%s)', (product_ids,))
+
+    def index_vendor(self, vendor_id):
+        self._update('AND p.vendor_id = %s', (vendor_id,))
+
+    def rebuild(self):
+        self._update()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT count(*) FROM market_product '
+                'WHERE search_vector IS NOT NULL'
+            )
+            return cursor.fetchone()[0]
+
+
+# =====================================================
+# SÉLECTION DU BACKEND
+# =====================================================
+
+_fts5_tables = {}
+
+
+def _has_fts_table():
+    alias = connection.alias
+    if alias not in _fts5_tables:
+        try:
+            with connection.cursor() as cursor:
+                _fts5_tables[alias] = (
+                    FTS_TABLE in connection.introspection.table_names(cursor)
+                )
+        except OperationalError:
+            _fts5_tables[alias] = False
+    return _fts5_tables[alias]
+
+
+def get_search_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+
+    if connection.vendor == 'sqlite' and _has_fts_table():
+        return SQLiteSearchBackend()
+
+    return SimpleSearchBackend()
+
+
+def preload_search_backend():
+    """
+    Détecte le backend au démarrage du serveur : la première recherche de
+    chaque processus ne paie pas l'introspection (budget de l'accueil).
+    """
+    try:
+        return get_search_backend()
+    finally:
+        # Pas de connexion partagée avec les workers forkés (--preload)
+        connection.close()
+
+
+def search_products(queryset, query):
+    """
+    Filtre `queryset` sur `query` et le trie par pertinence.
+    """
+    return get_search_backend().search(queryset, query)
+
+
+async def asearch_products(queryset, query):
+    # Détection du backend : peut interroger la base (table FTS5).
+    backend = await sync_to_async(get_search_backend)()
+    return backend.search(queryset, query)
@@ -0,0 +1,95 @@
+"""
+Sessions et chargement de l'utilisateur connecté.
+
+Moteur de session choisi par `SESSION_BACKEND` (voir settings) :
+
+- `db` : table `django_session` (défaut) ;
+- `cache` : cache partagé (Redis), ou `cached_db` avec un cache local
+  au processus — lectures depuis le cache, écritures en base ;
+- `signed_cookies` : aucune écriture serveur ; une session ne peut pas
+  être révoquée avant son expiration.
+
+`VendorModelBackend` charge l'utilisateur et son `Vendor` en une seule
+jointure : `request.user.vendor` ne coûte plus de requête dans le
+dashboard, les pages produit et la page premium.
+
+Sessions expirées (moteurs en base) : python manage.py clear_expired_sessions
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.sessions.models import Session
+from django.http import Http404
+from django.utils.timezone import now
+
+
+BATCH_SIZE = 1000
+
+# Moteurs qui écrivent les sessions dans `django_session`
+DB_ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+# Connexion sans authenticate() (inscription) : backend à préciser, il y
+# en a plusieurs dans AUTHENTICATION_BACKENDS.
+VENDOR_BACKEND = 'market.sessions.VendorModelBackend'
+
+
+class VendorModelBackend(ModelBackend):
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = (
+                UserModel._default_manager
+                .select_related('vendor')
+                .get(pk=user_id)
+            )
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+def request_vendor(request):
+    """
+    Vendeur de l'utilisateur connecté (déjà chargé avec lui), ou 404.
+    """
+    try:
+        return request.user.vendor
+    except (AttributeError, get_user_model().vendor.RelatedObjectDoesNotExist):
+        raise Http404
+
+
+def stores_sessions_in_db():
+    return settings.SESSION_ENGINE in DB_ENGINES
+
+
+def clear_expired_sessions(batch_size=BATCH_SIZE, pause=0, progress=None):
+    """
+    Supprime par lots les sessions expirées de `django_session` : de
+    courtes transactions, sans verrouiller toute la table comme
+    `manage.py clearsessions`.
+    """
+    cutoff = now()
+    total = 0
+
+    while True:
+        keys = list(
+            Session.objects
+            .filter(expire_date__lt=cutoff)
+            .order_by('expire_date')
+            .values_list('session_key', flat=True)[:batch_size]
+        )
+        if not keys:
+            return total
+
+        total += Session.objects.filter(session_key__in=keys).delete()[0]
+        if progress:
+            progress(total)
+        if pause:
+            time.sleep(pause)
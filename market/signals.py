@@ -0,0 +1,140 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import cache, facets, images, tasks
+from .models import Vendor, Product, Category
+from .search import get_search_backend
+
+
+# =====================================================
+# INDEX DE RECHERCHE
+# =====================================================
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    backend = get_search_backend()
+    if instance.is_active:
+        backend.index_products([instance.pk])
+    else:
+        backend.remove_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Vendor)
+def reindex_vendor_products(sender, instance, created=False, raw=False, **kwargs):
+    # Le nom du vendeur est indexé avec chaque produit.
+    if raw or created:
+        return
+
+    update_fields = kwargs.get('update_fields')
+    if update_fields and 'name' not in update_fields:
+        return
+
+    get_search_backend().index_vendor(instance.pk)
+
+
+# =====================================================
+# FACETTES (compteurs par catégorie / tranche de prix)
+# =====================================================
+
+@receiver(post_save, sender=Product)
+def update_facets(sender, instance, created=False, raw=False, using=None,
+                  update_fields=None, **kwargs):
+    if raw:
+        return
+
+    if update_fields and not set(update_fields) & Product.TRACKED_FIELDS:
+        return
+
+    # État précédent lu (et verrouillé) par Product.save()
+    previous = None if created else getattr(instance, '_previous_state', None)
+    facets.product_changed(previous, instance.state, using=using)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_facets(sender, instance, using=None, **kwargs):
+    facets.product_changed(instance.state, None, using=using)
+
+
+@receiver(post_delete, sender=Category)
+def move_category_facet(sender, instance, using=None, **kwargs):
+    facets.category_deleted(instance.pk, using=using)
+
+
+# =====================================================
+# QUOTA DE PRODUITS ACTIFS
+# =====================================================
+
+@receiver(post_delete, sender=Product)
+def release_product_slot(sender, instance, using=None, **kwargs):
+    # Envoyé pour chaque produit, aussi par QuerySet.delete() (action
+    # « supprimer » de l'admin), dans la transaction de la suppression.
+    if instance.is_active:
+        Vendor.objects.using(using).filter(
+            pk=instance.vendor_id
+        ).release_product_slots()
+
+
+# =====================================================
+# DÉRIVÉS D'IMAGES
+# =====================================================
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Vendor)
+def process_image(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    source = instance.image.name if instance.image else None
+    if (instance.image_renditions or {}).get('source') == source:
+        return
+
+    owner_id = (
+        instance.vendor.user_id if sender is Product else instance.user_id
+    )
+
+    # Redimensionnement hors requête : voir market.tasks. La vue renvoie
+    # le numéro de la tâche au navigateur (suivi via /api/jobs/<id>/).
+    instance.image_job = tasks.process_image.enqueue(
+        sender._meta.label, instance.pk, user_id=owner_id
+    )
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Vendor)
+def delete_image_renditions(sender, instance, **kwargs):
+    images.delete_renditions(instance.image.storage, instance.image_renditions)
+
+
+# =====================================================
+# INVALIDATION DU CACHE
+# =====================================================
+
+def bump_on_commit(*namespaces, using=None):
+    # Après le COMMIT : sinon une requête concurrente relit l'ancienne ligne
+    # et la met en cache sous la nouvelle version (jusqu'au TTL).
+    transaction.on_commit(lambda: cache.bump(*namespaces), using=using)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_products(sender, using=None, **kwargs):
+    bump_on_commit(cache.PRODUCTS, using=using)
+
+
+@receiver([post_save, post_delete], sender=Vendor)
+def invalidate_vendors(sender, using=None, **kwargs):
+    # Les cartes produits affichent le nom et le badge du vendeur.
+    bump_on_commit(cache.VENDORS, cache.PRODUCTS, using=using)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_categories(sender, using=None, **kwargs):
+    bump_on_commit(cache.CATEGORIES, cache.PRODUCTS, using=using)
@@ -0,0 +1,272 @@
+"""
+Profilage SQL par requête HTTP (dev / staging).
+
+`SQLProfilerMiddleware` observe toutes les requêtes SQL via
+`connection.execute_wrapper` et les regroupe par « forme » (SQL sans
+valeurs, listes `IN (...)` réduites). Pour chaque requête HTTP :
+
+- une forme exécutée au moins `SQL_PROFILER_N_PLUS_ONE` fois est signalée
+  comme N+1 probable, avec la ligne de template ou de code qui l'a émise ;
+- une requête plus lente que `SQL_PROFILER_SLOW_MS` est journalisée.
+
+Les alertes sont écrites dans le logger `market.sql` et ajoutées (JSON
+par ligne) au fichier `SQL_PROFILER_LOG`, que résume
+`python manage.py sql_report`.
+"""
+
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Node
+from django.utils.timezone import now
+
+from .middleware import QueryObserverMiddleware
+
+
+logger = logging.getLogger('market.sql')
+
+DEFAULT_SLOW_MS = 100
+
+DEFAULT_N_PLUS_ONE = 5
+
+_write_lock = threading.Lock()
+
+_IN_LIST_RE = re.compile(r'\bIN \((?:\?, )*\?\)', re.IGNORECASE)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_SPACES_RE = re.compile(r'\s+')
+
+def sql_shape(sql):
+    """
+    Forme normalisée d'une requête : deux requêtes qui ne diffèrent que
+    par leurs valeurs ont la même forme.
+    """
+    shape = _STRING_RE.sub('?', sql)
+    shape = _NUMBER_RE.sub('?', shape)
+    shape = shape.replace('%s', '?')
+    shape = _IN_LIST_RE.sub('IN (...)', shape)
+    return _SPACES_RE.sub(' ', shape).strip()
+
+
+def _is_execute_wrapper(frame):
+    # Les autres instruments (metrics, querybudget) sont aussi dans la pile.
+    return frame.f_code.co_varnames[:5] == (
+        'self', 'execute', 'sql', 'params', 'many'
+    )
+
+
+def _call_site():
+    """
+    Origine de la requête : nœud de template (nom:ligne) le plus proche
+    et premier cadre du code du projet (hors Django et bibliothèques).
+    """
+    template = None
+    code = None
+    base_dir = str(settings.BASE_DIR)
+
+    frame = sys._getframe(2)
+    while frame is not None and (template is None or code is None):
+        filename = frame.f_code.co_filename
+
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            if isinstance(node, Node) and getattr(node, 'origin', None):
+                token = getattr(node, 'token', None)
+                lineno = token.lineno if token is not None else '?'
+                name = node.origin.template_name or node.origin.name
+                template = f'{name}:{lineno}'
+
+        if (
+            code is None
+            and filename.startswith(base_dir)
+            and 'site-packages' not in filename
+            and not _is_execute_wrapper(frame)
+        ):
+            code = (
+                f'{Path(filename).relative_to(base_dir)}:'
+                f'{frame.f_lineno} ({frame.f_code.co_name})'
+            )
+
+        frame = frame.f_back
+
+    return template, code
+
+
+# =====================================================
+# COLLECTE
+# =====================================================
+
+class QueryGroup:
+
+    def __init__(self, shape, sql):
+        self.shape = shape
+        self.sql = sql
+        self.count = 0
+        self.duration = 0.0
+        self.sites = {}
+
+    def add(self, duration, site):
+        self.count += 1
+        self.duration += duration
+        self.sites[site] = self.sites.get(site, 0) + 1
+
+    def top_site(self):
+        site = max(self.sites, key=self.sites.get)
+        return {'template': site[0], 'code': site[1]}
+
+
+class SQLProfiler:
+
+    def __init__(self, slow_ms=DEFAULT_SLOW_MS):
+        self.slow_ms = slow_ms
+        self.groups = {}
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            site = _call_site()
+            shape = sql_shape(sql)
+
+            group = self.groups.get(shape)
+            if group is None:
+                group = self.groups[shape] = QueryGroup(shape, sql)
+            group.add(duration, site)
+
+            if duration >= self.slow_ms:
+                self.slow.append({
+                    'sql': sql,
+                    'shape': shape,
+                    'ms': round(duration, 3),
+                    'template': site[0],
+                    'code': site[1],
+                })
+
+    def repeated(self, threshold):
+        return sorted(
+            (group for group in self.groups.values() if group.count >= threshold),
+            key=lambda group: group.count,
+            reverse=True
+        )
+
+
+@contextmanager
+def profile_queries(slow_ms=DEFAULT_SLOW_MS):
+    """
+    Profile les requêtes exécutées sur toutes les connexions.
+    """
+    profiler = SQLProfiler(slow_ms)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(profiler))
+        yield profiler
+
+
+# =====================================================
+# JOURNAL
+# =====================================================
+
+def get_log_path():
+    path = getattr(settings, 'SQL_PROFILER_LOG', None)
+    return Path(path) if path else None
+
+
+def write_events(events, path=None):
+    if path is None:
+        path = get_log_path()
+    if path is None or not events:
+        return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _write_lock, open(path, 'a', encoding='utf-8') as handle:
+        for event in events:
+            handle.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+
+def read_events(path=None):
+    path = Path(path) if path else get_log_path()
+    if path is None or not path.exists():
+        return
+
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def build_events(view, path, profiler, threshold):
+    timestamp = now().isoformat()
+    events = []
+
+    for group in profiler.repeated(threshold):
+        site = group.top_site()
+        events.append({
+            'kind': 'n+1',
+            'at': timestamp,
+            'view': view,
+            'path': path,
+            'shape': group.shape,
+            'count': group.count,
+            'ms': round(group.duration, 3),
+            **site,
+        })
+        logger.warning(
+            "N+1 probable dans %s : %s× %s (%s)",
+            view, group.count, group.shape,
+            site['template'] or site['code']
+        )
+
+    for query in profiler.slow:
+        events.append({
+            'kind': 'slow',
+            'at': timestamp,
+            'view': view,
+            'path': path,
+            'count': 1,
+            **query,
+        })
+        logger.warning(
+            "Requête lente dans %s (%.1f ms) : %s",
+            view, query['ms'], query['sql']
+        )
+
+    return events
+
+
+# =====================================================
+# MIDDLEWARE
+# =====================================================
+
+class SQLProfilerMiddleware(QueryObserverMiddleware):
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_PROFILER_ENABLED', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.slow_ms = getattr(settings, 'SQL_PROFILER_SLOW_MS', DEFAULT_SLOW_MS)
+        self.threshold = getattr(
+            settings, 'SQL_PROFILER_N_PLUS_ONE', DEFAULT_N_PLUS_ONE
+        )
+
+    def observe(self, request):
+        return profile_queries(self.slow_ms)
+
+    def finish(self, request, response, profiler):
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+
+        write_events(build_events(view, request.path, profiler, self.threshold))
+        return response
@@ -0,0 +1,249 @@
+"""
+Optimisation des fichiers statiques à la collecte.
+
+`OptimizedStaticFilesStorage` complète le stockage WhiteNoise
+(`CompressedManifestStaticFilesStorage`) ; pendant
+`python manage.py collectstatic`, avant le hachage des noms :
+
+- les images matricielles (PNG, JPEG) sont redimensionnées
+  (`STATIC_IMAGE_SIZES`, `STATIC_IMAGE_MAX_DIMENSION`), débarrassées de
+  leurs métadonnées et recompressées ; le résultat n'est gardé que s'il
+  est plus léger que l'original ;
+- chaque image reçoit un dérivé WebP (`logo-auth.png` -> `logo-auth.webp`),
+  utilisé par `{% static_picture %}` ;
+- les fichiers au contenu identique ne sont copiés qu'une fois : le
+  manifeste fait pointer les doublons vers le même fichier haché ;
+- un fichier final plus lourd que son budget (`STATIC_ASSET_BUDGET`,
+  `STATIC_ASSET_BUDGETS`) fait échouer la collecte.
+
+Les images sont toujours relues depuis les sources (`market/static`) :
+relancer collectstatic ne recompresse pas un fichier déjà compressé.
+"""
+
+import hashlib
+import os
+from fnmatch import fnmatch
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from .images import QUALITY
+
+
+RASTER_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+MAX_DIMENSION = 1024
+
+ASSET_BUDGET = 200 * 1024
+
+
+class StaticAssetBudgetExceeded(Exception):
+    pass
+
+
+def webp_name(name):
+    base, _ = os.path.splitext(name)
+    return f'{base}.webp'
+
+
+def webp_sibling(name):
+    """
+    Nom du dérivé WebP de `name` s'il a été produit par collectstatic,
+    sinon None (développement : fichiers servis depuis les sources).
+    """
+    if settings.DEBUG:
+        return None
+    sibling = webp_name(name)
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+    return sibling if sibling in hashed_files else None
+
+
+def _setting_for(name, patterns, default):
+    for pattern, value in patterns.items():
+        if fnmatch(name, pattern):
+            return value
+    return default
+
+
+def max_dimension(name):
+    return _setting_for(
+        name,
+        getattr(settings, 'STATIC_IMAGE_SIZES', {}),
+        getattr(settings, 'STATIC_IMAGE_MAX_DIMENSION', MAX_DIMENSION),
+    )
+
+
+def asset_budget(name):
+    return _setting_for(
+        name,
+        getattr(settings, 'STATIC_ASSET_BUDGETS', {}),
+        getattr(settings, 'STATIC_ASSET_BUDGET', ASSET_BUDGET),
+    )
+
+
+# =====================================================
+# IMAGES
+# =====================================================
+
+def _encode(image, fmt):
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    elif fmt == 'WEBP' and image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGBA')
+
+    options = {'optimize': True}
+    if fmt == 'JPEG':
+        options.update(quality=QUALITY['jpeg'], progressive=True)
+    elif fmt == 'WEBP':
+        options.update(quality=QUALITY['webp'], method=6)
+
+    buffer = BytesIO()
+    image.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+
+def optimize_image(data, max_size):
+    """
+    Renvoie `(contenu, webp)` : l'image redimensionnée et recompressée
+    dans son format d'origine (ou `data` si ce n'est pas plus léger), et
+    son dérivé WebP (None si l'image est déjà en WebP).
+    """
+    image = Image.open(BytesIO(data))
+    fmt = image.format
+    image = ImageOps.exif_transpose(image)
+    image.load()
+
+    # Pas d'agrandissement
+    if max(image.size) > max_size:
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+
+    content = _encode(image, fmt)
+    if len(content) >= len(data):
+        content = data
+
+    webp = _encode(image, 'WEBP') if fmt != 'WEBP' else None
+    return content, webp
+
+
+# =====================================================
+# STOCKAGE
+# =====================================================
+
+class OptimizedStaticFilesStorage(CompressedManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run=dry_run, **options)
+            return
+
+        paths = dict(paths)
+        duplicates = {}
+        digests = {}
+
+        for name in sorted(paths):
+            if self._is_adjustable(name):
+                continue
+
+            storage, path = paths[name]
+            with storage.open(path) as source:
+                data = source.read()
+
+            optimized, webp = data, None
+            if name.lower().endswith(RASTER_EXTENSIONS):
+                optimized, webp = self._optimize(name, data)
+
+            digest = hashlib.sha256(optimized).hexdigest()
+            if digest in digests:
+                duplicates[name] = digests[digest]
+                del paths[name]
+                continue
+            digests[digest] = name
+
+            if optimized is not data:
+                self._replace(name, optimized)
+                paths[name] = (self, name)
+
+            if webp is not None:
+                sibling = webp_name(name)
+                if sibling not in paths:
+                    self._replace(sibling, webp)
+                    paths[sibling] = (self, sibling)
+
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+        yield from self._link_duplicates(duplicates)
+
+        yield from self._check_budgets()
+
+    def stored_name(self, name):
+        # Référence vers un fichier absent (manifeste pas encore généré,
+        # image manquante) : URL non hachée, pas d'erreur 500.
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def _is_adjustable(self, name):
+        # CSS / JS : leurs références sont réécrites par le manifeste,
+        # ils ne sont ni optimisés ni dédoublonnés.
+        return any(fnmatch(name, pattern) for pattern in self._patterns)
+
+    def _optimize(self, name, data):
+        try:
+            return optimize_image(data, max_dimension(name))
+        except (OSError, ValueError):
+            # Fichier illisible par Pillow : copié tel quel
+            return data, None
+
+    def _replace(self, name, content):
+        # Remplace aussi un lien symbolique (collectstatic --link)
+        # sans toucher à la source.
+        if self.exists(name):
+            self.delete(name)
+        self.save(name, ContentFile(content))
+
+    def _link_duplicates(self, duplicates):
+        if not duplicates:
+            return
+
+        for duplicate, original in duplicates.items():
+            hashed_name = self.hashed_files.get(self.hash_key(original))
+            if hashed_name is None:
+                continue
+
+            self.hashed_files[self.hash_key(duplicate)] = hashed_name
+
+            sibling = self.hashed_files.get(self.hash_key(webp_name(original)))
+            if sibling and webp_name(duplicate) not in self.hashed_files:
+                self.hashed_files[self.hash_key(webp_name(duplicate))] = sibling
+
+            if self.exists(duplicate):
+                self.delete(duplicate)
+
+            yield duplicate, hashed_name, True
+
+        self.save_manifest()
+
+    def _check_budgets(self):
+        over_budget = []
+
+        for name, hashed_name in sorted(self.hashed_files.items()):
+            budget = asset_budget(name)
+            if budget is None:
+                continue
+            size = self.size(hashed_name)
+            if size > budget:
+                over_budget.append(
+                    f'{name} : {size // 1024} Ko (budget {budget // 1024} Ko)'
+                )
+
+        if over_budget:
+            yield ', '.join(over_budget), None, StaticAssetBudgetExceeded(
+                'Fichiers statiques trop lourds :\n  '
+                + '\n  '.join(over_budget)
+            )
+
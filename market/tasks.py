@@ -0,0 +1,30 @@
+"""
+Tâches en arrière-plan du marché (exécutées par `manage.py run_worker`).
+"""
+
+from django.apps import apps
+
+from . import cache, images
+from .queue import task
+
+
+@task(max_attempts=5)
+def process_image(model_label, pk):
+    """
+    Génère les dérivés de l'image d'un Product / Vendor.
+    """
+    model = apps.get_model(model_label)
+
+    instance = (
+        model.objects
+        .filter(pk=pk)
+        .only('pk', 'image', 'image_renditions')
+        .first()
+    )
+    if instance is None:
+        return False
+
+    changed = images.process_image(instance)
+    if changed:
+        cache.bump(*cache.CATALOG)
+    return changed
@@ -0,0 +1,245 @@
+"""
+Moteur de templates Django instrumenté : le temps de rendu de chaque
+template est ajouté aux mesures de la requête (voir market.metrics).
+
+Profileur de rendu (dev / staging, `TEMPLATE_PROFILER_ENABLED`) :
+`TemplateProfilerMiddleware` attribue le temps propre de chaque nœud
+(temps du nœud moins celui des nœuds qu'il contient) au template qui le
+définit et à sa balise (`url`, `static`, `for`, `include`, variable,
+texte...). Le résultat de chaque requête est ajouté (JSON par ligne) au
+fichier `TEMPLATE_PROFILER_LOG`, que résume
+`python manage.py template_report`.
+
+Les templates sont compilés une fois par processus (chargeur `cached`,
+voir TEMPLATES) ; `preload_templates()` les compile au démarrage.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template import TemplateDoesNotExist, engines
+from django.template import base as template_base
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.utils import get_app_template_dirs
+from django.utils.timezone import now
+
+from .metrics import record_template
+from .middleware import QueryObserverMiddleware
+from .sqlprofile import write_events
+
+
+logger = logging.getLogger('market.templates')
+
+
+class InstrumentedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            record_template(time.perf_counter() - started)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+
+    def __init__(self, params):
+        super().__init__(params)
+        if getattr(settings, 'TEMPLATE_PROFILER_ENABLED', False):
+            _install_profiler()
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(
+            self.engine.from_string(template_code), self
+        )
+
+    def get_template(self, template_name):
+        try:
+            return InstrumentedTemplate(
+                self.engine.get_template(template_name), self
+            )
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def preload_templates(prefix='market/'):
+    """
+    Compile les templates de l'application au démarrage du serveur : la
+    première requête de chaque page ne paie pas l'analyse des fichiers.
+    """
+    started = time.perf_counter()
+    count = 0
+
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        directories = list(backend.engine.dirs)
+        directories += get_app_template_dirs('templates')
+        for directory in directories:
+            root = Path(directory) / prefix
+            for path in sorted(root.rglob('*.html')):
+                backend.get_template(str(path.relative_to(directory)))
+                count += 1
+
+    logger.info(
+        "%s templates compilés en %.1f ms",
+        count, (time.perf_counter() - started) * 1000
+    )
+    return count
+
+
+# =====================================================
+# PROFILEUR DE RENDU
+# =====================================================
+
+_profile = ContextVar('market_template_profile', default=None)
+
+_original_render = template_base.Template._render
+_original_render_annotated = template_base.Node.render_annotated
+
+
+def node_label(node):
+    """
+    Balise d'un nœud : `url`, `for`, `{{ }}` (variable), `texte`...
+    """
+    label = getattr(node, '_profile_label', None)
+    if label is not None:
+        return label
+
+    token = getattr(node, 'token', None)
+    if isinstance(node, template_base.TextNode):
+        label = 'texte'
+    elif isinstance(node, template_base.VariableNode):
+        label = '{{ }}'
+    elif token is not None and token.contents:
+        label = token.contents.split(None, 1)[0]
+    else:
+        label = type(node).__name__
+
+    node._profile_label = label
+    return label
+
+
+def _template_name(origin):
+    if origin is None:
+        return '<string>'
+    return origin.template_name or origin.name
+
+
+class TemplateProfile:
+
+    def __init__(self):
+        # nom -> [rendus, ms propres]
+        self.templates = {}
+        # balise -> [appels, ms propres]
+        self.tags = {}
+        self.total = 0.0
+        self._children = []
+
+    def count_render(self, template):
+        name = _template_name(template.origin)
+        entry = self.templates.setdefault(name, [0, 0.0])
+        entry[0] += 1
+
+    def render_node(self, node, context):
+        self._children.append(0.0)
+        started = time.perf_counter()
+        try:
+            return _original_render_annotated(node, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            own = elapsed - self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+            else:
+                self.total += elapsed
+
+            ms = own * 1000
+            name = _template_name(getattr(node, 'origin', None))
+            self.templates.setdefault(name, [0, 0.0])[1] += ms
+
+            tag = self.tags.setdefault(node_label(node), [0, 0.0])
+            tag[0] += 1
+            tag[1] += ms
+
+    def as_event(self):
+        return {
+            'ms': round(self.total * 1000, 3),
+            'templates': {
+                name: [count, round(ms, 3)]
+                for name, (count, ms) in self.templates.items()
+            },
+            'tags': {
+                tag: [count, round(ms, 3)]
+                for tag, (count, ms) in self.tags.items()
+            },
+        }
+
+
+def _profiled_render(self, context):
+    profile = _profile.get()
+    if profile is not None:
+        profile.count_render(self)
+    return _original_render(self, context)
+
+
+def _profiled_render_annotated(self, context):
+    profile = _profile.get()
+    if profile is None:
+        return _original_render_annotated(self, context)
+    return profile.render_node(self, context)
+
+
+def _install_profiler():
+    # Une seule fois par processus ; sans profil actif, un simple appel
+    # de fonction en plus par nœud.
+    template_base.Template._render = _profiled_render
+    template_base.Node.render_annotated = _profiled_render_annotated
+
+
+@contextmanager
+def profile_templates():
+    # Pas de `reset(token)` : sous ASGI, l'entrée et la sortie ont lieu
+    # dans des contextes copiés différents (sync_to_async).
+    profile = TemplateProfile()
+    _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.set(None)
+
+
+def get_log_path():
+    path = getattr(settings, 'TEMPLATE_PROFILER_LOG', None)
+    return Path(path) if path else None
+
+
+class TemplateProfilerMiddleware(QueryObserverMiddleware):
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'TEMPLATE_PROFILER_ENABLED', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def observe(self, request):
+        return profile_templates()
+
+    def finish(self, request, response, profile):
+        path = get_log_path()
+        if path is None or not profile.templates:
+            return response
+
+        match = request.resolver_match
+        event = {
+            'at': now().isoformat(),
+            'view': match.view_name if match else '<unresolved>',
+            'path': request.path,
+            **profile.as_event(),
+        }
+        write_events([event], path)
+        return response
@@ -0,0 +1,82 @@
+from functools import lru_cache
+
+from django import template
+from django.templatetags.static import static
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from market.images import MIME_TYPES
+from market.staticfiles import webp_sibling
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(obj, sizes='100vw', **attrs):
+    """
+    <picture> AVIF / WebP / JPEG avec srcset à partir des dérivés de
+    `obj.image`, ou simple <img> (original ou image par défaut).
+
+        {% responsive_image product sizes="(min-width: 1024px) 25vw, 100vw" class="h-48 w-full" alt=product.name %}
+    """
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+
+    renditions = obj.renditions
+    if not renditions:
+        if not obj.image:
+            return static_picture(obj.DEFAULT_IMAGE, **attrs)
+        return format_html('<img src="{}"{}>', obj.image_url, flatatt(attrs))
+
+    formats = renditions.formats()
+    fallback = 'jpeg' if 'jpeg' in formats else formats[-1]
+
+    sources = format_html_join(
+        '',
+        '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (MIME_TYPES[fmt], renditions.srcset(fmt), sizes)
+            for fmt in formats if fmt != fallback
+        )
+    )
+
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        sources,
+        renditions.url(640, fallback),
+        renditions.srcset(fallback),
+        sizes,
+        flatatt(attrs),
+    )
+
+
+@register.simple_tag
+def static_picture(name, **attrs):
+    """
+    Fichier statique avec son dérivé WebP produit par collectstatic
+    (voir market/staticfiles.py), ou simple <img> s'il n'existe pas.
+
+        {% static_picture 'logo-auth.png' class="h-10" alt="Authentic Place" %}
+    """
+    attrs.setdefault('decoding', 'async')
+
+    src, webp_src = _static_sources(name)
+    img = format_html('<img src="{}"{}>', src, flatatt(attrs))
+
+    if webp_src is None:
+        return img
+
+    return format_html(
+        '<picture><source type="{}" srcset="{}">{}</picture>',
+        MIME_TYPES['webp'],
+        webp_src,
+        img,
+    )
+
+
+@lru_cache(maxsize=None)
+def _static_sources(name):
+    # Le manifeste ne change pas pendant la vie du processus.
+    sibling = webp_sibling(name)
+    return static(name), static(sibling) if sibling else None
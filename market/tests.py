@@ -1,3 +1,1455 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import json
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from PIL import Image
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError
+from django.http import Http404, HttpResponse
+from django.template import Context, Template
+from django.test import (
+    AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils.http import http_date
+from django.utils.timezone import localdate, now
+
+from . import (
+    analytics, api, async_views, bulk, cache as market_cache, dbrouter,
+    facets, images, popularity, queue, sessions,
+)
+from .models import (
+    AnalyticsEvent, ArchivedProduct, Category, Job, Product,
+    ProductDailyStats, ProductFacet, Vendor, VendorDailyStats,
+)
+from .pagination import DEFAULT_ORDERING, NEXT, CursorPaginator
+from .popularity import POPULAR_ORDERING
+from .querybudget import QueryBudgetTestMixin, count_queries
+from .search import search_products
+
+
+def make_vendor(username='vendeur', **kwargs):
+    kwargs.setdefault('name', f"Boutique {username}")
+    kwargs.setdefault('description', "Artisanat local")
+    kwargs.setdefault('whatsapp_number', '+50912345678')
+    user = User.objects.create_user(username, password='secret-123')
+    return Vendor.objects.create(user=user, **kwargs)
+
+
+def make_product(vendor, **kwargs):
+    kwargs.setdefault('name', "Panier")
+    kwargs.setdefault('description', "Panier tressé")
+    kwargs.setdefault('price', 100)
+    return Product.objects.create(vendor=vendor, **kwargs)
+
+
+# =====================================================
+# BUDGETS DE REQUÊTES (un test par vue routée)
+# =====================================================
+
+@override_settings(ALLOWED_HOSTS=['testserver'], TASK_QUEUE_EAGER=False)
+class QueryBudgetTests(QueryBudgetTestMixin, TransactionTestCase):
+    # TransactionTestCase : les transactions des vues sont comptées comme en
+    # production (BEGIN), pas comme des savepoints imbriqués.
+
+    def setUp(self):
+        self.user = User.objects.create_user('vendeur', password='secret-123')
+        self.vendor = Vendor.objects.create(
+            user=self.user,
+            name="Boutique Test",
+            description="Artisanat local",
+            whatsapp_number='+50912345678',
+            is_verified=True,
+        )
+        self.category = Category.objects.create(name="Artisanat")
+        self.products = [
+            Product.objects.create(
+                vendor=self.vendor,
+                category=self.category,
+                name=f"Panier {i}",
+                description="Panier tressé",
+                price=100 + i,
+            )
+            for i in range(3)
+        ]
+        self.job = Job.objects.create(
+            task='market.tasks.process_image', user=self.user
+        )
+
+        # Mesure à froid : le cache ne doit pas masquer une régression.
+        cache.clear()
+
+    def login(self):
+        self.client.force_login(self.user)
+
+    # --- Catalogue public -------------------------------------------
+
+    def test_home(self):
+        self.assertWithinQueryBudget(reverse('home'))
+
+    def test_home_search(self):
+        self.assertWithinQueryBudget(reverse('home') + '?q=panier')
+
+    def test_home_filters(self):
+        self.assertWithinQueryBudget(
+            reverse('home') + f'?category={self.category.slug}&price=0-500'
+        )
+
+    def test_home_popular(self):
+        self.assertWithinQueryBudget(reverse('home') + '?sort=popular')
+
+    def test_product_detail(self):
+        self.assertWithinQueryBudget(
+            reverse('product_detail', args=[self.products[0].pk])
+        )
+
+    def test_vendor_detail(self):
+        self.assertWithinQueryBudget(
+            reverse('vendor_detail', args=[self.vendor.pk])
+        )
+
+    def test_whatsapp_product(self):
+        self.assertWithinQueryBudget(
+            reverse('whatsapp_product', args=[self.products[0].pk])
+        )
+
+    def test_whatsapp_vendor(self):
+        self.assertWithinQueryBudget(
+            reverse('whatsapp_vendor', args=[self.vendor.pk])
+        )
+
+    # --- API JSON -----------------------------------------------------
+
+    def test_product_list(self):
+        self.assertWithinQueryBudget(reverse('product_list'))
+
+    def test_vendor_list(self):
+        self.assertWithinQueryBudget(reverse('vendor_list'))
+
+    def test_facet_list(self):
+        self.assertWithinQueryBudget(reverse('facet_list'))
+
+    def test_job_status(self):
+        self.login()
+        self.assertWithinQueryBudget(reverse('job_status', args=[self.job.pk]))
+
+    # --- Comptes vendeurs ---------------------------------------------
+
+    def test_vendor_register(self):
+        self.assertWithinQueryBudget(reverse('vendor_register'))
+
+    def test_vendor_register_post(self):
+        response = self.assertWithinQueryBudget(
+            reverse('vendor_register'),
+            method='post',
+            data={
+                'username': 'nouveau',
+                'email': 'nouveau@example.com',
+                'password1': 'Mot-de-passe-42',
+                'password2': 'Mot-de-passe-42',
+                'name': "Nouvelle boutique",
+                'description': "Épicerie",
+                'whatsapp_number': '+50987654321',
+            },
+        )
+        self.assertRedirects(
+            response, reverse('vendor_dashboard'), fetch_redirect_response=False
+        )
+
+    def test_vendor_login(self):
+        response = self.assertWithinQueryBudget(
+            reverse('vendor_login'),
+            method='post',
+            data={'username': 'vendeur', 'password': 'secret-123'},
+        )
+        self.assertRedirects(
+            response, reverse('vendor_dashboard'), fetch_redirect_response=False
+        )
+
+    def test_vendor_logout(self):
+        self.login()
+        self.assertWithinQueryBudget(reverse('vendor_logout'), method='post')
+
+    def test_vendor_dashboard(self):
+        self.login()
+        response = self.assertWithinQueryBudget(
+            reverse('vendor_dashboard') + f'?job={self.job.pk}'
+        )
+        self.assertContains(response, reverse('job_status', args=[self.job.pk]))
+
+    def test_premium_page(self):
+        self.login()
+        self.assertWithinQueryBudget(reverse('premium'))
+
+    # --- Produits -----------------------------------------------------
+
+    def test_add_product(self):
+        self.login()
+        response = self.assertWithinQueryBudget(
+            reverse('add_product'),
+            method='post',
+            data={
+                'name': "Chapeau",
+                'description': "Chapeau de paille",
+                'price': '250',
+                'category': self.category.pk,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Product.live.filter(name="Chapeau").exists())
+
+    def test_edit_product(self):
+        self.login()
+        response = self.assertWithinQueryBudget(
+            reverse('edit_product', args=[self.products[0].pk]),
+            method='post',
+            data={
+                'name': "Panier XL",
+                'description': "Panier tressé",
+                'price': '150',
+                'category': self.category.pk,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].name, "Panier XL")
+
+    def test_delete_product(self):
+        self.login()
+        response = self.assertWithinQueryBudget(
+            reverse('delete_product', args=[self.products[0].pk]),
+            method='post',
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Product.live.filter(pk=self.products[0].pk).exists())
+
+    def test_import_products(self):
+        self.login()
+        self.assertWithinQueryBudget(reverse('import_products'))
+
+    def test_export_products(self):
+        self.login()
+        self.assertWithinQueryBudget(reverse('export_products'))
+
+
+# =====================================================
+# CACHE DE PAGES
+# =====================================================
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class PopularPageCacheTests(TestCase):
+
+    def test_popular_home_follows_popularity_version(self):
+        cache.clear()
+        url = reverse('home') + '?sort=popular'
+
+        self.client.get(url)
+        with count_queries() as cached:
+            self.client.get(url)
+        self.assertEqual(cached.count, 0)
+
+        market_cache.bump(market_cache.POPULARITY)
+        with count_queries() as refreshed:
+            self.client.get(url)
+        self.assertGreater(refreshed.count, 0)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class PageCacheKeyTests(TestCase):
+
+    def setUp(self):
+        make_product(make_vendor(is_verified=True))
+        cache.clear()
+
+    def test_unknown_parameters_share_the_cache_entry(self):
+        self.client.get(reverse('home'), {'q': 'panier', 'sort': 'popular'})
+
+        for params in (
+            {'sort': 'popular', 'q': 'panier'},
+            {'q': 'panier', 'sort': 'popular', 'utm_source': 'whatsapp',
+             'fbclid': 'abc'},
+        ):
+            with self.subTest(params=params):
+                with count_queries() as counter:
+                    self.client.get(reverse('home'), params)
+                self.assertEqual(counter.count, 0)
+
+        with count_queries() as counter:
+            self.client.get(reverse('home'), {'q': 'savon', 'sort': 'popular'})
+        self.assertGreater(counter.count, 0)
+
+    def test_etag_ignores_unknown_parameters(self):
+        url = reverse('product_list')
+        etag = self.client.get(url, {'limit': 5, 'fields': 'id'})['ETag']
+
+        response = self.client.get(
+            url + '?fields=id&utm_campaign=promo&limit=5',
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(
+            self.client.get(url, {'limit': 6, 'fields': 'id'})['ETag'], etag
+        )
+
+
+# =====================================================
+# FACETTES
+# =====================================================
+
+class FacetTests(TestCase):
+
+    def category_counts(self):
+        return dict(
+            ProductFacet.objects
+            .filter(dimension=ProductFacet.CATEGORY, count__gt=0)
+            .values_list('value', 'count')
+        )
+
+    def test_category_delete_matches_rebuild(self):
+        user = User.objects.create_user('vendeur')
+        vendor = Vendor.objects.create(
+            user=user, name="Boutique", description="",
+            whatsapp_number='+50912345678',
+        )
+        category = Category.objects.create(name="Artisanat")
+        for i in range(3):
+            Product.objects.create(
+                vendor=vendor, category=category if i else None,
+                name=f"Panier {i}", description="", price=100,
+            )
+
+        category.delete()
+        incremental = self.category_counts()
+
+        facets.rebuild()
+        self.assertEqual(incremental, self.category_counts())
+        self.assertEqual(incremental, {facets.NO_CATEGORY: 3})
+
+
+# =====================================================
+# FILE DE TÂCHES
+# =====================================================
+
+class QueueTests(TestCase):
+
+    def test_purge_keeps_recent_and_pending_jobs(self):
+        old = now() - timedelta(days=30)
+        done = Job.objects.create(task='t', status=Job.DONE, finished_at=old)
+        failed = Job.objects.create(task='t', status=Job.FAILED, finished_at=old)
+        recent = Job.objects.create(task='t', status=Job.DONE, finished_at=now())
+        pending = Job.objects.create(task='t')
+
+        self.assertEqual(queue.purge_jobs(days=14, batch_size=1), 2)
+        self.assertQuerySetEqual(
+            Job.objects.order_by('pk'), [recent, pending]
+        )
+        self.assertFalse(Job.objects.filter(pk__in=[done.pk, failed.pk]).exists())
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def test_job_status_error(self):
+        user = User.objects.create_user('vendeur')
+        self.client.force_login(user)
+
+        for last_error, expected in (
+            ('', None),
+            (' \n\t\n', None),
+            ('Traceback (most recent call last):\n  ...\nValueError: boom\n',
+             'ValueError: boom'),
+        ):
+            job = Job.objects.create(task='t', user=user, status=Job.FAILED,
+                                     last_error=last_error)
+            with self.subTest(last_error=last_error):
+                response = self.client.get(reverse('job_status', args=[job.pk]))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['error'], expected)
+
+
+# =====================================================
+# QUOTA DE PRODUITS ACTIFS
+# =====================================================
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class QuotaTests(TestCase):
+
+    def setUp(self):
+        self.vendor = make_vendor('plein')
+        self.other = make_vendor('libre')
+        for i in range(Vendor.FREE_PRODUCT_LIMIT):
+            make_product(self.vendor, name=f"Panier {i}")
+        self.vendor.refresh_from_db()
+
+    def counts(self):
+        return list(
+            Vendor.objects.order_by('pk')
+            .values_list('active_products_count', flat=True)
+        )
+
+    def test_queryset_delete_releases_slots(self):
+        pks = list(self.vendor.products.values_list('pk', flat=True)[:2])
+        Product.objects.filter(pk__in=pks).delete()
+        self.assertEqual(self.counts(), [Vendor.FREE_PRODUCT_LIMIT - 2, 0])
+
+    def test_moving_product_transfers_slot(self):
+        product = self.vendor.products.first()
+        product.vendor = self.other
+        product.save()
+        self.assertEqual(self.counts(), [Vendor.FREE_PRODUCT_LIMIT - 1, 1])
+
+    def test_admin_add_at_limit_is_a_form_error(self):
+        admin = User.objects.create_superuser('admin', password='secret-123')
+        self.client.force_login(admin)
+
+        response = self.client.post(reverse('admin:market_product_add'), {
+            'vendor': self.vendor.pk,
+            'name': "Chapeau",
+            'description': "Chapeau de paille",
+            'price': '250',
+            'is_active': 'on',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Limite de produits atteinte")
+        self.assertEqual(self.counts(), [Vendor.FREE_PRODUCT_LIMIT, 0])
+
+
+# =====================================================
+# PAGINATION PAR CURSEUR
+# =====================================================
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class CursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        vendor = make_vendor(is_verified=True, subscription_plan='premium',
+                             subscription_end=now().date() + timedelta(days=30))
+        # Dates identiques deux à deux : l'id départage.
+        stamp = now()
+        cls.products = [make_product(vendor, name=f"Panier {i}") for i in range(7)]
+        for i, product in enumerate(cls.products):
+            Product.objects.filter(pk=product.pk).update(
+                created_at=stamp - timedelta(minutes=i // 2)
+            )
+
+    def walk(self, paginator):
+        seen, cursor = [], None
+        while True:
+            page = paginator.get_page(cursor)
+            seen.extend(product.pk for product in page)
+            if not page.has_next():
+                return seen, page
+            cursor = page.next_cursor
+
+    def test_next_then_previous_round_trip(self):
+        paginator = CursorPaginator(Product.live.all(), 2)
+        expected = list(
+            Product.live.order_by(*DEFAULT_ORDERING).values_list('pk', flat=True)
+        )
+
+        seen, last = self.walk(paginator)
+        self.assertEqual(seen, expected)
+
+        backwards, page = [], last
+        while page.has_previous():
+            page = paginator.get_page(page.previous_cursor)
+            backwards[:0] = [product.pk for product in page]
+        self.assertEqual(backwards + [p.pk for p in last], expected)
+
+    def test_search_rank_ordering(self):
+        queryset = search_products(Product.live.all(), "panier")
+        ordering = ('-search_rank',) + DEFAULT_ORDERING
+        expected = [p.pk for p in queryset.order_by(*ordering)]
+
+        seen, _ = self.walk(CursorPaginator(queryset, 3, ordering=ordering))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), len(self.products))
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        first = [p.pk for p in CursorPaginator(Product.live.all(), 2).get_page()]
+        stamp = {'dt': now().isoformat()}
+
+        for values in (
+            ['abc', 1], [[1], 1], [stamp, 'x'], [stamp], [None, 1],
+            [{'dec': 'abc'}, 1], [{'x': 1}, 1], 5,
+        ):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps([NEXT, values]).encode()
+            ).decode()
+            with self.subTest(values=values):
+                page = CursorPaginator(Product.live.all(), 2).get_page(cursor)
+                self.assertEqual([p.pk for p in page], first)
+
+                for name in ('home', 'product_list', 'vendor_list'):
+                    response = self.client.get(reverse(name), {'cursor': cursor})
+                    self.assertEqual(response.status_code, 200)
+
+
+# =====================================================
+# API JSON
+# =====================================================
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = make_vendor(is_verified=True)
+        # bulk_create : au-delà du quota, sans passer par save()
+        Product.objects.bulk_create(
+            Product(vendor=cls.vendor, name=f"Panier {i}",
+                    description="Panier tressé", price=100 + i,
+                    popularity=(i * 7) % 11)
+            for i in range(api.MAX_LIMIT + 5)
+        )
+
+    def get(self, **params):
+        return self.client.get(reverse('product_list'), params)
+
+    def popular_ids(self):
+        return list(
+            Product.live.order_by(*POPULAR_ORDERING).values_list('pk', flat=True)
+        )
+
+    def test_fields_selection(self):
+        results = self.get(fields='id,name', limit=3).json()['results']
+        self.assertEqual(len(results), 3)
+        self.assertEqual([set(row) for row in results], [{'id', 'name'}] * 3)
+
+        response = self.get(fields='id,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['error'])
+
+    def test_limit_is_clamped(self):
+        for limit, expected in (
+            (api.MAX_LIMIT + 50, api.MAX_LIMIT), (0, 1), (-3, 1), (7, 7),
+        ):
+            with self.subTest(limit=limit):
+                data = self.get(fields='id', limit=limit).json()
+                self.assertEqual(len(data['results']), expected)
+                self.assertIsNotNone(data['next'])
+
+        self.assertEqual(self.get(limit='abc').status_code, 400)
+
+    def test_sort(self):
+        data = self.get(fields='id', sort='popular', limit=api.MAX_LIMIT).json()
+        self.assertEqual(
+            [row['id'] for row in data['results']],
+            self.popular_ids()[:api.MAX_LIMIT]
+        )
+
+        # Page suivante : même tri
+        following = self.get(fields='id', sort='popular', limit=api.MAX_LIMIT,
+                             cursor=data['next']).json()
+        self.assertEqual(
+            [row['id'] for row in following['results']],
+            self.popular_ids()[api.MAX_LIMIT:]
+        )
+
+        self.assertEqual(self.get(sort='cheapest').status_code, 400)
+
+    def stream(self, mode, **params):
+        response = self.get(stream=mode, **params)
+        self.assertEqual(response['Content-Type'],
+                         api.STREAM_CONTENT_TYPES[mode])
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_stream(self):
+        body = self.stream('ndjson', fields='id,name', sort='popular')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], self.popular_ids())
+        self.assertEqual(set(rows[0]), {'id', 'name'})
+
+    def test_json_stream(self):
+        rows = json.loads(self.stream('json', fields='id'))
+        expected = list(
+            Product.live.order_by(*DEFAULT_ORDERING).values_list('pk', flat=True)
+        )
+        self.assertEqual([row['id'] for row in rows], expected)
+
+        Product.objects.all().delete()
+        self.assertEqual(json.loads(self.stream('json')), [])
+
+    def test_invalid_stream(self):
+        self.assertEqual(self.get(stream='csv').status_code, 400)
+        self.assertEqual(self.get(stream='ndjson', sort='x').status_code, 400)
+
+    def test_async_stream_is_sorted(self):
+        request = AsyncRequestFactory().get(
+            reverse('product_list'),
+            {'stream': 'ndjson', 'fields': 'id', 'sort': 'popular'}
+        )
+
+        async def consume():
+            response = await async_views.product_list(request)
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        body = async_to_sync(consume)().decode()
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['id'] for row in rows], self.popular_ids())
+
+
+# =====================================================
+# IMPORT / EXPORT EN MASSE
+# =====================================================
+
+class BulkExportTests(TestCase):
+
+    def setUp(self):
+        self.vendor = make_vendor()
+        self.client.force_login(self.vendor.user)
+
+    def export(self, fmt='csv'):
+        response = self.client.get(reverse('export_products'), {'format': fmt})
+        return b''.join(response.streaming_content).decode()
+
+    def test_vendor_export_skips_deleted_products(self):
+        make_product(self.vendor, name="Visible")
+        deleted = make_product(self.vendor, name="Supprimé")
+        deleted.is_active = False
+        deleted.save()
+
+        rows = [json.loads(line) for line in self.export('jsonl').splitlines()]
+        self.assertEqual([row['name'] for row in rows], ["Visible"])
+
+    def test_csv_formulas_are_escaped_and_reimported(self):
+        make_product(self.vendor, name="=HYPERLINK(\"http://x\")",
+                     description="-2+3")
+        make_product(self.vendor, name="Panier", description="'=garde")
+
+        body = self.export('csv')
+        self.assertIn("'=HYPERLINK", body)
+        self.assertIn(",'-2+3,", body)
+
+        Product.objects.all().delete()
+        result = bulk.import_products(
+            self.vendor, io.BytesIO(body.encode()), 'csv'
+        )
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual(
+            sorted(Product.objects.values_list('name', 'description')),
+            [("=HYPERLINK(\"http://x\")", "-2+3"), ("Panier", "'=garde")]
+        )
+
+
+class BulkImportTests(TestCase):
+
+    def setUp(self):
+        self.vendor = make_vendor()
+        Category.objects.create(name="Artisanat", slug='artisanat')
+
+    def csv_file(self, *rows):
+        lines = ['name,description,price,category']
+        lines += [','.join(row) for row in rows]
+        return io.BytesIO('\n'.join(lines).encode())
+
+    def import_csv(self, *rows):
+        return bulk.import_products(self.vendor, self.csv_file(*rows), 'csv')
+
+    def test_valid_file_is_imported_and_counted(self):
+        result = self.import_csv(
+            ("Panier", "Tressé", "100", "artisanat"),
+            ("Chapeau", "Paille", "250", ""),
+        )
+        self.assertTrue(result.ok, result.errors)
+        self.assertEqual(result.created, 2)
+
+        self.vendor.refresh_from_db()
+        self.assertEqual(self.vendor.active_products_count, 2)
+        self.assertEqual(
+            sorted(Product.objects.values_list('name', 'category__slug')),
+            [("Chapeau", None), ("Panier", 'artisanat')]
+        )
+
+    def test_error_report_lists_every_bad_line(self):
+        result = self.import_csv(
+            ("Panier", "Tressé", "100", ""),
+            ("Chapeau", "Paille", "0", ""),
+            ("Sac", "Cuir", "50", "inconnue"),
+            ("", "Sans nom", "50", ""),
+        )
+        self.assertEqual([line for line, _ in result.errors], [3, 4, 5])
+        self.assertIn("prix", result.errors[0][1])
+        self.assertIn("inconnue", result.errors[1][1])
+        self.assertEqual(result.created, 0)
+        self.assertFalse(Product.objects.exists())
+
+        lines = io.BytesIO(
+            b'{"name": "Panier", "description": "Osier", "price": 10}\n'
+            b'{oops\n[1]\n'
+        )
+        result = bulk.import_products(self.vendor, lines, 'jsonl')
+        self.assertEqual(
+            result.errors,
+            [(2, "Ligne JSON invalide."), (3, "Ligne JSON invalide.")]
+        )
+
+    def test_error_report_is_rendered(self):
+        self.client.force_login(self.vendor.user)
+        upload = self.csv_file(("Panier", "Tressé", "-5", ""))
+        upload.name = 'catalogue.csv'
+
+        response = self.client.post(reverse('import_products'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "aucun produit importé")
+        self.assertContains(response, "Ligne 2")
+
+    def test_product_limit(self):
+        for i in range(Vendor.FREE_PRODUCT_LIMIT - 1):
+            make_product(self.vendor, name=f"Existant {i}")
+        self.vendor.refresh_from_db()
+
+        result = self.import_csv(
+            ("Panier", "Tressé", "100", ""),
+            ("Chapeau", "Paille", "250", ""),
+        )
+        self.assertEqual(len(result.errors), 1)
+        self.assertEqual(result.errors[0][0], 3)
+        self.assertIn(str(Vendor.FREE_PRODUCT_LIMIT), result.errors[0][1])
+        self.assertEqual(Product.objects.count(), Vendor.FREE_PRODUCT_LIMIT - 1)
+
+    def test_max_rows(self):
+        rows = [(f"Panier {i}", "Tressé", "100", "") for i in range(5)]
+        with mock.patch.object(bulk, 'MAX_ROWS', 3):
+            result = self.import_csv(*rows)
+
+        self.assertEqual(result.errors, [(5, "Plus de 3 lignes.")])
+        self.assertFalse(Product.objects.exists())
+
+
+# =====================================================
+# SUPPRESSION DOUCE ET ARCHIVAGE
+# =====================================================
+
+# Budgets vérifiés par QueryBudgetTests (les savepoints de TestCase
+# faussent le comptage).
+@override_settings(ALLOWED_HOSTS=['testserver'], QUERY_BUDGET_STRICT=False)
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.vendor = make_vendor(is_verified=True)
+
+    def deactivate(self, product, days_ago):
+        product.soft_delete()
+        Product.objects.filter(pk=product.pk).update(
+            deactivated_at=now() - timedelta(days=days_ago)
+        )
+
+    def archive(self, *args):
+        out = io.StringIO()
+        call_command('archive_products', *args, stdout=out)
+        return out.getvalue()
+
+    def test_soft_delete(self):
+        product = make_product(self.vendor)
+        self.client.force_login(self.vendor.user)
+
+        response = self.client.post(reverse('delete_product', args=[product.pk]))
+        self.assertRedirects(response, reverse('vendor_dashboard'),
+                             fetch_redirect_response=False)
+
+        product.refresh_from_db()
+        self.vendor.refresh_from_db()
+        self.assertFalse(product.is_active)
+        self.assertIsNotNone(product.deactivated_at)
+        self.assertEqual(self.vendor.active_products_count, 0)
+        self.assertFalse(Product.live.filter(pk=product.pk).exists())
+        self.assertEqual(
+            self.client.get(reverse('product_detail', args=[product.pk])).status_code,
+            404
+        )
+
+        # Réactivation : plus archivable
+        product.is_active = True
+        product.save()
+        self.assertIsNone(product.deactivated_at)
+
+    def test_archive_old_deleted_products(self):
+        old = [make_product(self.vendor, name=f"Ancien {i}") for i in range(3)]
+        recent = make_product(self.vendor, name="Récent")
+        active = make_product(self.vendor, name="Actif")
+        for product in old:
+            self.deactivate(product, days_ago=40)
+        self.deactivate(recent, days_ago=5)
+
+        self.assertIn("3 produit(s) à archiver", self.archive('--dry-run'))
+        self.assertEqual(Product.objects.count(), 5)
+
+        output = self.archive('--days', '30', '--batch-size', '2')
+        self.assertIn("3 produit(s) archivé(s)", output)
+
+        self.assertEqual(
+            sorted(Product.objects.values_list('pk', flat=True)),
+            [recent.pk, active.pk]
+        )
+        archived = ArchivedProduct.objects.get(product_id=old[0].pk)
+        self.assertEqual(
+            (archived.vendor_id, archived.vendor_name, archived.name),
+            (self.vendor.pk, self.vendor.name, "Ancien 0")
+        )
+
+        # Relance : rien de plus
+        self.assertIn("0 produit(s) archivé(s)", self.archive())
+        self.assertEqual(ArchivedProduct.objects.count(), 3)
+
+    def test_purge_old_archives(self):
+        for product in [make_product(self.vendor) for _ in range(2)]:
+            self.deactivate(product, days_ago=40)
+        self.archive()
+        ArchivedProduct.objects.filter(
+            pk=ArchivedProduct.objects.earliest('pk').pk
+        ).update(archived_at=now() - timedelta(days=400))
+
+        self.assertIn("1 archive(s) à purger",
+                      self.archive('--dry-run', '--purge-days', '365'))
+        self.assertIn("1 archive(s) purgée(s)", self.archive('--purge-days', '365'))
+        self.assertEqual(ArchivedProduct.objects.count(), 1)
+
+
+# =====================================================
+# REQUÊTES CONDITIONNELLES
+# =====================================================
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ConditionalTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.vendor = make_vendor(is_verified=True)
+        self.product = make_product(self.vendor)
+        self.detail = reverse('product_detail', args=[self.product.pk])
+
+    def test_product_detail_etag(self):
+        response = self.client.get(self.detail)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = 120
+            self.product.save()
+
+        response = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_product_detail_last_modified(self):
+        last_modified = self.client.get(self.detail)['Last-Modified']
+
+        response = self.client.get(self.detail,
+                                   HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        earlier = http_date(
+            (self.product.updated_at - timedelta(hours=1)).timestamp()
+        )
+        response = self.client.get(self.detail, HTTP_IF_MODIFIED_SINCE=earlier)
+        self.assertEqual(response.status_code, 200)
+
+    def test_vendor_detail_follows_product_deletion(self):
+        url = reverse('vendor_detail', args=[self.vendor.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.soft_delete()
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_product_list_etag_follows_catalog_version(self):
+        url = reverse('product_list')
+        etag = self.client.get(url)['ETag']
+
+        with count_queries() as counter:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(counter.count, 0)
+
+        # Autre query string : autre ETag
+        self.assertNotEqual(self.client.get(url, {'limit': 5})['ETag'], etag)
+
+        market_cache.bump(market_cache.PRODUCTS)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_authenticated_requests_are_not_validated(self):
+        self.client.force_login(self.vendor.user)
+        response = self.client.get(self.detail)
+        self.assertFalse(response.has_header('ETag'))
+
+
+# =====================================================
+# STATISTIQUES VENDEURS
+# =====================================================
+
+class AnalyticsRollupTests(TestCase):
+
+    def setUp(self):
+        self.vendor = make_vendor(is_verified=True)
+        self.product = make_product(self.vendor)
+        self.today = localdate()
+        self.yesterday = self.today - timedelta(days=1)
+
+    def event(self, kind, count=1, day=None, **target):
+        return AnalyticsEvent(kind=kind, count=count,
+                              day=day or self.today, **target)
+
+    def test_buffer_groups_counters(self):
+        buffer = analytics.EventBuffer(size=100, interval=3600)
+        # Pas de thread d'écriture : flush() appelé à la main
+        with mock.patch.object(buffer, '_ensure_thread'):
+            for _ in range(3):
+                buffer.add(AnalyticsEvent.PRODUCT_VIEW, product_id=self.product.pk)
+            buffer.add(AnalyticsEvent.VENDOR_VIEW, vendor_id=self.vendor.pk)
+
+        self.assertEqual(buffer.pending(), 4)
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(buffer.pending(), 0)
+        self.assertEqual(
+            sorted(AnalyticsEvent.objects.values_list('kind', 'count')),
+            [(AnalyticsEvent.PRODUCT_VIEW, 3), (AnalyticsEvent.VENDOR_VIEW, 1)]
+        )
+
+    def test_rollup(self):
+        product, vendor = self.product.pk, self.vendor.pk
+        AnalyticsEvent.objects.bulk_create([
+            self.event(AnalyticsEvent.PRODUCT_VIEW, 4, product_id=product),
+            self.event(AnalyticsEvent.PRODUCT_VIEW, 2, product_id=product),
+            self.event(AnalyticsEvent.PRODUCT_VIEW, 1, day=self.yesterday,
+                       product_id=product),
+            self.event(AnalyticsEvent.WHATSAPP_CLICK, 3, product_id=product),
+            self.event(AnalyticsEvent.VENDOR_VIEW, 5, vendor_id=vendor),
+            self.event(AnalyticsEvent.WHATSAPP_CLICK, 1, vendor_id=vendor),
+            # Produit archivé depuis : ignoré
+            self.event(AnalyticsEvent.PRODUCT_VIEW, 9, product_id=product + 1000),
+        ])
+
+        # Petits lots : les lignes du jour existent déjà au second lot.
+        self.assertEqual(analytics.rollup_events(batch_size=2), 7)
+        self.assertFalse(AnalyticsEvent.objects.exists())
+
+        self.assertEqual(
+            sorted(ProductDailyStats.objects.values_list(
+                'product_id', 'day', 'views', 'whatsapp_clicks'
+            )),
+            [(product, self.yesterday, 1, 0), (product, self.today, 6, 3)]
+        )
+        self.assertEqual(
+            sorted(VendorDailyStats.objects.values_list(
+                'day', 'views', 'product_views', 'whatsapp_clicks'
+            )),
+            [(self.yesterday, 0, 1, 0), (self.today, 5, 6, 4)]
+        )
+
+        summary = analytics.vendor_summary(self.vendor)
+        self.assertEqual(
+            (summary['views'], summary['product_views'],
+             summary['whatsapp_clicks']),
+            (5, 7, 4)
+        )
+        self.assertEqual(len(summary['daily']), analytics.SUMMARY_DAYS)
+
+        [top] = analytics.top_products(self.vendor)
+        self.assertEqual((top['views'], top['conversion']), (7, 42.9))
+
+    def test_rollup_command(self):
+        AnalyticsEvent.objects.create(
+            kind=AnalyticsEvent.PRODUCT_VIEW, product_id=self.product.pk,
+            day=self.today, count=2
+        )
+        out = io.StringIO()
+        call_command('rollup_analytics', '--dry-run', stdout=out)
+        self.assertIn("1 ligne(s) en attente (2 événement(s))", out.getvalue())
+
+        call_command('rollup_analytics', stdout=io.StringIO())
+        self.assertFalse(AnalyticsEvent.objects.exists())
+        self.assertEqual(
+            ProductDailyStats.objects.get(product=self.product).views, 2
+        )
+
+
+# =====================================================
+# POPULARITÉ
+# =====================================================
+
+@override_settings(POPULARITY_HALF_LIFE_DAYS=7, POPULARITY_CLICK_WEIGHT=5,
+                   POPULARITY_EPOCH='2026-01-01')
+class PopularityTests(TestCase):
+
+    def setUp(self):
+        self.vendor = make_vendor(subscription_plan='premium')
+        self.today = localdate()
+
+    def log(self, product, views=0, clicks=0, days_ago=0):
+        day = self.today - timedelta(days=days_ago)
+        AnalyticsEvent.objects.bulk_create(
+            AnalyticsEvent(kind=kind, product_id=product.pk, day=day, count=count)
+            for kind, count in ((AnalyticsEvent.PRODUCT_VIEW, views),
+                                (AnalyticsEvent.WHATSAPP_CLICK, clicks))
+            if count
+        )
+
+    def scores(self):
+        return dict(Product.objects.values_list('pk', 'popularity'))
+
+    def test_day_score(self):
+        epoch = popularity.get_epoch()
+        self.assertEqual(popularity.day_score(epoch, 10, 2), 20)
+        # Une demi-vie plus tard : même activité, poids double
+        self.assertEqual(popularity.day_score(epoch + timedelta(days=7), 10, 2), 40)
+        self.assertEqual(popularity.day_score(epoch, 0, 0), 0)
+
+    def test_recent_activity_ranks_first(self):
+        old, recent, clicked, unseen = (
+            make_product(self.vendor, name=name)
+            for name in ("Ancien", "Récent", "Contacté", "Jamais vu")
+        )
+        # 20 vues il y a deux demi-vies valent 5 vues aujourd'hui
+        self.log(old, views=20, days_ago=14)
+        self.log(recent, views=8)
+        self.log(clicked, views=1, clicks=1)  # 1 + 5 × 1
+
+        with self.captureOnCommitCallbacks(execute=True):
+            analytics.rollup_events()
+
+        ranked = list(
+            Product.objects.order_by(*POPULAR_ORDERING).values_list('pk', flat=True)
+        )
+        self.assertEqual(ranked, [recent.pk, clicked.pk, old.pk, unseen.pk])
+
+    def test_incremental_scores_match_rebuild(self):
+        products = [make_product(self.vendor, name=f"Panier {i}") for i in range(3)]
+        for days_ago in (0, 3, 10):
+            self.log(products[0], views=5, clicks=1, days_ago=days_ago)
+        self.log(products[1], views=2, days_ago=1)
+
+        # Deux passages : les scores s'additionnent
+        analytics.rollup_events(batch_size=2)
+        self.log(products[1], clicks=2)
+        analytics.rollup_events()
+        incremental = self.scores()
+
+        Product.objects.update(popularity=0)
+        # Produit sans statistiques mais avec un score : remis à zéro
+        Product.objects.filter(pk=products[2].pk).update(popularity=50)
+        popularity.rebuild()
+        rebuilt = self.scores()
+
+        self.assertEqual(rebuilt[products[2].pk], 0)
+        for pk, score in incremental.items():
+            self.assertAlmostEqual(rebuilt[pk], score)
+
+    def test_rollup_bumps_popularity_version(self):
+        self.log(make_product(self.vendor), views=1)
+        version = market_cache.get_versions([market_cache.POPULARITY])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            analytics.rollup_events()
+
+        self.assertNotEqual(
+            market_cache.get_versions([market_cache.POPULARITY]), version
+        )
+
+
+# =====================================================
+# REDIRECTION WHATSAPP
+# =====================================================
+
+@override_settings(ALLOWED_HOSTS=['testserver'], ANALYTICS_ENABLED=True)
+class WhatsAppRedirectTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.vendor = make_vendor(is_verified=True, name="Chez Léa & Co",
+                                  whatsapp_number='+509 1234-5678')
+        self.product = make_product(self.vendor, name="Savon #1 & miel")
+
+        # Tampon de test, sans thread d'écriture
+        self.buffer = analytics.EventBuffer(size=100, interval=3600)
+        patches = (
+            mock.patch.object(analytics, 'buffer', self.buffer),
+            mock.patch.object(self.buffer, '_ensure_thread'),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def follow(self, url, **headers):
+        with count_queries() as counter:
+            response = self.client.get(url, headers=headers)
+        writes = [
+            sql for sql in counter.queries
+            if sql.split()[0] in ('INSERT', 'UPDATE', 'DELETE')
+        ]
+        self.assertEqual(writes, [])
+        return response
+
+    def test_product_redirect(self):
+        response = self.follow(
+            reverse('whatsapp_product', args=[self.product.pk])
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        location = urlsplit(response['Location'])
+        self.assertEqual(
+            (location.scheme, location.netloc, location.path),
+            ('https', 'wa.me', '/50912345678')
+        )
+        # Un seul paramètre : `&` et `#` du nom sont encodés
+        [text] = parse_qs(location.query)['text']
+        self.assertNotIn('#', location.query)
+        self.assertIn("« Savon #1 & miel »", text)
+        self.assertIn(
+            'http://testserver' + reverse('product_detail', args=[self.product.pk]),
+            text
+        )
+
+        self.assertEqual(self.buffer.pending(), 1)
+        self.assertFalse(AnalyticsEvent.objects.exists())
+
+    def test_vendor_redirect(self):
+        response = self.follow(
+            reverse('whatsapp_vendor', args=[self.vendor.pk])
+        )
+        [text] = parse_qs(urlsplit(response['Location']).query)['text']
+        self.assertTrue(text.startswith("Bonjour Chez Léa & Co,"))
+        self.assertEqual(self.buffer.pending(), 1)
+
+    def test_bots_and_missing_products_are_not_counted(self):
+        url = reverse('whatsapp_product', args=[self.product.pk])
+        response = self.follow(url, user_agent='WhatsApp/2.23 A')
+        self.assertEqual(response.status_code, 302)
+
+        self.product.soft_delete()
+        cache.clear()
+        self.assertEqual(self.follow(url).status_code, 404)
+        self.assertEqual(self.buffer.pending(), 0)
+
+
+# =====================================================
+# DÉRIVÉS D'IMAGES
+# =====================================================
+
+def make_image(width=800, height=600, name='panier.jpg'):
+    content = io.BytesIO()
+    Image.new('RGB', (width, height), 'orange').save(content, 'JPEG')
+    return SimpleUploadedFile(name, content.getvalue(), 'image/jpeg')
+
+
+@override_settings(TASK_QUEUE_EAGER=True)
+class ImageRenditionTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        patch = override_settings(MEDIA_ROOT=media.name)
+        patch.enable()
+        self.addCleanup(patch.disable)
+
+        self.product = make_product(make_vendor(), image=make_image())
+        self.product.refresh_from_db()
+        self.storage = self.product.image.storage
+
+    def names(self, manifest):
+        return [
+            name for names in manifest['formats'].values()
+            for name in names.values()
+        ]
+
+    def test_renditions_are_generated_on_save(self):
+        manifest = self.product.image_renditions
+        self.assertEqual(manifest['source'], self.product.image.name)
+        self.assertEqual(manifest['width'], 800)
+
+        formats = images.available_formats()
+        for fmt in formats:
+            # Pas d'agrandissement au-delà de l'original
+            self.assertEqual(sorted(manifest['formats'][fmt], key=int),
+                             ['320', '640', '800'])
+        self.assertTrue(all(map(self.storage.exists, self.names(manifest))))
+
+        with self.storage.open(manifest['formats']['jpeg']['320']) as thumb:
+            self.assertEqual(Image.open(thumb).size, (320, 240))
+        self.assertTrue(self.product.thumbnail_url.endswith('__w320.jpg'))
+
+        # Image inchangée : rien à refaire
+        self.assertFalse(images.process_image(self.product))
+
+    def test_responsive_image_tag(self):
+        html = Template(
+            '{% load market_images %}'
+            '{% responsive_image product sizes="50vw" alt="Panier" %}'
+        ).render(Context({'product': self.product}))
+
+        self.assertTrue(html.startswith('<picture>'))
+        self.assertIn('__w640.jpg 640w', html)
+        self.assertIn('sizes="50vw"', html)
+        self.assertIn('loading="lazy"', html)
+        for fmt in images.available_formats()[:-1]:
+            self.assertIn(f'type="{images.MIME_TYPES[fmt]}"', html)
+
+    def test_replaced_and_deleted_images_drop_renditions(self):
+        old = self.names(self.product.image_renditions)
+
+        self.product.image = make_image(400, 400, name='savon.jpg')
+        self.product.save()
+        self.product.refresh_from_db()
+        self.assertFalse(any(map(self.storage.exists, old)))
+        self.assertEqual(
+            sorted(self.product.image_renditions['formats']['jpeg'], key=int),
+            ['320', '400']
+        )
+
+        current = self.names(self.product.image_renditions)
+        self.product.delete()
+        self.assertFalse(any(map(self.storage.exists, current)))
+
+
+# =====================================================
+# ROUTAGE VERS LE RÉPLICA
+# =====================================================
+
+@override_settings(REPLICA_PIN_SECONDS=10, REPLICA_RETRY_SECONDS=30)
+class ReplicaRoutingTests(TestCase):
+    # Pas d'alias `replica` en test : réplica simulé, le routage seul est
+    # vérifié (essai réel : voir market/dbrouter.py).
+
+    def setUp(self):
+        cache.clear()
+        self.router = dbrouter.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+        for target in (dbrouter, market_cache):
+            patch = mock.patch.object(target, 'replica_configured',
+                                      return_value=True)
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_reads_follow_read_replica(self):
+        with mock.patch.object(dbrouter, 'replica_available', return_value=True):
+            self.assertEqual(self.router.db_for_read(Product), 'default')
+
+            with dbrouter.reading_from(dbrouter.REPLICA):
+                self.assertEqual(self.router.db_for_read(Product), 'replica')
+                # Sessions et comptes : toujours la base principale
+                self.assertEqual(self.router.db_for_read(User), 'default')
+                self.assertEqual(self.router.db_for_write(Product), 'default')
+
+        with mock.patch.object(dbrouter, 'replica_available', return_value=False):
+            with dbrouter.reading_from(dbrouter.REPLICA):
+                self.assertEqual(self.router.db_for_read(Product), 'default')
+
+    def test_read_replica_decorator(self):
+        view = dbrouter.read_replica(
+            lambda request: dbrouter.reading_replica()
+        )
+        self.assertTrue(view(self.factory.get('/')))
+        self.assertFalse(view(self.factory.post('/')))
+
+        pinned = self.factory.get('/')
+        pinned.COOKIES[dbrouter.PIN_COOKIE] = str(time.time() + 10)
+        self.assertFalse(view(pinned))
+
+        expired = self.factory.get('/')
+        expired.COOKIES[dbrouter.PIN_COOKIE] = str(time.time() - 1)
+        self.assertTrue(view(expired))
+
+    def test_writes_pin_the_browser(self):
+        def respond(status):
+            return dbrouter.ReplicaPinMiddleware(
+                lambda request: HttpResponse(status=status)
+            )
+
+        response = respond(302)(self.factory.post('/'))
+        cookie = response.cookies[dbrouter.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+        self.assertTrue(cookie['httponly'])
+
+        request = self.factory.get('/')
+        request.COOKIES[dbrouter.PIN_COOKIE] = cookie.value
+        self.assertTrue(dbrouter.is_pinned(request))
+
+        self.assertNotIn(dbrouter.PIN_COOKIE,
+                         respond(200)(self.factory.get('/')).cookies)
+        self.assertNotIn(dbrouter.PIN_COOKIE,
+                         respond(500)(self.factory.post('/')).cookies)
+
+    def test_unreachable_replica_is_skipped_until_retry(self):
+        replica = mock.Mock(connection=None)
+        replica.ensure_connection.side_effect = OperationalError("refusé")
+        self.addCleanup(setattr, dbrouter, '_replica_down_until', 0.0)
+
+        with mock.patch.object(dbrouter, 'connections',
+                               {dbrouter.REPLICA: replica}):
+            with self.assertLogs('market.dbrouter', 'WARNING'):
+                self.assertFalse(dbrouter.replica_available())
+            self.assertFalse(dbrouter.replica_available())
+            self.assertEqual(replica.ensure_connection.call_count, 1)
+
+            with mock.patch.object(dbrouter.time, 'monotonic',
+                                   return_value=time.monotonic() + 31):
+                replica.ensure_connection.side_effect = None
+                self.assertTrue(dbrouter.replica_available())
+
+    def test_replica_reads_are_not_cached_right_after_a_bump(self):
+        builder = mock.Mock(return_value=['Artisanat'])
+        namespaces = (market_cache.CATEGORIES,)
+
+        market_cache.bump(*namespaces)
+        self.assertFalse(market_cache.may_be_stale(namespaces))
+
+        with dbrouter.reading_from(dbrouter.REPLICA):
+            self.assertTrue(market_cache.may_be_stale(namespaces))
+            market_cache.cached('test', namespaces, builder)
+            market_cache.cached('test', namespaces, builder)
+        self.assertEqual(builder.call_count, 2)
+
+        # Lecture sur la base principale : mise en cache normale
+        market_cache.cached('test', namespaces, builder)
+        market_cache.cached('test', namespaces, builder)
+        self.assertEqual(builder.call_count, 3)
+
+    def test_check_database(self):
+        result = dbrouter.check_database('default')
+        self.assertTrue(result['ok'])
+        self.assertIsNone(result['error'])
+        self.assertGreaterEqual(result['latency_ms'], 0)
+
+
+# =====================================================
+# SESSIONS
+# =====================================================
+
+class SessionTests(TestCase):
+
+    def setUp(self):
+        self.vendor = make_vendor()
+        self.user = self.vendor.user
+
+    def test_user_is_loaded_with_vendor(self):
+        backend = sessions.VendorModelBackend()
+        with self.assertNumQueries(1):
+            user = backend.get_user(self.user.pk)
+            self.assertEqual(user.vendor.name, self.vendor.name)
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(backend.get_user(self.user.pk))
+
+    def test_request_vendor(self):
+        request = RequestFactory().get('/')
+        request.user = sessions.VendorModelBackend().get_user(self.user.pk)
+        self.assertEqual(sessions.request_vendor(request), self.vendor)
+
+        for user in (AnonymousUser(), User.objects.create_user('client')):
+            request.user = user
+            with self.assertRaises(Http404):
+                sessions.request_vendor(request)
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies'
+    )
+    def test_signed_cookie_sessions_skip_the_session_table(self):
+        self.client.force_login(self.user)
+        with count_queries() as counter:
+            response = self.client.get(reverse('vendor_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            [sql for sql in counter.queries if 'django_session' in sql]
+        )
+
+        out = io.StringIO()
+        call_command('clear_expired_sessions', stdout=out)
+        self.assertIn("rien à supprimer", out.getvalue())
+
+    def test_clear_expired_sessions(self):
+        for i in range(5):
+            Session.objects.create(
+                session_key=f'expiree{i}', session_data='',
+                expire_date=now() - timedelta(days=1)
+            )
+        Session.objects.create(session_key='valide', session_data='',
+                               expire_date=now() + timedelta(days=1))
+
+        out = io.StringIO()
+        call_command('clear_expired_sessions', '--dry-run', stdout=out)
+        self.assertIn("5 session(s) expirée(s)", out.getvalue())
+
+        progress = []
+        self.assertEqual(
+            sessions.clear_expired_sessions(batch_size=2,
+                                            progress=progress.append),
+            5
+        )
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)),
+            ['valide']
+        )
+
+
+# =====================================================
+# VUES ASYNC
+# =====================================================
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.vendor = make_vendor(is_verified=True)
+        self.product = make_product(self.vendor)
+
+    def get(self, view, url, **kwargs):
+        request = AsyncRequestFactory().get(url)
+        request.user = AnonymousUser()
+        render_to_string = async_views.render_to_string
+        rendered = []
+
+        def rendered_off_loop(*args, **kwargs):
+            # Thread de sync_to_async : pas de boucle d'événements
+            with self.assertRaises(RuntimeError):
+                asyncio.get_running_loop()
+            rendered.append(args[0])
+            return render_to_string(*args, **kwargs)
+
+        with mock.patch.object(async_views, 'render_to_string',
+                               rendered_off_loop):
+            response = async_to_sync(view)(request, **kwargs)
+        self.assertEqual(len(rendered), 1)
+        return response
+
+    def test_pages_render_off_the_event_loop(self):
+        pk = self.product.pk
+        for view, url, kwargs, text in (
+            (async_views.accueil, reverse('home'), {}, self.product.name),
+            (async_views.product_detail,
+             reverse('product_detail', args=[pk]), {'pk': pk},
+             self.product.name),
+            (async_views.vendor_detail,
+             reverse('vendor_detail', args=[self.vendor.pk]),
+             {'pk': self.vendor.pk}, self.vendor.name),
+        ):
+            with self.subTest(url=url):
+                response = self.get(view, url, **kwargs)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, text)
@@ -1,10 +1,14 @@
 # market/urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Lecture du catalogue : vues async sous ASGI (voir market/async_views.py)
+catalog = async_views if settings.ASYNC_CATALOG_VIEWS else views
 
 urlpatterns = [
     # La vue pour la page d'accueil s'appelle 'accueil' dans votre views.py
-    path('', views.accueil, name='home'), 
+    path('', catalog.accueil, name='home'), 
 
     path('register/', views.vendor_register, name='vendor_register'),
     path('login/', views.vendor_login, name='vendor_login'),
@@ -14,9 +18,21 @@ urlpatterns = [
     path('product/add/', views.add_product, name='add_product'),
     path('product/edit/<int:product_id>/', views.edit_product, name='edit_product'),
     path('product/delete/<int:product_id>/', views.delete_product, name='delete_product'),
+    path('product/import/', views.import_products, name='import_products'),
+    path('product/export/', views.export_products, name='export_products'),
     path('premium/', views.premium_page, name='premium'),
 
     #path('vendor/<int:vendor_id>/', views.vendor_detail, name='vendor_detail'),
-    path('product/<int:pk>/', views.product_detail, name='product_detail'),
-    path('vendor/<int:pk>/', views.vendor_detail, name='vendor_detail'),
+    path('product/<int:pk>/', catalog.product_detail, name='product_detail'),
+    path('vendor/<int:pk>/', catalog.vendor_detail, name='vendor_detail'),
+
+    # Commande WhatsApp : clic compté, redirection vers wa.me
+    path('go/whatsapp/<int:product_id>/', catalog.whatsapp_product, name='whatsapp_product'),
+    path('go/whatsapp/vendor/<int:vendor_id>/', catalog.whatsapp_vendor, name='whatsapp_vendor'),
+
+    # API JSON (pagination par curseur, ?fields=, ?stream=ndjson|json)
+    path('api/products/', catalog.product_list, name='product_list'),
+    path('api/vendors/', catalog.vendor_list, name='vendor_list'),
+    path('api/facets/', views.facet_list, name='facet_list'),
+    path('api/jobs/<int:job_id>/', views.job_status, name='job_status'),
 ]
@@ -1,69 +1,122 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import (
+    Http404,
+    JsonResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+)
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_POST
 from django.contrib.auth.forms import AuthenticationForm
-from django.db.models import Q, Case, When, IntegerField
-from django.templatetags.static import static
 from django.contrib import messages
-from django.core.paginator import Paginator
+from django.urls import reverse
+from django.utils.text import slugify
+
+from . import analytics, bulk, facets, whatsapp
+from .analytics import track_view
+from .models import (
+    AnalyticsEvent,
+    Job,
+    Product,
+    ProductLimitReached,
+    Vendor,
+    detail_url,
+)
+from .forms import VendorForm, ProductForm, ProductUploadForm, VendorUserForm
+from .cache import (
+    cache_public_page,
+    fragment_version,
+    get_categories,
+    get_home_vendors,
+    get_product_contact,
+    get_vendor_contact,
+)
+from .api import list_response, PRODUCT_RESOURCE, VENDOR_RESOURCE
+from .conditional import (
+    catalog_freshness,
+    conditional,
+    list_namespaces,
+    product_freshness,
+    vendor_freshness,
+)
+from .dbrouter import read_replica
+from .pagination import CursorPaginator, DEFAULT_ORDERING
+from .popularity import POPULAR, POPULAR_ORDERING
+from .querybudget import query_budget
+from .search import search_products
+from .sessions import VENDOR_BACKEND, request_vendor
+
+LIMIT_REACHED_MESSAGE = "Limite atteinte. Passez à l’abonnement Premium."
+
+
+# =====================================================
+# PROJECTIONS (champs réellement utilisés par les templates)
+# =====================================================
+
+# market/index.html – cartes produits
+HOME_PRODUCT_FIELDS = (
+    'id',
+    'name',
+    'description',
+    'price',
+    'image',
+    'image_renditions',
+    'created_at',
+    'popularity',
+    'vendor__name',
+    'vendor__is_premium',
+)
+
+# market/index.html – bandeau vendeurs
+HOME_VENDOR_FIELDS = (
+    'id',
+    'name',
+    'description',
+    'image',
+    'image_renditions',
+    'is_premium',
+    'is_verified',
+    'created_at',
+)
 
-from .models import Vendor, Product, Category
-from .forms import VendorForm, ProductForm, VendorUserForm
 
 # =====================================================
 # API – LISTES (JSON)
 # =====================================================
 
+@query_budget(1)
+@read_replica
+@conditional(catalog_freshness)
 def vendor_list(request):
     vendors = Vendor.objects.filter(is_verified=True)
 
-    data = [
-        {
-            "id": v.pk,
-            "name": v.name,
-            "description": v.description,
-            "subscription_plan": v.subscription_plan,
-            "whatsapp_number": v.whatsapp_number,
-            "image_url": request.build_absolute_uri(
-                v.image.url if v.image else static('default-avatar.png')
-            ),
-        }
-        for v in vendors
-    ]
-
-    return JsonResponse(data, safe=False)
+    return list_response(request, vendors, VENDOR_RESOURCE)
 
 
+@query_budget(1)
+@read_replica
+@conditional(catalog_freshness)
 def product_list(request):
-    products = (
-        Product.objects
-        .filter(is_active=True)
-        .select_related('vendor')
-    )
+    products = Product.live.all()
 
-    data = [
-        {
-            "id": p.pk,
-            "name": p.name,
-            "price": str(p.price),
-            "description": p.description,
-            "image_url": request.build_absolute_uri(
-                p.image.url if p.image else static('default-product.png')
-            ),
-            "vendor": p.vendor.name,
-            "vendor_whatsapp": p.vendor.whatsapp_number,
-        }
-        for p in products
-    ]
+    return list_response(request, products, PRODUCT_RESOURCE)
 
-    return JsonResponse(data, safe=False)
+
+@query_budget(2)
+@read_replica
+def facet_list(request):
+    return JsonResponse(facets.get_facets())
 
 
 # =====================================================
 # PAGE D’ACCUEIL (Premium en premier + pagination)
 # =====================================================
 
+@query_budget(4)
+@read_replica
+@cache_public_page(namespaces=list_namespaces)
 def accueil(request):
     query = request.GET.get('q', '').strip()
     current_category = request.GET.get('category')
@@ -72,20 +125,9 @@ def accueil(request):
     # 🔹 PRODUITS (requête principale)
     # ===============================
     products_qs = (
-        Product.objects
-        .filter(is_active=True)
-        .select_related('vendor', 'category')
-        .only(
-            'id',
-            'name',
-            'price',
-            'image',
-            'vendor__name',
-            'vendor__subscription_plan',
-            'category__name',
-            'category__slug',
-            'created_at',
-        )
+        Product.live
+        .select_related('vendor')
+        .only(*HOME_PRODUCT_FIELDS)
         .order_by('-created_at')
     )
 
@@ -96,61 +138,62 @@ def accueil(request):
         products_qs = products_qs.filter(category__slug=current_category)
 
     # ===============================
-    # 🔹 RECHERCHE
+    # 🔹 FILTRE TRANCHE DE PRIX
+    # ===============================
+    current_price = request.GET.get('price')
+    price_range = facets.price_range(current_price) if current_price else None
+    if price_range:
+        low, high = price_range
+        products_qs = products_qs.filter(price__gte=low)
+        if high is not None:
+            products_qs = products_qs.filter(price__lt=high)
+
     # ===============================
+    # 🔹 RECHERCHE (index plein texte, classée)
+    # ===============================
+    ordering = DEFAULT_ORDERING
     if query:
-        products_qs = products_qs.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query) |
-            Q(vendor__name__icontains=query)
-        )
+        products_qs = search_products(products_qs, query)
+        ordering = ('-search_rank',) + DEFAULT_ORDERING
+
+    # Tri « Populaires » : score précalculé (market.popularity)
+    current_sort = request.GET.get('sort')
+    if current_sort == POPULAR:
+        ordering = POPULAR_ORDERING
+    else:
+        current_sort = None
 
     # ===============================
-    # 🔹 PAGINATION PRODUITS
+    # 🔹 PAGINATION PRODUITS (curseur, sans COUNT ni OFFSET)
     # ===============================
-    paginator = Paginator(products_qs, 12)
-    page_number = request.GET.get('page')
-    products = paginator.get_page(page_number)
+    paginator = CursorPaginator(products_qs, 12, ordering=ordering)
+    products = paginator.get_page(request.GET.get('cursor'))
 
     # ===============================
-    # 🔹 VENDEURS (optimisés + limités)
+    # 🔹 VENDEURS (premium d'abord, en cache)
     # ===============================
-    vendors = (
-        Vendor.objects
-        .filter(is_verified=True)
-        .only(
-            'id',
-            'name',
-            'description',
-            'image',
-            'subscription_plan',
-            'created_at',
-        )
-        .order_by(
-            Case(
-                When(subscription_plan='premium', then=0),
-                default=1,
-                output_field=IntegerField()
-            ),
-            '-created_at'
-        )[:12]  # 🔥 limite volontaire
-    )
+    vendors = get_home_vendors(HOME_VENDOR_FIELDS)
 
     # ===============================
-    # 🔹 CATÉGORIES (léger)
+    # 🔹 CATÉGORIES (en cache)
     # ===============================
-    categories = (
-        Category.objects
-        .only('name', 'slug')
-        .order_by('name')
-    )
+    categories = get_categories()
+
+    # ===============================
+    # 🔹 FACETTES (compteurs précalculés, en cache)
+    # ===============================
+    catalog_facets = facets.get_facets()
 
     return render(request, 'market/index.html', {
         'products': products,
         'vendors': vendors,
         'categories': categories,
+        'facets': catalog_facets,
         'query': query,
         'current_category': current_category,
+        'current_price': current_price if price_range else None,
+        'current_sort': current_sort,
+        'cache_version': fragment_version(),
     })
 
 
@@ -158,6 +201,19 @@ def accueil(request):
 # AUTHENTIFICATION VENDEUR
 # =====================================================
 
+def dashboard_redirect(instance):
+    """
+    Retour au tableau de bord ; si une image vient d'être envoyée, avec
+    le numéro de la tâche qui la traite (`?job=`, voir market.signals).
+    """
+    url = reverse('vendor_dashboard')
+    job = getattr(instance, 'image_job', None)
+    if job is not None:
+        url += f'?job={job.pk}'
+    return redirect(url)
+
+
+@query_budget(14)
 def vendor_register(request):
     if request.method == 'POST':
         user_form = VendorUserForm(request.POST)
@@ -168,8 +224,8 @@ def vendor_register(request):
             vendor = vendor_form.save(commit=False)
             vendor.user = user
             vendor.save()
-            login(request, user)
-            return redirect('vendor_dashboard')
+            login(request, user, backend=VENDOR_BACKEND)
+            return dashboard_redirect(vendor)
     else:
         user_form = VendorUserForm()
         vendor_form = VendorForm()
@@ -180,6 +236,7 @@ def vendor_register(request):
     })
 
 
+@query_budget(10)
 def vendor_login(request):
     form = AuthenticationForm(request, data=request.POST or None)
     if form.is_valid():
@@ -189,6 +246,7 @@ def vendor_login(request):
     return render(request, 'market/vendor_login.html', {'form': form})
 
 
+@query_budget(5)
 def vendor_logout(request):
     logout(request)
     return redirect('vendor_login')
@@ -198,6 +256,7 @@ def vendor_logout(request):
 # DASHBOARD VENDEUR (pagination)
 # =====================================================
 
+@query_budget(5)
 @login_required
 def vendor_dashboard(request):
     if not hasattr(request.user, 'vendor'):
@@ -207,38 +266,46 @@ def vendor_dashboard(request):
 
     products_qs = (
         vendor.products
-        .filter(is_active=True)
+        .live()
         .select_related('category')
-        .order_by('-created_at')
     )
 
-    paginator = Paginator(products_qs, 10)
-    page_number = request.GET.get('page')
-    products = paginator.get_page(page_number)
+    paginator = CursorPaginator(products_qs, 10)
+    products = paginator.get_page(request.GET.get('cursor'))
 
-    active_products_count = products_qs.count()
+    active_products_count = vendor.active_products_count
     product_limit = vendor.product_limit()
 
+    # Agrégats journaliers uniquement (voir market.analytics)
+    stats = analytics.vendor_summary(vendor)
+    top_products = analytics.top_products(vendor) if vendor.is_premium else None
+
+    # Tâche de traitement d'image à suivre (voir dashboard_redirect)
+    image_job = request.GET.get('job')
+
     return render(request, 'market/vendor_dashboard.html', {
         'vendor': vendor,
+        'image_job': int(image_job) if image_job and image_job.isdigit() else None,
         'products': products,
         'active_products_count': active_products_count,
         'product_limit': product_limit,
+        'stats': stats,
+        'top_products': top_products,
     })
 
 # =====================================================
 # PRODUITS (CRUD)
 # =====================================================
 
+@query_budget(13)
 @login_required
 def add_product(request):
-    vendor = get_object_or_404(Vendor, user=request.user)
+    vendor = request_vendor(request)
 
-    if vendor.products.filter(is_active=True).count() >= vendor.product_limit():
-        messages.error(
-            request,
-            "Limite atteinte. Passez à l’abonnement Premium."
-        )
+    # Compteur stocké : pas de COUNT ; la réservation atomique a lieu
+    # dans Product.save().
+    if not vendor.has_product_slot():
+        messages.error(request, LIMIT_REACHED_MESSAGE)
         return redirect('vendor_dashboard')
 
     if request.method == 'POST':
@@ -246,9 +313,13 @@ def add_product(request):
         if form.is_valid():
             product = form.save(commit=False)
             product.vendor = vendor
-            product.save()
+            try:
+                product.save()
+            except ProductLimitReached:
+                messages.error(request, LIMIT_REACHED_MESSAGE)
+                return redirect('vendor_dashboard')
             messages.success(request, "Produit ajouté avec succès")
-            return redirect('vendor_dashboard')
+            return dashboard_redirect(product)
     else:
         form = ProductForm()
 
@@ -258,12 +329,13 @@ def add_product(request):
     })
 
 
+@query_budget(16)
 @login_required
 def edit_product(request, product_id):
-    product = get_object_or_404(Product, pk=product_id)
-
-    if product.vendor.user != request.user:
-        return HttpResponseForbidden("Action non autorisée")
+    # Propriété vérifiée dans la même requête que la recherche
+    product = get_object_or_404(
+        Product.live, pk=product_id, vendor__user=request.user
+    )
 
     form = ProductForm(
         request.POST or None,
@@ -272,9 +344,9 @@ def edit_product(request, product_id):
     )
 
     if form.is_valid():
-        form.save()
+        product = form.save()
         messages.success(request, "Produit modifié avec succès")
-        return redirect('vendor_dashboard')
+        return dashboard_redirect(product)
 
     return render(request, 'market/product_form.html', {
         'form': form,
@@ -282,39 +354,100 @@ def edit_product(request, product_id):
     })
 
 
+@query_budget(10)
+@require_POST
 @login_required
 def delete_product(request, product_id):
-    product = get_object_or_404(Product, pk=product_id)
-
-    if product.vendor.user != request.user:
-        return HttpResponseForbidden("Action non autorisée")
+    product = get_object_or_404(
+        Product.live, pk=product_id, vendor__user=request.user
+    )
 
-    product.delete()
+    # Suppression douce : archivée plus tard par `manage.py archive_products`
+    product.soft_delete()
     messages.success(request, "Produit supprimé")
     return redirect('vendor_dashboard')
 
 
+# =====================================================
+# IMPORT / EXPORT DU CATALOGUE
+# =====================================================
+
+@query_budget(13)
+@login_required
+def import_products(request):
+    vendor = request_vendor(request)
+    result = None
+
+    if request.method == 'POST':
+        form = ProductUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            result = bulk.import_products(vendor, upload, upload.import_format)
+
+            if result.ok and result.created:
+                messages.success(
+                    request, f"{result.created} produit(s) importé(s)"
+                )
+                return redirect('vendor_dashboard')
+
+            if result.ok:
+                messages.error(request, "Aucun produit dans le fichier.")
+    else:
+        form = ProductUploadForm()
+
+    return render(request, 'market/product_import.html', {
+        'form': form,
+        'result': result,
+        'columns': bulk.IMPORT_COLUMNS,
+        'title': 'Importer des produits',
+    })
+
+
+@query_budget(3)
+@login_required
+def export_products(request):
+    vendor = request_vendor(request)
+
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in bulk.CONTENT_TYPES:
+        return HttpResponseBadRequest("Format invalide (csv, jsonl)")
+
+    # Produits supprimés (désactivés) exclus : invisibles pour le vendeur
+    return bulk.export_response(
+        vendor.products.live(), fmt, f'produits-{slugify(vendor.name)}'
+    )
+
+
 # =====================================================
 # PAGES DÉTAILS
 # =====================================================
 
+@query_budget(3)
+@track_view(AnalyticsEvent.PRODUCT_VIEW)
+@read_replica
+@conditional(product_freshness)
+@cache_public_page()
 def product_detail(request, pk):
     product = (
         get_object_or_404(
-            Product.objects.select_related('vendor', 'category'),
-            pk=pk,
-            is_active=True
+            Product.live.select_related('vendor', 'category'),
+            pk=pk
         )
     )
     return render(request, 'market/product_detail.html', {'product': product})
 
 
+@query_budget(4)
+@track_view(AnalyticsEvent.VENDOR_VIEW)
+@read_replica
+@conditional(vendor_freshness)
+@cache_public_page()
 def vendor_detail(request, pk):
     vendor = get_object_or_404(Vendor, pk=pk, is_verified=True)
 
     products = (
         vendor.products
-        .filter(is_active=True)
+        .live()
         .select_related('category')
     )
 
@@ -324,10 +457,48 @@ def vendor_detail(request, pk):
     })
 
 
+# =====================================================
+# REDIRECTIONS WHATSAPP (clics comptés, voir market.whatsapp)
+# =====================================================
+
+@query_budget(1)
+@never_cache
+@read_replica
+def whatsapp_product(request, product_id):
+    contact = get_product_contact(product_id)
+    if contact is None:
+        raise Http404
+
+    number, name = contact
+    analytics.record_click(request, product_id=product_id)
+
+    product_url = request.build_absolute_uri(
+        detail_url('product_detail', product_id)
+    )
+    return redirect(
+        whatsapp.wa_me_url(number, whatsapp.product_message(name, product_url))
+    )
+
+
+@query_budget(1)
+@never_cache
+@read_replica
+def whatsapp_vendor(request, vendor_id):
+    contact = get_vendor_contact(vendor_id)
+    if contact is None:
+        raise Http404
+
+    number, name = contact
+    analytics.record_click(request, vendor_id=vendor_id)
+
+    return redirect(whatsapp.wa_me_url(number, whatsapp.vendor_message(name)))
+
+
 # =====================================================
 # PAGE PREMIUM
 # =====================================================
 
+@query_budget(2)
 @login_required
 def premium_page(request):
     if not hasattr(request.user, 'vendor'):
@@ -336,3 +507,30 @@ def premium_page(request):
     return render(request, 'market/premium.html', {
         'vendor': request.user.vendor
     })
+
+
+# =====================================================
+# TÂCHES EN ARRIÈRE-PLAN (statut)
+# =====================================================
+
+@query_budget(4)
+@login_required
+def job_status(request, job_id):
+    job = get_object_or_404(Job, pk=job_id)
+
+    if job.user_id != request.user.pk and not request.user.is_staff:
+        return HttpResponseForbidden("Action non autorisée")
+
+    # Dernière ligne de la trace (l'exception) ; vide ou blanc : None
+    error = (job.last_error.strip().splitlines() or [None])[-1]
+
+    return JsonResponse({
+        'id': job.pk,
+        'task': job.task,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'run_at': job.run_at,
+        'finished_at': job.finished_at,
+        'error': error,
+    })
@@ -0,0 +1,39 @@
+"""
+Liens de commande WhatsApp (wa.me).
+
+Les pages publiques pointent vers `/go/whatsapp/...` : la vue retrouve le
+numéro du vendeur (cache du catalogue), compte le clic en mémoire
+(market.analytics, écrit plus tard par lots) et redirige aussitôt vers
+wa.me avec le message prérempli.
+"""
+
+from urllib.parse import quote
+
+
+WA_ME = 'https://wa.me/'
+
+
+def wa_me_url(number, text=None):
+    """
+    Lien wa.me : numéro international sans `+` ni séparateurs, message
+    encodé (nom de produit avec `&`, `#`, accents...).
+    """
+    digits = ''.join(char for char in number if char.isdigit())
+    url = f'{WA_ME}{digits}'
+    if text:
+        url += '?text=' + quote(text, safe='')
+    return url
+
+
+def product_message(name, product_url):
+    return (
+        f"Bonjour, je souhaite commander le produit « {name} » "
+        f"vu sur Authentic Place : {product_url}"
+    )
+
+
+def vendor_message(vendor_name):
+    return (
+        f"Bonjour {vendor_name}, je vous contacte depuis votre boutique "
+        f"Authentic Place."
+    )